@@ -0,0 +1,273 @@
+import os
+import math
+import heapq
+
+from itertools import repeat
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+from path_finding import distances_to_dict
+
+# Graphs with at least this share of the n * (n - 1) possible edges are
+# solved with Floyd-Warshall, sparser ones with a Dijkstra per source.
+# In CPython the two break even at about three quarters.
+DENSE_EDGE_RATIO = float(os.environ.get('MAZE_ALL_PAIRS_DENSE_RATIO', 0.75))
+# Below this many nodes the process pool costs more than it saves.
+PARALLEL_MIN_NODES = int(os.environ.get('MAZE_ALL_PAIRS_PARALLEL_NODES',
+                                        400))
+# It runs inside the server's own pool workers, which already have a
+# core each, so it only spreads over more processes when asked to.
+ALL_PAIRS_PROCESSES = int(os.environ.get('MAZE_ALL_PAIRS_PROCESSES', 1))
+
+Adjacency = List[List[Tuple[int, Union[int, float]]]]
+
+# The pool `sparse_distances` fans out over, if it uses one.
+pool: Optional[ProcessPoolExecutor] = None
+
+
+def to_adjacency(graph: Union[List[List[Union[int, float]]],
+                              Dict[Any, Dict[Any, Union[int, float]]]]
+                 ) -> Tuple[List[Any], Adjacency]:
+    """
+    Turns a weighted adjacency matrix, where 0 or inf means no edge as
+    for `floyd_warshall`, or a dict graph such as those of
+    `random_letter_weighted_dict` and `random_coords_graph`, into lists
+    of (neighbor index, weight) per node. Self-loops are dropped.
+
+    Returns:
+        Tuple[List[Any], Adjacency]: The nodes, in index order, and
+            their adjacency lists.
+    """
+    if isinstance(graph, dict):
+        nodes = list(graph)
+        index = {node: i for i, node in enumerate(nodes)}
+        for neighbors in graph.values():
+            for neighbor in neighbors:
+                if neighbor not in index:
+                    index[neighbor] = len(nodes)
+                    nodes.append(neighbor)
+        return nodes, [[(index[neighbor], weight) for neighbor, weight
+                        in graph.get(node, {}).items()
+                        if neighbor != node] for node in nodes]
+    return list(range(len(graph))), [
+        [(j, weight) for j, weight in enumerate(row)
+         if j != i and weight != 0 and weight != math.inf]
+        for i, row in enumerate(graph)]
+
+
+def johnson_potentials(adjacency: Adjacency
+                       ) -> Optional[List[Union[int, float]]]:
+    """
+    Computes Johnson's node potentials: the shortest distances from a
+    virtual source with a 0 edge to every node, found with a queue-based
+    Bellman-Ford. Adding h(u) - h(v) to each edge (u, v) makes every
+    weight non-negative while keeping the shortest paths.
+
+    Returns:
+        Optional[List[Union[int, float]]]: The potentials, or None if
+            the graph has a negative-weight cycle.
+    """
+    n = len(adjacency)
+    potentials = [0] * n
+    queue, queued = deque(range(n)), [True] * n
+    updates = [0] * n
+    while queue:
+        u = queue.popleft()
+        queued[u] = False
+        for v, weight in adjacency[u]:
+            if potentials[u] + weight < potentials[v]:
+                potentials[v] = potentials[u] + weight
+                updates[v] += 1
+                if updates[v] > n:
+                    return None
+                if not queued[v]:
+                    queued[v] = True
+                    queue.append(v)
+    return potentials
+
+
+def get_pool(processes: int) -> ProcessPoolExecutor:
+    """
+    Returns this process's pool for `sparse_distances`, started on first
+    use and kept, so calls do not pay for starting processes.
+    """
+    global pool
+    if pool is None:
+        pool = ProcessPoolExecutor(max_workers=processes)
+    return pool
+
+
+def drop_pool() -> None:
+    """
+    Shuts down a pool that failed, e.g. in a daemonic process that may
+    not start children.
+    """
+    global pool
+    if pool is not None:
+        pool.shutdown(wait=False)
+        pool = None
+
+
+def distance_rows(sources: Iterable[int], adjacency: Adjacency,
+                  potentials: Optional[List[Union[int, float]]] = None
+                  ) -> List[List[Union[int, float]]]:
+    """
+    Runs Dijkstra from each source over non-negative weights, reweighted
+    by `johnson_potentials` if given, and returns the true distances.
+
+    Args:
+        sources (Iterable[int]): The source node indices.
+        adjacency (Adjacency): The graph.
+        potentials (List[Union[int, float]], optional): The potentials
+            the weights were shifted by. Defaults to None.
+
+    Returns:
+        List[List[Union[int, float]]]: One row of distances per source,
+            with inf for unreachable nodes.
+    """
+    n = len(adjacency)
+    rows = []
+    for source in sources:
+        dist = [math.inf] * n
+        dist[source] = 0
+        heap = [(0, source)]
+        while heap:
+            d, u = heapq.heappop(heap)
+            if d > dist[u]:
+                continue
+            for v, weight in adjacency[u]:
+                new_distance = d + weight
+                if new_distance < dist[v]:
+                    dist[v] = new_distance
+                    heapq.heappush(heap, (new_distance, v))
+        if potentials is not None:
+            h = potentials[source]
+            dist = [d - h + potentials[v] if d != math.inf else d
+                    for v, d in enumerate(dist)]
+        rows.append(dist)
+    return rows
+
+
+def dense_distances(adjacency: Adjacency
+                    ) -> Optional[List[List[Union[int, float]]]]:
+    """
+    Floyd-Warshall over the adjacency lists, skipping the rows that
+    cannot reach the intermediate node.
+
+    Returns:
+        Optional[List[List[Union[int, float]]]]: The distance matrix,
+            or None if the graph has a negative-weight cycle.
+    """
+    n = len(adjacency)
+    dist = [[math.inf] * n for _ in range(n)]
+    for i, neighbors in enumerate(adjacency):
+        dist[i][i] = 0
+        for j, weight in neighbors:
+            if weight < dist[i][j]:
+                dist[i][j] = weight
+    for k in range(n):
+        row_k = dist[k]
+        for row_i in dist:
+            d_ik = row_i[k]
+            if d_ik == math.inf:
+                continue
+            for j, d_kj in enumerate(row_k):
+                if d_ik + d_kj < row_i[j]:
+                    row_i[j] = d_ik + d_kj
+    if any(dist[i][i] < 0 for i in range(n)):
+        return None
+    return dist
+
+
+def sparse_distances(adjacency: Adjacency,
+                     potentials: Optional[List[Union[int, float]]],
+                     processes: int) -> List[List[Union[int, float]]]:
+    """
+    Runs `distance_rows` from every node, fanned out over this process's
+    pool when there are enough nodes, in this process otherwise or if
+    the pool cannot be started, e.g. from inside a daemonic worker.
+    """
+    n = len(adjacency)
+    if potentials is not None:
+        adjacency = [[(v, weight + potentials[u] - potentials[v])
+                      for v, weight in neighbors]
+                     for u, neighbors in enumerate(adjacency)]
+    if processes > 1 and n >= PARALLEL_MIN_NODES:
+        # One batch per process, so the graph is pickled once for each,
+        # taking every `processes`-th source to even out the sources
+        # that reach more.
+        batches = [range(i, n, processes) for i in range(processes)]
+        try:
+            dist: List[List[Union[int, float]]] = [[]] * n
+            for i, rows in enumerate(get_pool(processes).map(
+                    distance_rows, batches, repeat(adjacency),
+                    repeat(potentials))):
+                dist[i::processes] = rows
+            return dist
+        except (OSError, AssertionError, BrokenProcessPool):
+            drop_pool()
+    return distance_rows(range(n), adjacency, potentials)
+
+
+def all_pairs(graph: Union[List[List[Union[int, float]]],
+                           Dict[Any, Dict[Any, Union[int, float]]]],
+              type: str = 'matrix', strategy: str = 'auto',
+              processes: Optional[int] = None) -> Union[
+                  List[List[Union[int, float]]],
+                  Dict[Any, Dict[Any, Union[int, float]]], str]:
+    """
+    Computes the shortest distances between all pairs of nodes, picking
+    the strategy by edge density: Floyd-Warshall, O(n^3), for dense
+    graphs, and for sparse ones Dijkstra from every node, O(n E log n),
+    with Johnson's reweighting if some weights are negative, spread over
+    `processes` processes.
+
+    Args:
+        graph: A weighted adjacency matrix as for `floyd_warshall`, or a
+            dict graph mapping each node to its neighbors and weights.
+        type (str, optional): 'matrix', 'letters' or 'coords', as for
+            `floyd_warshall`. For a dict graph, 'letters' and 'coords'
+            both return distances keyed by its own nodes, and 'matrix'
+            is in the order of its keys. Defaults to 'matrix'.
+        strategy (str, optional): 'dense', 'sparse' or 'auto' to pick by
+            `DENSE_EDGE_RATIO`. Defaults to 'auto'.
+        processes (int, optional): The processes to spread a sparse
+            graph over. Defaults to `ALL_PAIRS_PROCESSES`.
+
+    Returns:
+        The distances in the requested shape, with inf (omitted in the
+        dict shapes) for unreachable pairs, {'error': ...} if there is a
+        negative-weight cycle, or an error string for an unknown type
+        or strategy.
+    """
+    if type not in ['matrix', 'letters', 'coords']:
+        return f'type not allowed: {type}; matrix, letters, coords'
+    if strategy not in ['auto', 'dense', 'sparse']:
+        return f'strategy not allowed: {strategy}; auto, dense, sparse'
+    nodes, adjacency = to_adjacency(graph)
+    n = len(nodes)
+    if strategy == 'auto':
+        edges = sum(map(len, adjacency))
+        strategy = 'dense' if edges >= DENSE_EDGE_RATIO * n * (n - 1) \
+            else 'sparse'
+    if strategy == 'dense':
+        dist = dense_distances(adjacency)
+    else:
+        negative = any(weight < 0 for neighbors in adjacency
+                       for _, weight in neighbors)
+        potentials = johnson_potentials(adjacency) if negative else None
+        dist = None if negative and potentials is None else \
+            sparse_distances(adjacency, potentials,
+                             processes or ALL_PAIRS_PROCESSES)
+    if dist is None:
+        return {'error': 'Graph contains a negative-weight cycle'}
+    if type == 'matrix':
+        return dist
+    if isinstance(graph, dict):
+        return {node: {nodes[j]: d for j, d in enumerate(row)
+                       if d != math.inf}
+                for node, row in zip(nodes, dist)}
+    return distances_to_dict(dist, type)
@@ -0,0 +1,402 @@
+import json
+import hashlib
+
+from uuid import uuid4
+
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Union
+
+from pydantic import BaseModel, Field
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+
+from artifacts import store_artifact_file, artifact_url
+from cost_model import (DOWNGRADE_SOLVER, admit, reserve, maze_cost,
+                        solve_cost, graph_cost)
+from executors import run_cpu, run_io
+from metrics import record_report
+from sessions import (create_session, get_session, edit_session,
+                      delete_session, session_cells)
+from solve_cache import solve_key, cache_get, cache_put
+from tasks import (SOLVERS, generate_grid_task, solve_grid_task,
+                   letter_graph_task, coords_edges_task,
+                   adjacency_matrix_task, solve_plan, compact_path)
+
+router = APIRouter(prefix='/api/v1')
+SOLVER_NAMES = [solver.__name__ for solver in SOLVERS]
+PATH_FORMATS = ('flat', 'moves')
+
+
+class Grid(BaseModel):
+    """
+    A maze in the compact grid format of `maze_methods.maze_to_grid`.
+    """
+    width: int
+    height: int
+    right: List[int]
+    down: List[int]
+
+
+class Query(BaseModel):
+    """
+    One solve: an algorithm, by index or name, and its endpoints, or a
+    route through waypoints, see `path_finding.waypoint_route`, or the
+    `k` shortest paths, see `path_finding.alternative_paths`, or the
+    best path found within a deadline or a number of expansions, see
+    `path_finding.anytime_a_star`. The path is returned flattened, or
+    with `path_format` 'moves' as its start and runs of steps, see
+    `path_finding.encode_moves`.
+    """
+    algorithm: Union[int, str] = 0
+    start: List[int]
+    end: List[int]
+    waypoints: List[List[int]] = []
+    k: int = 1
+    deadline_ms: Optional[float] = None
+    max_expansions: Optional[int] = None
+    path_format: str = 'flat'
+
+
+class SolveRequest(Query):
+    """
+    A maze and one query to solve on it.
+    """
+    maze: Grid
+
+
+class BatchRequest(BaseModel):
+    """
+    A maze and several queries to solve on it.
+    """
+    maze: Grid
+    queries: List[Query]
+
+
+class SessionRequest(BaseModel):
+    """
+    A maze to edit, and the endpoints whose path is kept up to date.
+    """
+    maze: Grid
+    start: List[int]
+    end: List[int]
+
+
+class Passage(BaseModel):
+    """
+    A new weight for the passage between two neighboring cells, where
+    100 or None is a wall.
+    """
+    from_: List[int] = Field(alias='from')
+    to: List[int]
+    weight: Optional[int] = None
+
+
+class EditRequest(BaseModel):
+    """
+    Passages to change in a session's maze.
+    """
+    updates: List[Passage]
+
+
+def solver_index(algorithm: Union[int, str]) -> Optional[int]:
+    """
+    Resolves an algorithm given by index or by function name.
+    """
+    if isinstance(algorithm, str) and algorithm in SOLVER_NAMES:
+        return SOLVER_NAMES.index(algorithm)
+    if isinstance(algorithm, int) and 0 <= algorithm < len(SOLVERS):
+        return algorithm
+    return None
+
+
+def compact_result(result: Any, path_format: str = 'flat') -> Dict[str, Any]:
+    """
+    Flattens a solver result's path into [x0, y0, x1, y1, ...], or with
+    `path_format` 'moves' encodes it as its 'start' and 'moves', keeping
+    the solver and reason `auto` picked, the waypoint 'order', the
+    'alternatives', in the same format, and the suboptimality 'bound'
+    of an anytime search.
+    """
+    if not isinstance(result, dict):
+        return {'path': None, 'cost': None}
+    if 'error' in result:
+        return dict(result)
+    if path_format == 'moves':
+        return compact_path(result)
+    choice = {key: result[key] for key in ('solver', 'reason', 'order',
+                                           'bound') if key in result}
+    if 'alternatives' in result:
+        choice['alternatives'] = [compact_result(i)
+                                  for i in result['alternatives']]
+    if not result.get('path'):
+        return dict(choice, path=None, cost=None)
+    return dict(choice, path=[i for node in result['path'] for i in node],
+                cost=result['cost'])
+
+
+async def solve_query(grid: Dict[str, Any], grid_bytes: bytes,
+                      query: Query) -> Dict[str, Any]:
+    """
+    Solves one query on a grid, going through the solve cache. Solves
+    projected to be over budget run with the approximate
+    `DOWNGRADE_SOLVER` if allowed, which the 'algorithm' field reports.
+    Routes through waypoints, several paths and searches with a deadline
+    are never downgraded.
+
+    Raises:
+        HTTPException: 413 or 503 if it cannot be admitted.
+
+    Returns:
+        Dict[str, Any]: The compact result, or an 'error' entry.
+    """
+    index = solver_index(query.algorithm)
+    if index is None:
+        return {'error': f'algorithm not allowed: {query.algorithm}; '
+                         + ', '.join(SOLVER_NAMES)}
+    if query.path_format not in PATH_FORMATS:
+        return {'error': f'path_format not allowed: {query.path_format}; '
+                         + ', '.join(PATH_FORMATS)}
+    start, end = tuple(query.start[:2]), tuple(query.end[:2])
+    waypoints = [tuple(i[:2]) for i in query.waypoints]
+    try:
+        algorithm, searches = solve_plan(index, waypoints, query.k,
+                                         query.deadline_ms,
+                                         query.max_expansions)
+    except ValueError as e:
+        return {'error': str(e)}
+    params = {'format': 'api'}
+    if waypoints:
+        params['waypoints'] = [list(i) for i in waypoints]
+    if query.k > 1:
+        params['k'] = query.k
+    for limit in ('deadline_ms', 'max_expansions'):
+        if getattr(query, limit) is not None:
+            params[limit] = getattr(query, limit)
+    if query.path_format != 'flat':
+        params['path_format'] = query.path_format
+    key = solve_key(grid_bytes, index, start, end, params)
+    entry = cache_get(key)
+    if entry is None:
+        cells = grid['width'] * grid['height']
+        cost = solve_cost(cells, algorithm, 0, searches, query.deadline_ms)
+        downgraded = None if algorithm != SOLVER_NAMES[index] else \
+            solve_cost(cells, DOWNGRADE_SOLVER, 0)
+        if admit(cost, downgraded, job=False) == 'downgrade':
+            index, cost = SOLVER_NAMES.index(DOWNGRADE_SOLVER), downgraded
+            algorithm = DOWNGRADE_SOLVER
+            key = solve_key(grid_bytes, index, start, end, params)
+        with reserve(cost):
+            result, report = await run_cpu(
+                solve_grid_task, grid, index, start, end,
+                hashlib.sha256(grid_bytes).hexdigest(), waypoints, query.k,
+                query.deadline_ms, query.max_expansions)
+        record_report(report, algorithm)
+        entry = {'path': compact_result(result, query.path_format)}
+        cache_put(key, entry)
+    return dict(entry['path'], algorithm=algorithm)
+
+
+@router.get('/generate_maze')
+async def api_generate_maze(width: int, height: int, strict: float = 0.9,
+                            weight: float = 0.2, render: bool = False
+                            ) -> JSONResponse:
+    """
+    Generates a maze and returns it in the compact grid format.
+
+    Args:
+        width (int): The width of the maze.
+        height (int): The height of the maze.
+        strict (float, optional): The strictness of the maze.
+        weight (float, optional): The probability of adding weights.
+        render (bool, optional): Also draw the maze and return its image
+            URL. Defaults to False.
+
+    Returns:
+        JSONResponse: {'maze': grid} plus 'image' if rendered. Over
+        budget, the render is skipped and 'downgraded' is set.
+    """
+    cost = maze_cost(width, height, None if render else 0)
+    downgraded = maze_cost(width, height, 0) if render else None
+    decision = admit(cost, downgraded, job=False)
+    with reserve(downgraded if decision == 'downgrade' else cost):
+        grid, image_path = await run_cpu(
+            generate_grid_task, width, height, strict, weight, str(uuid4()),
+            render and decision == 'run')
+    response_ = {'maze': grid}
+    if decision == 'downgrade':
+        response_['downgraded'] = 'render'
+    if image_path:
+        response_['image'] = artifact_url(
+            await run_io(store_artifact_file, image_path, 'png'), 'png')
+    return JSONResponse(response_)
+
+
+@router.post('/solve')
+async def api_solve(request: SolveRequest) -> JSONResponse:
+    """
+    Solves a compact grid maze.
+
+    Returns:
+        JSONResponse: {'path': [x0, y0, ...], 'cost': int,
+        'algorithm': str}, with 'start' and 'moves' instead of 'path'
+        for the 'moves' `path_format`, plus the 'solver' and 'reason'
+        it picked for 'auto', the 'order' of the waypoints, the
+        'alternatives' or the 'bound', or a 400 for an unknown
+        algorithm or invalid options.
+    """
+    grid = request.maze.dict()
+    result = await solve_query(grid, json.dumps(grid).encode(), request)
+    return JSONResponse(result,
+                        status_code=200 if 'algorithm' in result else 400)
+
+
+@router.post('/solve/batch')
+async def api_solve_batch(request: BatchRequest) -> StreamingResponse:
+    """
+    Solves several queries on one maze, streaming one NDJSON line per
+    query, in order, as soon as each is solved.
+    """
+    grid = request.maze.dict()
+    grid_bytes = json.dumps(grid).encode()
+
+    async def lines() -> AsyncIterator[bytes]:
+        for i, query in enumerate(request.queries):
+            try:
+                result = await solve_query(grid, grid_bytes, query)
+            except HTTPException as e:
+                result = {'error': e.detail}
+            yield (json.dumps(dict(result, index=i),
+                              separators=(',', ':')) + '\n').encode()
+
+    return StreamingResponse(lines(), media_type='application/x-ndjson')
+
+
+@router.get('/dict_generator')
+async def api_dict_generator(num_nodes: int, num_edges: int, min_weight: int,
+                             max_weight: int, directional: bool = False
+                             ) -> JSONResponse:
+    """
+    Generates a letter weighted dict graph as JSON.
+    """
+    cost = graph_cost('dict', num_nodes, num_edges, render=False)
+    admit(cost, job=False)
+    with reserve(cost):
+        return JSONResponse({'graph': await run_cpu(
+            letter_graph_task, num_nodes, num_edges, min_weight, max_weight,
+            directional, str(uuid4()))})
+
+
+@router.get('/coords_generator')
+async def api_coords_generator(num_nodes: int, num_edges: int,
+                               min_weight: int, max_weight: int,
+                               directional: bool = False) -> JSONResponse:
+    """
+    Generates a coords graph as a list of [x, y, nx, ny, weight] edges.
+    """
+    cost = graph_cost('coords', num_nodes, num_edges, render=False)
+    admit(cost, job=False)
+    with reserve(cost):
+        return JSONResponse({'edges': await run_cpu(
+            coords_edges_task, num_nodes, num_edges, min_weight, max_weight,
+            directional, str(uuid4()))})
+
+
+@router.get('/matrix_generator')
+async def api_matrix_generator(num_nodes: int, num_edges: int,
+                               min_weight: int, max_weight: int
+                               ) -> JSONResponse:
+    """
+    Generates a weighted adjacency matrix as JSON.
+    """
+    cost = graph_cost('matrix', num_nodes, num_edges, render=False)
+    admit(cost, job=False)
+    with reserve(cost):
+        return JSONResponse({'matrix': await run_cpu(
+            adjacency_matrix_task, num_nodes, num_edges, min_weight,
+            max_weight, str(uuid4()))})
+
+
+def session_response(result: Optional[Dict[str, Any]],
+                     status_code: int = 200) -> JSONResponse:
+    """
+    Flattens a session's path, or answers 404 for an unknown session.
+    """
+    if result is None:
+        raise HTTPException(status_code=404, detail='Session not found')
+    return JSONResponse(dict(compact_result(result), **{
+        key: result[key] for key in ('session', 'expanded', 'edits')}),
+        status_code=status_code)
+
+
+@router.post('/sessions')
+async def api_create_session(request: SessionRequest) -> JSONResponse:
+    """
+    Starts an editing session on a maze, see `sessions.create_session`.
+
+    Returns:
+        JSONResponse: 201 with the 'session' id, the 'path' flattened
+        as [x0, y0, ...], its 'cost' and the nodes 'expanded', or 400
+        for endpoints outside the maze.
+    """
+    grid = request.maze.dict()
+    cost = solve_cost(grid['width'] * grid['height'], 'lpa_star', 0)
+    admit(cost, job=False)
+    with reserve(cost):
+        try:
+            result = await run_cpu(create_session, grid, request.start,
+                                   request.end)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    return session_response(result, status_code=201)
+
+
+async def run_session(func: Callable, session_id: str,
+                      *args: Any) -> Optional[Dict[str, Any]]:
+    """
+    Runs a session's search on the process pool, admitted by the cost of
+    rebuilding it, as the worker that gets it may not hold it yet.
+
+    Returns:
+        Optional[Dict[str, Any]]: As `func`, or None if the session is
+            unknown.
+    """
+    cells = await run_io(session_cells, session_id)
+    if cells is None:
+        return None
+    cost = solve_cost(cells, 'lpa_star', 0)
+    admit(cost, job=False)
+    with reserve(cost):
+        return await run_cpu(func, session_id, *args)
+
+
+@router.get('/sessions/{session_id}')
+async def api_get_session(session_id: str) -> JSONResponse:
+    """
+    Returns a session's current path.
+    """
+    return session_response(await run_session(get_session, session_id))
+
+
+@router.patch('/sessions/{session_id}')
+async def api_edit_session(session_id: str,
+                           request: EditRequest) -> JSONResponse:
+    """
+    Changes passages of a session's maze, in both directions, and
+    returns the repaired path, with the nodes the repair 'expanded'.
+    """
+    updates = [{'from': passage.from_, 'to': passage.to,
+                'weight': passage.weight} for passage in request.updates]
+    try:
+        result = await run_session(edit_session, session_id, updates)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return session_response(result)
+
+
+@router.delete('/sessions/{session_id}')
+async def api_delete_session(session_id: str) -> Response:
+    """
+    Ends a session.
+    """
+    if not await run_io(delete_session, session_id):
+        raise HTTPException(status_code=404, detail='Session not found')
+    return Response(status_code=204)
@@ -0,0 +1,224 @@
+import os
+import re
+import gzip
+import time
+import shutil
+import hashlib
+
+from typing import Optional
+
+from fastapi import Response
+
+from file_locks import file_lock, temp_path
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+FILE_PREF = 'maze_data' if 'maze_solver' in os.getcwd() else '/tmp/'
+ARTIFACT_DIR = os.path.join(FILE_PREF, 'artifacts')
+ARTIFACT_TTL = int(os.environ.get('MAZE_ARTIFACT_TTL', 24 * 60 * 60))
+MEDIA_TYPES = {'png': 'image/png', 'json': 'text/plain', 'txt': 'text/plain',
+               'prof': 'application/octet-stream'}
+COMPRESSIBLE = {'json', 'txt'}
+MIN_COMPRESS_SIZE = 512
+ARTIFACT_NAME = re.compile(r'^([0-9a-f]{64})\.(png|json|txt|prof)$')
+
+
+def store_artifact(data: bytes, ext: str) -> str:
+    """
+    Stores the given bytes under their content hash in the artifact
+    directory. Writing the same content twice only refreshes its age.
+
+    Args:
+        data (bytes): The artifact contents.
+        ext (str): The artifact extension, one of `MEDIA_TYPES`.
+
+    Returns:
+        str: The sha256 hex digest naming the artifact.
+    """
+    digest = hashlib.sha256(data).hexdigest()
+    os.makedirs(ARTIFACT_DIR, exist_ok=True)
+    path_ = artifact_path(digest, ext)
+    with file_lock('artifacts', shared=True):
+        if os.path.exists(path_):
+            os.utime(path_)
+        else:
+            temp_ = temp_path(path_)
+            with open(temp_, 'wb') as f:
+                f.write(data)
+            os.replace(temp_, path_)
+    return digest
+
+
+def store_artifact_file(file_path: str, ext: str) -> str:
+    """
+    Stores an already written file as an artifact without re-encoding
+    it, hard-linking it into the artifact directory where possible.
+
+    Args:
+        file_path (str): The path of the file to store.
+        ext (str): The artifact extension, one of `MEDIA_TYPES`.
+
+    Returns:
+        str: The sha256 hex digest naming the artifact.
+    """
+    sha = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 16), b''):
+            sha.update(chunk)
+    digest = sha.hexdigest()
+    os.makedirs(ARTIFACT_DIR, exist_ok=True)
+    path_ = artifact_path(digest, ext)
+    with file_lock('artifacts', shared=True):
+        if os.path.exists(path_):
+            os.utime(path_)
+        else:
+            temp_ = temp_path(path_)
+            try:
+                os.link(file_path, temp_)
+            except OSError:
+                shutil.copyfile(file_path, temp_)
+            os.replace(temp_, path_)
+    return digest
+
+
+def restore_artifact_file(digest: str, ext: str, file_path: str) -> bool:
+    """
+    Makes an artifact available again under a plain file name, e.g. for
+    the download endpoint, without copying it where possible. Both are
+    marked as fresh so no worker's temporary file sweep or artifact
+    pruning removes them right after.
+
+    Args:
+        digest (str): The artifact digest.
+        ext (str): The artifact extension.
+        file_path (str): Where the file should appear.
+
+    Returns:
+        bool: False if the artifact has already expired.
+    """
+    path_ = artifact_path(digest, ext)
+    with file_lock('artifacts', shared=True):
+        if not os.path.exists(path_):
+            return False
+        os.utime(path_)
+        if os.path.exists(file_path):
+            os.utime(file_path)
+        else:
+            temp_ = temp_path(file_path)
+            try:
+                os.link(path_, temp_)
+            except OSError:
+                shutil.copyfile(path_, temp_)
+            os.replace(temp_, file_path)
+    return True
+
+
+def artifact_path(digest: str, ext: str) -> str:
+    """
+    Returns the on-disk path of an artifact.
+    """
+    return os.path.join(ARTIFACT_DIR, f'{digest}.{ext}')
+
+
+def artifact_url(digest: str, ext: str) -> str:
+    """
+    Returns the content-addressed URL an artifact is served from.
+    """
+    return f'/artifacts/{digest}.{ext}'
+
+
+def compressed_variant(digest: str, ext: str,
+                       accept_encoding: str) -> Optional[str]:
+    """
+    Picks the best encoding the client accepts for a text artifact and
+    returns it, compressing and caching the variant on first use.
+
+    Args:
+        digest (str): The artifact digest.
+        ext (str): The artifact extension.
+        accept_encoding (str): The request's Accept-Encoding header.
+
+    Returns:
+        Optional[str]: 'br' or 'gzip' if a compressed variant should be
+            served, None to serve the identity encoding.
+    """
+    if ext not in COMPRESSIBLE or os.path.getsize(
+            artifact_path(digest, ext)) < MIN_COMPRESS_SIZE:
+        return None
+    accepted = {i.split(';')[0].strip() for i in accept_encoding.split(',')}
+    for encoding, suffix in (('br', 'br'), ('gzip', 'gz')):
+        if encoding not in accepted or (encoding == 'br' and brotli is None):
+            continue
+        path_ = f'{artifact_path(digest, ext)}.{suffix}'
+        if not os.path.exists(path_):
+            with open(artifact_path(digest, ext), 'rb') as f:
+                data = f.read()
+            data = brotli.compress(data) if encoding == 'br' else \
+                gzip.compress(data, compresslevel=6, mtime=0)
+            temp_ = temp_path(path_)
+            with open(temp_, 'wb') as f:
+                f.write(data)
+            os.replace(temp_, path_)
+        return encoding
+    return None
+
+
+def artifact_response(name_: str, if_none_match: str = '',
+                      accept_encoding: str = '') -> Response:
+    """
+    Serves an artifact by its content-addressed name with strong
+    validators and immutable caching.
+
+    Args:
+        name_ (str): The artifact file name, '<sha256>.<ext>'.
+        if_none_match (str, optional): The request's If-None-Match header.
+        accept_encoding (str, optional): The request's Accept-Encoding
+            header.
+
+    Returns:
+        Response: The artifact, a 304 if the client copy is current,
+            or a 404 if it does not exist.
+    """
+    match = ARTIFACT_NAME.match(name_)
+    if not match or not os.path.exists(artifact_path(*match.groups())):
+        return Response(status_code=404)
+    digest, ext = match.groups()
+    encoding = compressed_variant(digest, ext, accept_encoding)
+    etag = f'"{digest}-{encoding}"' if encoding else f'"{digest}"'
+    headers = {
+        'ETag': etag,
+        'Cache-Control': 'public, max-age=31536000, immutable',
+        'Vary': 'Accept-Encoding',
+    }
+    if etag in [i.strip() for i in if_none_match.split(',')]:
+        return Response(status_code=304, headers=headers)
+    path_ = artifact_path(digest, ext)
+    if encoding:
+        headers['Content-Encoding'] = encoding
+        path_ += '.br' if encoding == 'br' else '.gz'
+    with open(path_, 'rb') as f:
+        content = f.read()
+    return Response(content=content, media_type=MEDIA_TYPES[ext],
+                    headers=headers)
+
+
+def prune_artifacts(max_age: int = ARTIFACT_TTL) -> None:
+    """
+    Deletes artifacts, and their compressed variants, that have not been
+    modified for more than `max_age` seconds. Holds the artifact lock
+    exclusively, so no worker stores or restores one while it runs.
+    """
+    if not os.path.isdir(ARTIFACT_DIR):
+        return
+    cutoff = time.time() - max_age
+    with file_lock('artifacts'):
+        for filename in os.listdir(ARTIFACT_DIR):
+            file_path = os.path.join(ARTIFACT_DIR, filename)
+            try:
+                if os.path.getmtime(file_path) < cutoff:
+                    os.remove(file_path)
+            except OSError:
+                pass
@@ -0,0 +1,70 @@
+"""
+Measures the cold-start import time of the app with `python -X importtime`
+and reports the slowest modules.
+
+Usage:
+    python benchmarks/import_time.py [--module maze_app] [--top 15]
+        [--json report.json] [--max-ms 1500]
+"""
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+from typing import Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def import_times(module: str) -> List[Dict[str, int]]:
+    """
+    Imports `module` in a fresh interpreter with -X importtime.
+
+    Args:
+        module (str): The module to import.
+
+    Returns:
+        List[Dict[str, int]]: One entry per imported module with its
+            'self_us' and 'cumulative_us' times, in import order.
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=ROOT, capture_output=True, text=True, check=True)
+    times = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        times.append({'module': name.strip(), 'self_us': int(self_us),
+                      'cumulative_us': int(cumulative_us),
+                      'depth': (len(name) - len(name.lstrip())) // 2})
+    return times
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--module', default='maze_app')
+    parser.add_argument('--top', type=int, default=15)
+    parser.add_argument('--json', dest='json_path')
+    parser.add_argument('--max-ms', type=float,
+                        help='Exit with 1 if the import takes longer.')
+    args = parser.parse_args()
+
+    times = import_times(args.module)
+    total_ms = sum(i['self_us'] for i in times) / 1000
+    print(f'{args.module}: {total_ms:.1f} ms, {len(times)} modules')
+    for entry in sorted(times, key=lambda i: -i['cumulative_us'])[:args.top]:
+        print(f"{entry['cumulative_us'] / 1000:10.1f} ms  {entry['module']}")
+    for heavy in ('matplotlib', 'PIL'):
+        if any(i['module'] == heavy for i in times):
+            print(f'warning: {heavy} is imported at startup')
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump({'module': args.module, 'total_ms': total_ms,
+                       'modules': times}, f, indent=1)
+    return 1 if args.max_ms and total_ms > args.max_ms else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
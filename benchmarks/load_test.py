@@ -0,0 +1,349 @@
+"""
+Load-tests `/generate_maze`, `/maze_solver` and `/download/*` with a
+configurable request mix and concurrency, in-process or over HTTP, and
+reports throughput, latency percentiles and error rates.
+
+Usage:
+    python benchmarks/load_test.py [--url http://localhost:8000 | --serve]
+        [--concurrency 8] [--requests 200 | --duration 30]
+        [--mix generate=4,solve=4,download=2] [--sizes 10,20,40]
+        [--algorithms 0,1,2,5] [--downloads image,text,zip] [--seed 0]
+        [--json report.json] [--compare previous.json]
+
+Without `--url` or `--serve` the app is driven in-process through its
+ASGI interface. `--serve` starts a local uvicorn with `--server-workers`
+processes. Needs httpx (`pip install httpx`).
+"""
+import os
+import re
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import platform
+import subprocess
+
+from uuid import uuid4
+
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_URL = re.compile(r'/artifacts/[0-9a-f]{64}\.json')
+OPERATIONS = ('generate', 'solve', 'download')
+
+
+def percentile(values: List[float], fraction: float) -> Optional[float]:
+    """
+    Returns the nearest-rank percentile of a list of values.
+    """
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def summarize(samples: List[Tuple[str, int, float]],
+              elapsed: float) -> Dict[str, Dict[str, Any]]:
+    """
+    Aggregates request samples per operation and overall.
+
+    Args:
+        samples (List[Tuple[str, int, float]]): The operation, HTTP
+            status (0 for a transport error) and latency of each request.
+        elapsed (float): The wall time of the run.
+
+    Returns:
+        Dict[str, Dict[str, Any]]: For 'all' and each operation, the
+            request count, 'rps', 'error_rate', 'queued' jobs (202) and
+            the mean, p50, p95 and p99 latencies in milliseconds.
+    """
+    summary = {}
+    for op in ('all',) + OPERATIONS:
+        picked = [i for i in samples if op in ('all', i[0])]
+        if not picked:
+            continue
+        latencies = [i[2] * 1000 for i in picked]
+        errors = sum(1 for i in picked if not 200 <= i[1] < 400)
+        summary[op] = {
+            'requests': len(picked), 'rps': len(picked) / elapsed,
+            'error_rate': errors / len(picked),
+            'queued': sum(1 for i in picked if i[1] == 202),
+            'statuses': {str(status): sum(1 for i in picked if i[1] == status)
+                         for status in sorted({i[1] for i in picked})},
+            'mean_ms': sum(latencies) / len(latencies),
+            'p50_ms': percentile(latencies, 0.50),
+            'p95_ms': percentile(latencies, 0.95),
+            'p99_ms': percentile(latencies, 0.99),
+        }
+    return summary
+
+
+class LoadTest:
+    """
+    Drives a request mix against one client and collects the samples.
+    """
+
+    def __init__(self, client: 'httpx.AsyncClient', args: argparse.Namespace):
+        self.client = client
+        self.args = args
+        self.random = random.Random(args.seed)
+        self.mix = [(op, weight) for op, weight in args.mix.items()
+                    if weight > 0]
+        self.mazes: List[Tuple[int, bytes]] = []
+        self.names: List[str] = []
+        self.samples: List[Tuple[str, int, float]] = []
+        self.issued = 0
+        self.elapsed = 0.0
+
+    async def generate(self, size: int) -> int:
+        """
+        Generates a maze, remembering its name for downloads and its
+        data for solves.
+        """
+        name_ = str(uuid4())
+        response = await self.client.get('/generate_maze', params={
+            'width': size, 'height': size, 'strict': 0.9, 'weight': 0.2,
+            'name_': name_})
+        if response.status_code == 200:
+            self.names = (self.names + [name_])[-50:]
+            match = DATA_URL.search(response.text)
+            if match and len(self.mazes) < 50:
+                data = await self.client.get(match.group(0))
+                if data.status_code == 200:
+                    self.mazes.append((size, data.content))
+        return response.status_code
+
+    async def solve(self) -> int:
+        """
+        Solves a known maze with a random algorithm from the top left
+        corner to a random cell, so most solves miss the solve cache.
+        """
+        size, data = self.random.choice(self.mazes)
+        end = (self.random.randrange(size), self.random.randrange(size))
+        response = await self.client.post('/maze_solver', files={
+            'file': ('maze.json', data)}, data={
+            'solve_algorithm': self.random.choice(self.args.algorithms),
+            'start_coords': '0,0', 'end_coords': f'{end[0]},{end[1]}',
+            'download': 0})
+        return response.status_code
+
+    async def download(self) -> int:
+        """
+        Downloads one of the recently generated mazes.
+        """
+        response = await self.client.get(
+            f'/download/{self.random.choice(self.args.downloads)}/'
+            f'{self.random.choice(self.names[-10:])}')
+        return response.status_code
+
+    async def setup(self) -> None:
+        """
+        Generates one maze per size, unmeasured, so solves and downloads
+        have something to work on from the first request.
+        """
+        for size in self.args.sizes:
+            await self.generate(size)
+        if not self.mazes:
+            raise RuntimeError('Could not generate the setup mazes')
+
+    async def worker(self, deadline: float) -> None:
+        ops, weights = zip(*self.mix)
+        while time.perf_counter() < deadline and (
+                not self.args.requests or self.issued < self.args.requests):
+            self.issued += 1
+            op = self.random.choices(ops, weights)[0]
+            start = time.perf_counter()
+            try:
+                if op == 'generate':
+                    status = await self.generate(
+                        self.random.choice(self.args.sizes))
+                else:
+                    status = await getattr(self, op)()
+            except httpx.HTTPError:
+                status = 0
+            self.samples.append((op, status, time.perf_counter() - start))
+
+    async def run(self) -> float:
+        """
+        Runs `concurrency` workers until the request count or the
+        duration is reached.
+
+        Returns:
+            float: The elapsed seconds.
+        """
+        await self.setup()
+        start = time.perf_counter()
+        deadline = start + (self.args.duration or float('inf'))
+        await asyncio.gather(*(self.worker(deadline)
+                               for _ in range(self.args.concurrency)))
+        return time.perf_counter() - start
+
+
+async def run_in_process(args: argparse.Namespace) -> LoadTest:
+    """
+    Runs the load test against the app in this process.
+    """
+    sys.path.insert(0, ROOT)
+    import maze_app
+    await maze_app.startup()
+    try:
+        transport = httpx.ASGITransport(app=maze_app.app,
+                                        raise_app_exceptions=False)
+        async with httpx.AsyncClient(transport=transport,
+                                     base_url='http://app',
+                                     timeout=args.timeout) as client:
+            test = LoadTest(client, args)
+            test.elapsed = await test.run()
+    finally:
+        await maze_app.shutdown()
+    return test
+
+
+async def run_remote(args: argparse.Namespace, url: str) -> LoadTest:
+    """
+    Runs the load test against a server over HTTP.
+    """
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=url, timeout=args.timeout,
+                                 limits=limits) as client:
+        test = LoadTest(client, args)
+        test.elapsed = await test.run()
+    return test
+
+
+def serve(port: int, workers: int) -> subprocess.Popen:
+    """
+    Starts a local uvicorn serving the app and waits until it answers.
+    """
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'maze_app:app', '--port',
+         str(port), '--workers', str(workers), '--log-level', 'warning'],
+        cwd=ROOT, env=dict(os.environ, MAZE_WORKERS=str(workers)))
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            if httpx.get(f'http://127.0.0.1:{port}/').status_code == 200:
+                return server
+        except httpx.HTTPError:
+            pass
+        if server.poll() is not None:
+            break
+        time.sleep(0.5)
+    server.terminate()
+    raise RuntimeError('uvicorn did not start')
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'],
+                              cwd=ROOT, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_summary(summary: Dict[str, Dict[str, Any]],
+                  previous: Optional[Dict[str, Dict[str, Any]]]) -> None:
+    print(f"{'':<10}{'requests':>9}{'rps':>9}{'errors':>8}"
+          f"{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for op, entry in summary.items():
+        print(f"{op:<10}{entry['requests']:>9}{entry['rps']:>9.1f}"
+              f"{entry['error_rate']:>8.1%}{entry['p50_ms']:>10.1f}"
+              f"{entry['p95_ms']:>10.1f}{entry['p99_ms']:>10.1f}")
+        old = (previous or {}).get(op)
+        if old:
+            print(f"{'  vs prev':<10}{'':>9}"
+                  f"{entry['rps'] / old['rps'] - 1:>+9.0%}"
+                  f"{entry['error_rate'] - old['error_rate']:>+8.1%}"
+                  + ''.join(f"{entry[key] / old[key] - 1:>+10.0%}"
+                            for key in ('p50_ms', 'p95_ms', 'p99_ms')))
+        for status, count in entry['statuses'].items():
+            if not 200 <= int(status) < 300:
+                print(f'  {count} x status {status}')
+
+
+def mix(value: str) -> Dict[str, float]:
+    weights = {}
+    for item in value.split(','):
+        op, _, weight = item.partition('=')
+        if op not in OPERATIONS:
+            raise argparse.ArgumentTypeError(f'unknown operation {op}')
+        weights[op] = float(weight or 1)
+    return weights
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument('--url', help='Drive a running server.')
+    target.add_argument('--serve', action='store_true',
+                        help='Start a local uvicorn and drive it.')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--server-workers', type=int, default=1)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--duration', type=float,
+                        help='Run for this many seconds instead.')
+    parser.add_argument('--mix', type=mix,
+                        default=mix('generate=4,solve=4,download=2'))
+    parser.add_argument('--sizes', type=lambda v: [int(i) for i in
+                                                   v.split(',')],
+                        default=[10, 20, 40])
+    parser.add_argument('--algorithms', type=lambda v: [int(i) for i in
+                                                        v.split(',')],
+                        default=[0, 1, 2, 5])
+    parser.add_argument('--downloads', type=lambda v: v.split(','),
+                        default=['image', 'text', 'zip'])
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--timeout', type=float, default=120)
+    parser.add_argument('--json', dest='json_path')
+    parser.add_argument('--compare', help='A previous --json report.')
+    args = parser.parse_args()
+    if httpx is None:
+        print('benchmarks/load_test.py needs httpx: pip install httpx')
+        return 2
+    if args.duration:
+        args.requests = 0
+
+    server = None
+    try:
+        if args.serve:
+            server = serve(args.port, args.server_workers)
+            args.url = f'http://127.0.0.1:{args.port}'
+        test = asyncio.run(run_remote(args, args.url) if args.url
+                           else run_in_process(args))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    summary = summarize(test.samples, test.elapsed)
+    previous = None
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            previous = json.load(f)['summary']
+    print(f"{len(test.samples)} requests in {test.elapsed:.1f} s, "
+          f"concurrency {args.concurrency}, "
+          f"{args.url or 'in-process'}")
+    print_summary(summary, previous)
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump({
+                'revision': git_revision(),
+                'python': platform.python_version(),
+                'target': args.url or 'in-process',
+                'config': {key: value for key, value in vars(args).items()
+                           if key not in ('json_path', 'compare')},
+                'elapsed': test.elapsed, 'summary': summary}, f, indent=1)
+    return 1 if summary['all']['error_rate'] > 0 else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,344 @@
+"""
+Benchmarks every solver in `path_finding` on seeded mazes, and
+`floyd_warshall` and `all_pairs` on seeded adjacency matrices, and
+compares the results with a stored baseline. `delta_stepping` is also
+checked against `csr_dijkstra` on bucket boundaries. Timings only
+compare on the same machine, so the baseline is not committed: the
+first run stores it, and `--save-baseline` refreshes it, e.g. on the
+commit a change starts from.
+
+Usage:
+    python benchmarks/solvers.py [--sizes 10,30,60] [--strict 0.9,0.5]
+        [--weights 0,0.2,0.5] [--graph-nodes 20,40,80] [--seed 0]
+        [--repeat 3] [--budget 5] [--solvers djikstra,a_star]
+        [--json report.json] [--baseline benchmarks/solvers_baseline.json]
+        [--save-baseline] [--tolerance 0.5] [--expanded-tolerance 0.05]
+"""
+import os
+import sys
+import json
+import time
+import random
+import inspect
+import argparse
+import platform
+import tracemalloc
+
+from functools import partial
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import path_finding  # noqa: E402
+import compiled_graph  # noqa: E402
+from path_finding import djikstra, floyd_warshall  # noqa: E402
+from all_pairs import all_pairs  # noqa: E402
+from maze_methods import (FILE_PREF, generate_maze_,  # noqa: E402
+                          filter_maze_passages)
+from graph_methods import random_weighted_adjacency_matrix  # noqa: E402
+from cost_model import solve_cost  # noqa: E402
+from compiled_graph import (CompiledGraph, csr_dijkstra,  # noqa: E402
+                            delta_stepping)
+
+BASELINE = os.path.join(ROOT, 'benchmarks', 'solvers_baseline.json')
+NAME = 'benchmark_graph'
+
+
+def maze_solvers() -> Dict[str, Callable]:
+    """
+    Finds the maze solvers in `path_finding`: the functions taking a
+    graph, a start and a goal, and filling a `stats` dictionary, but no
+    other argument without a default, such as waypoints or `k`.
+    """
+    solvers = {}
+    for name, func in inspect.getmembers(path_finding, inspect.isfunction):
+        parameters = list(inspect.signature(func).parameters.values())
+        if func.__module__ == 'path_finding' \
+                and [i.name for i in parameters[:2]] == ['graph', 'start'] \
+                and 'stats' in inspect.signature(func).parameters \
+                and all(i.default is not i.empty for i in parameters[3:]):
+            solvers[name] = func
+    return solvers
+
+
+def measure(func: Callable, *args: Any, repeat: int = 3,
+            **kwargs: Any) -> Tuple[Any, float, int]:
+    """
+    Times a call, keeping the best of `repeat` runs, then runs it once
+    more under tracemalloc for its peak memory.
+
+    Returns:
+        Tuple[Any, float, int]: The result, the seconds and the peak
+            traced memory in bytes.
+    """
+    seconds = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        seconds = min(seconds, time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        func(*args, **kwargs)
+        _, peak_memory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, seconds, peak_memory
+
+
+def optimality(cost: Optional[float],
+               best: Optional[float]) -> Optional[float]:
+    """
+    Returns a solution cost relative to Dijkstra's, 1.0 being optimal.
+    """
+    if cost is None or best is None:
+        return None
+    if not best:
+        return 1.0 if cost == best else float('inf')
+    return cost / best
+
+
+def bench_mazes(sizes: List[int], stricts: List[float],
+                weights: List[float], solvers: Dict[str, Callable],
+                seed: int, repeat: int, budget: float
+                ) -> List[Dict[str, Any]]:
+    """
+    Runs every solver on a seeded maze for each combination of size,
+    strictness and weight probability, from one corner to the other.
+    Runs projected by `cost_model.solve_cost` to take longer than
+    `budget` seconds are skipped and reported as such.
+
+    Returns:
+        List[Dict[str, Any]]: One result per maze and solver.
+    """
+    results = []
+    index = 0
+    for size in sizes:
+        for strict in stricts:
+            for weight in weights:
+                random.seed(seed + index)
+                index += 1
+                maze = generate_maze_(size, size, strict, weight, NAME)
+                graph = filter_maze_passages(maze)
+                start, goal = (0, 0), (size - 1, size - 1)
+                case = f'maze {size}x{size} strict={strict} weight={weight}'
+                best = djikstra(graph, start, goal)
+                best = best['cost'] if best else None
+                for name, solver in solvers.items():
+                    entry = {'case': case, 'cells': size * size,
+                             'solver': name}
+                    projected = solve_cost(size * size, name, 0)['seconds']
+                    if projected > budget:
+                        results.append(dict(entry, status='skipped',
+                                            projected=projected))
+                        continue
+                    stats = {}
+                    path, seconds, peak_memory = measure(
+                        solver, graph, start, goal, stats=stats,
+                        repeat=repeat)
+                    cost = path.get('cost') if path else None
+                    results.append(dict(
+                        entry, status='ok' if cost is not None else 'no path',
+                        seconds=seconds, peak_memory=peak_memory,
+                        expanded=stats.get('expanded'), cost=cost,
+                        optimality=optimality(cost, best)))
+                    print(f"{case:<36} {name:<22} {seconds * 1000:9.2f} ms "
+                          f"{stats.get('expanded', 0):>8} expanded  "
+                          f"cost {cost}")
+    return results
+
+
+def bench_all_pairs(graph_nodes: List[int], seed: int, repeat: int,
+                    engines: List[str]) -> List[Dict[str, Any]]:
+    """
+    Runs `floyd_warshall` and `all_pairs.all_pairs` on seeded random
+    adjacency matrices with three edges per node, checking the first to
+    last node distance against Dijkstra's.
+
+    Returns:
+        List[Dict[str, Any]]: One result per matrix size and engine.
+    """
+    results = []
+    for nodes in graph_nodes:
+        random.seed(seed + nodes)
+        matrix = random_weighted_adjacency_matrix(
+            nodes, min(nodes * 3, nodes * (nodes - 1)), 1, 10, NAME)
+        graph = {i: {j: w for j, w in enumerate(row) if w}
+                 for i, row in enumerate(matrix)}
+        best = djikstra(graph, 0, nodes - 1)
+        for name in engines:
+            engine = floyd_warshall if name == 'floyd_warshall' else \
+                partial(all_pairs, processes=1)
+            dist, seconds, peak_memory = measure(engine, matrix,
+                                                 repeat=repeat)
+            cost = dist[0][nodes - 1]
+            cost = None if cost == float('inf') else cost
+            results.append({
+                'case': f'matrix {nodes} nodes', 'cells': nodes,
+                'solver': name,
+                'status': 'ok' if cost is not None else 'no path',
+                'seconds': seconds, 'peak_memory': peak_memory,
+                'expanded': None, 'cost': cost,
+                'optimality': optimality(cost,
+                                         best['cost'] if best else None)})
+            print(f"{results[-1]['case']:<36} {name:<22} "
+                  f"{seconds * 1000:9.2f} ms")
+    return results
+
+
+def check_delta_stepping() -> List[str]:
+    """
+    Runs `delta_stepping` on small graphs against `csr_dijkstra`, with
+    its size gate lifted: float distances on a bucket boundary, such as
+    3 with `delta` 0.1 where `3 // 0.1` is 29 but `30 * 0.1` is 3.0, and
+    a float graph with an endpoint patched in.
+
+    Returns:
+        List[str]: A description of each wrong result.
+    """
+    gate = (compiled_graph.DELTA_STEPPING_NODES,
+            compiled_graph.DELTA_STEPPING_DEGREE)
+    compiled_graph.DELTA_STEPPING_NODES = 0
+    compiled_graph.DELTA_STEPPING_DEGREE = 0
+    boundary = CompiledGraph.from_graph({0: {1: 3}, 1: {2: 0}, 2: {}})
+    cases = [('boundary', boundary, 0, 2, 0.1),
+             ('boundary', boundary, 0, 2, 0.3),
+             ('patched', CompiledGraph.from_graph({0: {1: 0.1}, 1: {}})
+              .patched({0: {'end': 3.1}, 'end': {1: 1.1}}), 0, 1, None)]
+    mismatches = []
+    try:
+        for name, graph, start, goal, delta in cases:
+            expected = csr_dijkstra(graph, start, goal)['cost']
+            cost = delta_stepping(graph, start, goal, delta=delta,
+                                  processes=1)['cost']
+            if cost is None or expected is None or \
+                    abs(cost - expected) > 1e-9:
+                mismatches.append(f'delta_stepping {name} delta={delta}: '
+                                  f'cost {cost}, expected {expected}')
+    finally:
+        (compiled_graph.DELTA_STEPPING_NODES,
+         compiled_graph.DELTA_STEPPING_DEGREE) = gate
+    return mismatches
+
+
+def compare(results: List[Dict[str, Any]], baseline: List[Dict[str, Any]],
+            tolerance: float, min_seconds: float,
+            expanded_tolerance: float) -> List[str]:
+    """
+    Compares results with a baseline run of the same cases.
+
+    Args:
+        results (List[Dict[str, Any]]): The current results.
+        baseline (List[Dict[str, Any]]): The baseline results.
+        tolerance (float): The relative slowdown allowed before flagging
+            a regression.
+        min_seconds (float): Slowdowns smaller than this are noise.
+        expanded_tolerance (float): The relative growth in nodes
+            expanded allowed. The mazes are seeded, so it does not
+            depend on the machine.
+
+    Returns:
+        List[str]: A description of each regression.
+    """
+    before = {(i['case'], i['solver']): i for i in baseline}
+    regressions = []
+    for entry in results:
+        old = before.get((entry['case'], entry['solver']))
+        if old is None or old['status'] == 'skipped':
+            continue
+        label = f"{entry['case']} {entry['solver']}"
+        if entry['status'] != old['status']:
+            regressions.append(f"{label}: {old['status']} -> "
+                               f"{entry['status']}")
+            continue
+        if entry['status'] != 'ok':
+            continue
+        if entry['seconds'] > old['seconds'] * (1 + tolerance) and \
+                entry['seconds'] - old['seconds'] > min_seconds:
+            regressions.append(f"{label}: {old['seconds'] * 1000:.2f} ms "
+                               f"-> {entry['seconds'] * 1000:.2f} ms")
+        if old['expanded'] and entry['expanded'] and \
+                entry['expanded'] > old['expanded'] * (1 + expanded_tolerance):
+            regressions.append(f"{label}: {old['expanded']} -> "
+                               f"{entry['expanded']} nodes expanded")
+        if old['optimality'] is not None and entry['optimality'] is not None \
+                and entry['optimality'] > old['optimality'] + 1e-9:
+            regressions.append(f"{label}: optimality "
+                               f"{old['optimality']:.3f} -> "
+                               f"{entry['optimality']:.3f}")
+    return regressions
+
+
+def floats(value: str) -> List[float]:
+    return [float(i) for i in value.split(',') if i]
+
+
+def ints(value: str) -> List[int]:
+    return [int(i) for i in value.split(',') if i]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--sizes', type=ints, default=[10, 30, 60])
+    parser.add_argument('--strict', type=floats, default=[0.9, 0.5])
+    parser.add_argument('--weights', type=floats, default=[0.0, 0.2, 0.5])
+    parser.add_argument('--graph-nodes', type=ints, default=[20, 40, 80])
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--budget', type=float, default=5.0,
+                        help='Skip runs projected to take longer (s).')
+    parser.add_argument('--solvers', type=lambda v: v.split(','),
+                        help='Only run these solvers.')
+    parser.add_argument('--json', dest='json_path')
+    parser.add_argument('--baseline', default=BASELINE)
+    parser.add_argument('--save-baseline', action='store_true',
+                        help='Store the results as the new baseline.')
+    parser.add_argument('--tolerance', type=float, default=0.5)
+    parser.add_argument('--min-seconds', type=float, default=0.02)
+    parser.add_argument('--expanded-tolerance', type=float, default=0.05)
+    args = parser.parse_args()
+
+    solvers = maze_solvers()
+    if args.solvers:
+        solvers = {name: solvers[name] for name in args.solvers
+                   if name in solvers}
+    results = bench_mazes(args.sizes, args.strict, args.weights, solvers,
+                          args.seed, args.repeat, args.budget)
+    engines = [name for name in ('floyd_warshall', 'all_pairs')
+               if not args.solvers or name in args.solvers]
+    if engines:
+        results += bench_all_pairs(args.graph_nodes, args.seed,
+                                   args.repeat, engines)
+    mismatches = check_delta_stepping()
+    if os.path.exists(data_ := os.path.join(FILE_PREF, f'{NAME}.json')):
+        os.remove(data_)
+    report = {'python': platform.python_version(),
+              'machine': platform.machine(), 'seed': args.seed,
+              'results': results}
+    for entry in results:
+        if entry['status'] == 'skipped':
+            print(f"skipped {entry['case']} {entry['solver']}: projected "
+                  f"{entry['projected']:.1f} s")
+        elif entry['optimality'] is not None and entry['optimality'] > 1:
+            print(f"suboptimal {entry['case']} {entry['solver']}: "
+                  f"{entry['optimality']:.3f}x the optimal cost")
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump(report, f, indent=1)
+    if args.save_baseline or not os.path.exists(args.baseline):
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=1)
+        print(f'saved the baseline to {args.baseline}')
+        regressions = mismatches
+    else:
+        with open(args.baseline, 'r') as f:
+            regressions = mismatches + compare(
+                results, json.load(f)['results'], args.tolerance,
+                args.min_seconds, args.expanded_tolerance)
+    for regression in regressions:
+        print(f'regression: {regression}')
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,929 @@
+import os
+import math
+import heapq
+
+from array import array
+from itertools import repeat
+from collections import ChainMap, OrderedDict, deque
+from collections.abc import Mapping
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing.shared_memory import SharedMemory
+
+from typing import (Any, Callable, Dict, Iterable, Iterator, List, Optional,
+                    Set, Tuple, Union)
+
+from all_pairs import to_adjacency
+from path_finding import PROGRESS_INTERVAL, record_stats, spfa
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+COMPILE_GRAPHS = os.environ.get('MAZE_COMPILE_GRAPHS', '1') != '0'
+# Compiled mazes each worker process keeps, for repeated solves.
+COMPILED_CACHE_SIZE = int(os.environ.get('MAZE_COMPILED_CACHE_SIZE', 8))
+# BFS levels with fewer nodes than this are expanded in Python, as
+# NumPy's per-call overhead outweighs what it saves on narrow frontiers
+# such as a maze's corridors. From both ends on a 1000x1000 grid with 80%
+# of its passages open, `frontier_bfs` takes 445, 417 and 559 ms with 32,
+# 128 and 512, against 1035 ms for `csr_bfs` and 1052 ms all in Python.
+VECTOR_FRONTIER = 128
+# `delta_stepping` only beats `csr_dijkstra` on graphs this large with
+# this many edges per node. On braided grids it breaks even at about
+# 50000 nodes and halves the time at 360000, but on perfect mazes, with
+# two edges per node, its buckets hold a handful of nodes and it is up
+# to 18 times slower.
+DELTA_STEPPING_NODES = int(os.environ.get('MAZE_DELTA_STEPPING_NODES',
+                                          100000))
+DELTA_STEPPING_DEGREE = 3.0
+# It runs inside the server's own pool workers, which already have a
+# core each, so it only spreads over more processes when asked to.
+DELTA_STEPPING_PROCESSES = int(os.environ.get(
+    'MAZE_DELTA_STEPPING_PROCESSES', 1))
+# Buckets with fewer nodes to relax are relaxed in this process. A
+# pool round trip costs about 1 ms, which 4 cores win back from about
+# 4000 nodes.
+PARALLEL_RELAX_NODES = 8192
+
+Weight = Union[int, float]
+
+memory: 'OrderedDict[str, CompiledGraph]' = OrderedDict()
+# The pool `delta_stepping` relaxes wide buckets on, if it uses one.
+relax_pool: Optional[ProcessPoolExecutor] = None
+# The layout of the shared memory blocks a pool worker of
+# `delta_stepping` last attached to, the blocks and the arrays over them.
+shared: Tuple[Tuple[Tuple[str, int, str], ...], List[SharedMemory],
+              Tuple[Any, ...]] = ((), [], ())
+
+
+class CompiledGraph(Mapping):
+    """
+    A graph compiled once into compressed sparse rows: its nodes are
+    numbered 0 to n - 1 and the edges of node i are the neighbor numbers
+    `indices[indptr[i]:indptr[i + 1]]`, weighing `weights` at the same
+    positions, all in flat arrays. The `csr_` solvers then index arrays
+    instead of hashing node keys on every relaxation.
+
+    It also reads as the dict graph it came from, building each node's
+    neighbors on access, so the other solvers accept it too.
+    """
+
+    def __init__(self, nodes: List[Any], indptr: array, indices: array,
+                 weights: array, index: Optional[Dict[Any, int]] = None,
+                 patches: Optional[Dict[int, List[Tuple[int, Weight]]]]
+                 = None, derived: Optional[Dict[str, Any]] = None):
+        self.nodes = nodes
+        self.index = {node: i for i, node in enumerate(nodes)} \
+            if index is None else index
+        self.indptr = indptr
+        self.indices = indices
+        self.weights = weights
+        # Nodes whose edges were replaced by `patched`, mapped to them.
+        self.patches = patches or {}
+        # Arrays computed from the compiled ones, shared with patched
+        # copies, such as the reversed rows.
+        self.derived = {} if derived is None else derived
+
+    @classmethod
+    def from_graph(cls, graph: Union[List[List[Weight]],
+                                     Dict[Any, Dict[Any, Weight]]]
+                   ) -> 'CompiledGraph':
+        """
+        Compiles a dict graph, such as a maze or the letter and coords
+        graphs of `graph_methods`, or an adjacency matrix where 0 or inf
+        means no edge, whose nodes are then its row numbers.
+        """
+        if not isinstance(graph, dict):
+            nodes, adjacency = to_adjacency(graph)
+            graph = {i: dict(neighbors)
+                     for i, neighbors in enumerate(adjacency)}
+        nodes = list(graph)
+        index = {node: i for i, node in enumerate(nodes)}
+        for neighbors in graph.values():
+            for neighbor in neighbors:
+                if neighbor not in index:
+                    index[neighbor] = len(nodes)
+                    nodes.append(neighbor)
+        # Filled row by row, without a tuple per edge.
+        indptr, indices, weights = array('q', [0]), array('q'), []
+        for node in nodes:
+            neighbors = graph.get(node, {})
+            if node in neighbors:
+                neighbors = {i: weight for i, weight in neighbors.items()
+                             if i != node}
+            indices.extend(map(index.__getitem__, neighbors))
+            weights.extend(neighbors.values())
+            indptr.append(len(indices))
+        integral = all(type(weight) is int for weight in weights)
+        return cls(nodes, indptr, indices,
+                   array('q' if integral else 'd', weights), index)
+
+    def edges(self, i: int) -> Iterable[Tuple[int, Weight]]:
+        """
+        Returns the (neighbor number, weight) pairs of node number `i`.
+        """
+        patch = self.patches.get(i)
+        if patch is not None:
+            return patch
+        start, end = self.indptr[i], self.indptr[i + 1]
+        return zip(self.indices[start:end], self.weights[start:end])
+
+    def patched(self, graph: Dict[Any, Dict[Any, Weight]]
+                ) -> 'CompiledGraph':
+        """
+        Returns the graph with the edges of some nodes replaced, adding
+        those it does not have, e.g. endpoints spliced into a corridor
+        by `corridors.splice_endpoints`. The arrays are shared, so it
+        costs the size of the change rather than of the graph.
+        """
+        added = {}
+        for node, neighbors in graph.items():
+            for i in (node, *neighbors):
+                if i not in self.index and i not in added:
+                    added[i] = len(self.nodes) + len(added)
+        index = ChainMap(added, self.index) if added else self.index
+        patches = dict(self.patches)
+        patches.update({i: [] for i in added.values()})
+        for node, neighbors in graph.items():
+            patches[index[node]] = [(index[neighbor], weight)
+                                    for neighbor, weight in neighbors.items()]
+        return CompiledGraph(self.nodes + list(added), self.indptr,
+                             self.indices, self.weights, index, patches,
+                             self.derived)
+
+    def reverse_rows(self) -> Tuple[array, array]:
+        """
+        Returns the compiled edges reversed, as `indptr` and `indices`
+        arrays listing the nodes with an edge into each node. They are
+        computed once, with NumPy, and ignore the patches.
+        """
+        if 'reverse' not in self.derived:
+            indptr = np.frombuffer(self.indptr, dtype=np.int64)
+            indices = np.frombuffer(self.indices, dtype=np.int64)
+            n = len(indptr) - 1
+            sources = np.repeat(np.arange(n), np.diff(indptr))
+            order = np.argsort(indices, kind='stable')
+            reverse_indptr = np.zeros(n + 1, dtype=np.int64)
+            np.cumsum(np.bincount(indices, minlength=n),
+                      out=reverse_indptr[1:])
+            self.derived['reverse'] = (array('q', reverse_indptr.tobytes()),
+                                       array('q', sources[order].tobytes()))
+        return self.derived['reverse']
+
+    def is_tree(self) -> bool:
+        """
+        Checks that the graph is an undirected tree, as
+        `path_finding.is_tree` does for a dict graph: it has two edges
+        per node but one, each edge goes back with the same weight and
+        they all join up. With NumPy the edges are matched both ways by
+        sorting, for the compiled edges, whose answer is then kept as
+        `reverse_rows` is; a patched copy checks itself edge by edge.
+        """
+        if not self.patches and 'tree' in self.derived:
+            return self.derived['tree']
+        n, indptr, indices = len(self.nodes), self.indptr, self.indices
+        patches = self.patches
+        edges = len(indices) + sum(
+            len(patch) - (indptr[i + 1] - indptr[i] if i < len(indptr) - 1
+                          else 0)
+            for i, patch in patches.items())
+        tree = n > 0 and edges == 2 * (n - 1)
+        if tree and np is not None and not patches:
+            targets = np.frombuffer(indices, dtype=np.int64)
+            sources = np.repeat(np.arange(n), np.diff(
+                np.frombuffer(indptr, dtype=np.int64)))
+            weights = np.frombuffer(self.weights, dtype=(
+                np.int64 if self.weights.typecode == 'q' else np.float64))
+            pairs, back = sources * n + targets, targets * n + sources
+            order, back_order = np.argsort(pairs), np.argsort(back)
+            tree = bool(np.array_equal(pairs[order], back[back_order])
+                        and np.array_equal(weights[order],
+                                           weights[back_order]))
+        elif tree:
+            for node in range(n):
+                for neighbor, weight in self.edges(node):
+                    if weight not in [back for j, back in
+                                      self.edges(neighbor) if j == node]:
+                        tree = False
+                        break
+                if not tree:
+                    break
+        if tree:
+            seen = bytearray(n)
+            seen[0], stack = 1, [0]
+            while stack:
+                node = stack.pop()
+                patch = patches.get(node)
+                for neighbor in [j for j, _ in patch] if patch is not None \
+                        else indices[indptr[node]:indptr[node + 1]]:
+                    if not seen[neighbor]:
+                        seen[neighbor] = 1
+                        stack.append(neighbor)
+            tree = seen.count(1) == n
+        if not patches:
+            self.derived['tree'] = tree
+        return tree
+
+    def weight_range(self) -> Tuple[Weight, Weight]:
+        """
+        Returns the lightest and the heaviest edge weight, 0 and 0 if
+        there are no edges.
+        """
+        weights = [weight for patch in self.patches.values()
+                   for _, weight in patch]
+        if self.weights:
+            weights += [min(self.weights), max(self.weights)]
+        return min(weights, default=0), max(weights, default=0)
+
+    def __getitem__(self, node: Any) -> Dict[Any, Weight]:
+        return {self.nodes[j]: weight
+                for j, weight in self.edges(self.index[node])}
+
+    def __contains__(self, node: Any) -> bool:
+        return node in self.index
+
+    def __iter__(self) -> Iterator[Any]:
+        return iter(self.nodes)
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+
+def compiled_graph(graph: Dict[Any, Dict[Any, Weight]],
+                   key: Optional[str] = None) -> CompiledGraph:
+    """
+    Returns the compiled form of a graph, from this process's LRU if it
+    was compiled before under the same key.
+
+    Args:
+        graph (Dict[Any, Dict[Any, Weight]]): The graph.
+        key (str, optional): The maze's content hash, and which form of
+            it this is. Without one nothing is cached.
+
+    Returns:
+        CompiledGraph: The graph in compressed sparse rows.
+    """
+    if key is None:
+        return CompiledGraph.from_graph(graph)
+    if key in memory:
+        memory.move_to_end(key)
+        return memory[key]
+    compiled = memory[key] = CompiledGraph.from_graph(graph)
+    while len(memory) > COMPILED_CACHE_SIZE:
+        memory.popitem(last=False)
+    return compiled
+
+
+def trace_back(came_from: array, node: int, root: int) -> List[int]:
+    """
+    Follows the parent numbers of a search from `node` up to its root.
+    """
+    path = [node]
+    while path[-1] != root:
+        path.append(came_from[path[-1]])
+    return path
+
+
+def trace_indices(graph: CompiledGraph, came_from: array, source: int,
+                  target: int) -> Dict[str, Any]:
+    """
+    Follows the parent numbers of a search back from `target` and adds
+    up the path's cost.
+
+    Returns:
+        Dict[str, Any]: The 'path' as a list of nodes and its 'cost', or
+            an empty path and a None cost if the target was not reached.
+    """
+    if target != source and came_from[target] < 0:
+        return {'path': [], 'cost': None}
+    return path_result(graph, trace_back(came_from, target, source)[::-1])
+
+
+def path_result(graph: CompiledGraph, path: List[int]) -> Dict[str, Any]:
+    """
+    Returns a path of node numbers as nodes, with its cost.
+    """
+    cost = 0
+    indptr, indices, weights = graph.indptr, graph.indices, graph.weights
+    for a, b in zip(path[:-1], path[1:]):
+        if a in graph.patches:
+            cost += min(weight for j, weight in graph.patches[a] if j == b)
+        else:
+            cost += min(weights[i] for i in range(indptr[a], indptr[a + 1])
+                        if indices[i] == b)
+    return {'path': [graph.nodes[i] for i in path], 'cost': cost}
+
+
+def csr_dijkstra(graph: CompiledGraph, start: Any, goal: Any,
+                 stats: Optional[Dict[str, int]] = None,
+                 progress: Optional[Callable[[int, int, Any], None]] = None
+                 ) -> Dict[str, Any]:
+    """
+    Dijkstra's algorithm over a compiled graph, keeping the distances
+    and parents in flat buffers indexed by node number. Weights must
+    not be negative.
+
+    Args:
+        graph (CompiledGraph): The graph.
+        start (Any): The starting node.
+        goal (Any): The goal node.
+        stats (Dict[str, int], optional): A dictionary filled with the
+            search effort.
+        progress (Callable[[int, int, Any], None], optional): Called
+            every `PROGRESS_INTERVAL` expansions with the nodes
+            expanded, the frontier size and the distance reached.
+
+    Returns:
+        Dict[str, Any]: The 'path' as a list of nodes and its 'cost', or
+            an empty path and a None cost if no path exists.
+    """
+    if start not in graph.index or goal not in graph.index:
+        return {'path': [], 'cost': None}
+    indptr, indices, weights = graph.indptr, graph.indices, graph.weights
+    patches = graph.patches
+    source, target = graph.index[start], graph.index[goal]
+    distances = [math.inf] * len(graph.nodes)
+    came_from = array('q', [-1]) * len(graph.nodes)
+    distances[source] = 0
+    heap = [(0, source)]
+    expanded = peak = relaxations = 0
+    while heap:
+        distance, node = heapq.heappop(heap)
+        if distance > distances[node]:
+            continue
+        expanded += 1
+        if progress is not None and expanded % PROGRESS_INTERVAL == 0:
+            progress(expanded, len(heap), distance)
+        if node == target:
+            break
+        patch = patches.get(node)
+        for neighbor, weight in patch if patch is not None else zip(
+                indices[indptr[node]:indptr[node + 1]],
+                weights[indptr[node]:indptr[node + 1]]):
+            new_distance = distance + weight
+            if new_distance < distances[neighbor]:
+                distances[neighbor] = new_distance
+                came_from[neighbor] = node
+                relaxations += 1
+                heapq.heappush(heap, (new_distance, neighbor))
+        if len(heap) > peak:
+            peak = len(heap)
+    record_stats(stats, expanded, peak, relaxations)
+    return trace_indices(graph, came_from, source, target)
+
+
+def csr_bfs(graph: CompiledGraph, start: Any, goal: Any,
+            stats: Optional[Dict[str, int]] = None,
+            progress: Optional[Callable[[int, int, Any], None]] = None
+            ) -> Dict[str, Any]:
+    """
+    Finds the path with the fewest edges over a compiled graph, as
+    `path_finding.bfs_uniform` does over a dict graph. It is the
+    shortest path when all the edges weigh the same.
+
+    Args:
+        graph, start, goal, stats: As for `csr_dijkstra`.
+        progress (Callable[[int, int, Any], None], optional): As for
+            `csr_dijkstra`, with None for the distance.
+
+    Returns:
+        Dict[str, Any]: As for `csr_dijkstra`.
+    """
+    if start not in graph.index or goal not in graph.index:
+        return {'path': [], 'cost': None}
+    indptr, indices, patches = graph.indptr, graph.indices, graph.patches
+    source, target = graph.index[start], graph.index[goal]
+    came_from = array('q', [-1]) * len(graph.nodes)
+    came_from[source] = source
+    frontier = deque([source])
+    expanded = peak = relaxations = 0
+    while frontier:
+        node = frontier.popleft()
+        expanded += 1
+        if progress is not None and expanded % PROGRESS_INTERVAL == 0:
+            progress(expanded, len(frontier), None)
+        if node == target:
+            break
+        patch = patches.get(node)
+        for neighbor in [j for j, _ in patch] if patch is not None \
+                else indices[indptr[node]:indptr[node + 1]]:
+            if came_from[neighbor] < 0:
+                came_from[neighbor] = node
+                relaxations += 1
+                frontier.append(neighbor)
+        if len(frontier) > peak:
+            peak = len(frontier)
+    record_stats(stats, expanded, peak, relaxations)
+    return trace_indices(graph, came_from, source, target)
+
+
+def expand_level(frontier: List[int], rows: Tuple[array, array, Any, Any],
+                 skip: Set[int], extra: Dict[int, List[int]], drop: Set[int],
+                 came_from: array, distances: array, depth: int
+                 ) -> List[int]:
+    """
+    Visits the unvisited neighbors of a whole BFS level, recording their
+    parents and depth: in Python for a narrow level, and with NumPy
+    gathers over the CSR rows for a wide one.
+
+    Args:
+        frontier (List[int]): The node numbers of the level.
+        rows (Tuple[array, array, Any, Any]): The `indptr` and `indices`
+            to follow, as arrays and as NumPy views of them.
+        skip (Set[int]): The nodes whose rows do not apply, having been
+            patched or added.
+        extra (Dict[int, List[int]]): Neighbors to follow instead or as
+            well, from the patches.
+        drop (Set[int]): The neighbors the rows list wrongly, as their
+            own edges were patched.
+        came_from (array): The parent numbers, -1 for unvisited nodes.
+        distances (array): The depths of the visited nodes.
+        depth (int): The depth of the next level.
+
+    Returns:
+        List[int]: The next level.
+    """
+    indptr, indices, indptr_np, indices_np = rows
+    if len(frontier) < VECTOR_FRONTIER:
+        level = []
+        for node in frontier:
+            neighbors = () if node in skip else \
+                indices[indptr[node]:indptr[node + 1]]
+            for neighbor in neighbors:
+                if came_from[neighbor] < 0 and neighbor not in drop:
+                    came_from[neighbor] = node
+                    distances[neighbor] = depth
+                    level.append(neighbor)
+            for neighbor in extra.get(node, ()):
+                if came_from[neighbor] < 0:
+                    came_from[neighbor] = node
+                    distances[neighbor] = depth
+                    level.append(neighbor)
+        return level
+    parents = np.frombuffer(came_from, dtype=np.int64)
+    nodes = np.array(frontier, dtype=np.int64)
+    if skip:
+        nodes = nodes[~np.isin(nodes, list(skip))]
+    starts = indptr_np[nodes]
+    counts = indptr_np[nodes + 1] - starts
+    # The position of every edge of the level in `indices`.
+    offsets = np.repeat(starts - np.cumsum(counts) + counts, counts) + \
+        np.arange(counts.sum())
+    neighbors = indices_np[offsets]
+    sources = np.repeat(nodes, counts)
+    fresh = parents[neighbors] < 0
+    if drop:
+        fresh &= ~np.isin(neighbors, list(drop))
+    neighbors, first = np.unique(neighbors[fresh], return_index=True)
+    parents[neighbors] = sources[fresh][first]
+    np.frombuffer(distances, dtype=np.int64)[neighbors] = depth
+    level = neighbors.tolist()
+    for node in set(extra).intersection(frontier):
+        for neighbor in extra[node]:
+            if came_from[neighbor] < 0:
+                came_from[neighbor] = node
+                distances[neighbor] = depth
+                level.append(neighbor)
+    return level
+
+
+def frontier_bfs(graph: CompiledGraph, start: Any, goal: Any,
+                 bidirectional: bool = True,
+                 stats: Optional[Dict[str, int]] = None,
+                 progress: Optional[Callable[[int, int, Any], None]] = None
+                 ) -> Dict[str, Any]:
+    """
+    Finds the path with the fewest edges a level at a time, expanding
+    each wide level with NumPy operations on the compiled arrays instead
+    of a node at a time. Searching from both ends, it grows the smaller
+    frontier each time, over the reversed edges from the goal, and
+    stops after the first level where the two meet. It is the shortest
+    path when all the edges weigh the same. Without NumPy installed, or
+    on a graph with fewer edges than two per node, such as a perfect
+    maze, whose levels stay too narrow to gain from it, it runs
+    `csr_bfs`.
+
+    Args:
+        graph (CompiledGraph): The graph.
+        start (Any): The starting node.
+        goal (Any): The goal node.
+        bidirectional (bool, optional): Whether to search from the goal
+            too. Defaults to True.
+        stats (Dict[str, int], optional): A dictionary filled with the
+            search effort.
+        progress (Callable[[int, int, Any], None], optional): Called
+            after a level once another `PROGRESS_INTERVAL` nodes were
+            expanded, with the nodes expanded, the frontier size and
+            None, as the search counts edges rather than costs.
+
+    Returns:
+        Dict[str, Any]: The 'path' as a list of nodes and its 'cost', or
+            an empty path and a None cost if no path exists.
+    """
+    n, compiled = len(graph.nodes), len(graph.indptr) - 1
+    if np is None or len(graph.indices) < 2 * compiled:
+        return csr_bfs(graph, start, goal, stats=stats, progress=progress)
+    if start not in graph.index or goal not in graph.index:
+        return {'path': [], 'cost': None}
+    source, target = graph.index[start], graph.index[goal]
+    patched, added = set(graph.patches), set(range(compiled, n))
+    forward = (graph.indptr, graph.indices,
+               np.frombuffer(graph.indptr, dtype=np.int64),
+               np.frombuffer(graph.indices, dtype=np.int64))
+    sides = [(forward, patched,
+              {i: [j for j, _ in edges] for i, edges in graph.patches.items()},
+              set())]
+    if bidirectional:
+        reverse_indptr, reverse_indices = graph.reverse_rows()
+        reverse: Dict[int, List[int]] = {}
+        for i, edges in graph.patches.items():
+            for j, _ in edges:
+                reverse.setdefault(j, []).append(i)
+        sides.append(((reverse_indptr, reverse_indices,
+                       np.frombuffer(reverse_indptr, dtype=np.int64),
+                       np.frombuffer(reverse_indices, dtype=np.int64)),
+                      added, reverse, patched))
+    came_from = [array('q', [-1]) * n, array('q', [-1]) * n]
+    distances = [array('q', [-1]) * n, array('q', [-1]) * n]
+    came_from[0][source], came_from[1][target] = source, target
+    distances[0][source], distances[1][target] = 0, 0
+    frontiers, depths = [[source], [target]], [0, 0]
+    meeting = source if source == target else None
+    expanded = peak = relaxations = reported = 0
+    while meeting is None and frontiers[0] and frontiers[1]:
+        side = 1 if bidirectional and \
+            len(frontiers[1]) < len(frontiers[0]) else 0
+        rows, skip, extra, drop = sides[side]
+        depths[side] += 1
+        expanded += len(frontiers[side])
+        level = expand_level(frontiers[side], rows, skip, extra, drop,
+                             came_from[side], distances[side], depths[side])
+        frontiers[side] = level
+        relaxations += len(level)
+        peak = max(peak, len(level))
+        other = distances[1 - side]
+        meets = [i for i in level if other[i] >= 0] if \
+            len(level) < VECTOR_FRONTIER else np.asarray(level)[
+                np.frombuffer(other, dtype=np.int64)[level] >= 0].tolist()
+        if meets:
+            meeting = min(meets, key=other.__getitem__)
+        if progress is not None and \
+                expanded // PROGRESS_INTERVAL > reported:
+            reported = expanded // PROGRESS_INTERVAL
+            progress(expanded, len(level), None)
+    record_stats(stats, expanded, peak, relaxations)
+    if meeting is None:
+        return {'path': [], 'cost': None}
+    return path_result(graph, trace_back(came_from[0], meeting, source)[::-1]
+                       + trace_back(came_from[1], meeting, target)[1:])
+
+
+def csr_breadth_first(graph: CompiledGraph, start: Any, goal: Any,
+                      stats: Optional[Dict[str, int]] = None,
+                      progress: Optional[Callable[[int, int, Any], None]]
+                      = None) -> Dict[str, Any]:
+    """
+    `path_finding.bfs` over a compiled graph. When every edge weighs the
+    same and not less than 0, e.g. an unweighted maze, compressed or
+    not, the fewest edges are the cheapest and `frontier_bfs` finds
+    them. Otherwise it searches as `bfs` does, queueing a node again
+    whenever a cheaper way to it turns up and stopping when the goal
+    comes off the queue.
+
+    Args:
+        graph, start, goal, stats, progress: As for `csr_dijkstra`.
+
+    Returns:
+        Dict[str, Any]: As for `csr_dijkstra`.
+    """
+    lightest, heaviest = graph.weight_range()
+    if 0 <= lightest == heaviest:
+        return frontier_bfs(graph, start, goal, stats=stats,
+                            progress=progress)
+    if start not in graph.index or goal not in graph.index:
+        return {'path': [], 'cost': None}
+    indptr, indices, weights = graph.indptr, graph.indices, graph.weights
+    patches = graph.patches
+    source, target = graph.index[start], graph.index[goal]
+    costs = [math.inf] * len(graph.nodes)
+    came_from = array('q', [-1]) * len(graph.nodes)
+    costs[source], came_from[source] = 0, source
+    frontier = deque([(source, 0)])
+    expanded = peak = relaxations = 0
+    while frontier:
+        node, cost = frontier.popleft()
+        expanded += 1
+        if progress is not None and expanded % PROGRESS_INTERVAL == 0:
+            progress(expanded, len(frontier), cost)
+        if node == target:
+            break
+        patch = patches.get(node)
+        for neighbor, weight in patch if patch is not None else zip(
+                indices[indptr[node]:indptr[node + 1]],
+                weights[indptr[node]:indptr[node + 1]]):
+            new_cost = cost + weight
+            if new_cost < costs[neighbor]:
+                frontier.append((neighbor, new_cost))
+                costs[neighbor] = new_cost
+                came_from[neighbor] = node
+                relaxations += 1
+        if len(frontier) > peak:
+            peak = len(frontier)
+    record_stats(stats, expanded, peak, relaxations)
+    return trace_indices(graph, came_from, source, target)
+
+
+def shared_rows(layout: Tuple[Tuple[str, int, str], ...]
+                ) -> Tuple[Any, ...]:
+    """
+    Returns the arrays over the shared memory blocks of a pool worker's
+    task, laid out as (name, size, dtype) each. The worker attaches to
+    them on its first task of a search and lets go of the last search's.
+    """
+    global shared
+    if shared[0] != layout:
+        blocks = shared[1]
+        shared = ((), [], ())
+        for block in blocks:
+            block.close()
+        blocks = [SharedMemory(name) for name, _, _ in layout]
+        shared = (layout, blocks, tuple(
+            np.ndarray((size,), dtype, buffer=block.buf)
+            for block, (_, size, dtype) in zip(blocks, layout)))
+    return shared[2]
+
+
+def get_relax_pool(processes: int) -> ProcessPoolExecutor:
+    """
+    Returns this process's pool for `delta_stepping`, started on first
+    use and kept, so searches do not pay for starting processes.
+    """
+    global relax_pool
+    if relax_pool is None:
+        relax_pool = ProcessPoolExecutor(max_workers=processes)
+    return relax_pool
+
+
+def drop_relax_pool() -> None:
+    """
+    Shuts down a pool that failed, e.g. in a daemonic process that may
+    not start children.
+    """
+    global relax_pool
+    if relax_pool is not None:
+        relax_pool.shutdown(wait=False)
+        relax_pool = None
+
+
+def relax_edges(nodes: Any, light: bool, delta: float,
+                rows: Optional[Tuple[Any, ...]] = None,
+                layout: Optional[Tuple[Tuple[str, int, str], ...]] = None
+                ) -> Tuple[Any, Any, Any]:
+    """
+    Relaxes the light edges, weighing at most `delta`, or the heavy ones
+    of some nodes, with NumPy gathers over the compiled rows.
+
+    Args:
+        nodes (Any): A NumPy array of the node numbers.
+        light (bool): Whether to relax the light or the heavy edges.
+        delta (float): The bucket width.
+        rows (Tuple[Any, ...], optional): The `indptr`, `indices`,
+            `weights` and distances arrays.
+        layout (Tuple[Tuple[str, int, str], ...], optional): Where a
+            pool worker finds them in shared memory instead, see
+            `shared_rows`.
+
+    Returns:
+        Tuple[Any, Any, Any]: The nodes whose distance would improve,
+            their new distance and the node it comes from, the lightest
+            only for each.
+    """
+    indptr, indices, weights, distances = rows or shared_rows(layout)
+    starts = indptr[nodes]
+    counts = indptr[nodes + 1] - starts
+    offsets = np.repeat(starts - np.cumsum(counts) + counts, counts) + \
+        np.arange(counts.sum())
+    edge_weights = weights[offsets]
+    keep = edge_weights <= delta if light else edge_weights > delta
+    sources = np.repeat(nodes, counts)[keep]
+    targets = indices[offsets[keep]]
+    candidates = distances[sources] + edge_weights[keep]
+    better = candidates < distances[targets]
+    return lightest_requests(targets[better], candidates[better],
+                             sources[better])
+
+
+def lightest_requests(targets: Any, distances: Any, sources: Any
+                      ) -> Tuple[Any, Any, Any]:
+    """
+    Keeps the lightest of the relaxation requests for each target.
+    """
+    order = np.lexsort((distances, targets))
+    targets = targets[order]
+    first = np.ones(len(targets), dtype=bool)
+    first[1:] = targets[1:] != targets[:-1]
+    return targets[first], distances[order][first], sources[order][first]
+
+
+def wide_graph(graph: CompiledGraph) -> bool:
+    """
+    Whether a graph is large enough, with enough edges per node, for
+    `delta_stepping` to beat `csr_dijkstra`, and NumPy is installed.
+    """
+    return np is not None and len(graph) >= DELTA_STEPPING_NODES and \
+        len(graph.indices) >= DELTA_STEPPING_DEGREE * (len(graph.indptr) - 1)
+
+
+def delta_stepping(graph: CompiledGraph, start: Any, goal: Any,
+                   delta: Optional[float] = None,
+                   processes: Optional[int] = None,
+                   stats: Optional[Dict[str, int]] = None,
+                   progress: Optional[Callable[[int, int, Any], None]] = None
+                   ) -> Dict[str, Any]:
+    """
+    Delta-stepping shortest paths for large graphs: nodes are kept in
+    buckets `delta` wide by tentative distance, and the lowest bucket is
+    emptied by relaxing the light edges of all its nodes at once, as
+    often as that refills it, and then their heavy edges, which cannot.
+    The relaxations run as NumPy operations, split over `processes`
+    worker processes reading the compiled arrays and the distances from
+    shared memory once a bucket holds `PARALLEL_RELAX_NODES` nodes.
+    Weights must not be negative.
+
+    Graphs `wide_graph` rejects are solved with `csr_dijkstra` instead.
+    The pool is started on first use and kept for the process. If it
+    cannot be started, e.g. from inside a daemonic worker, the buckets
+    are relaxed in this process.
+
+    Args:
+        graph (CompiledGraph): The graph.
+        start (Any): The starting node.
+        goal (Any): The goal node.
+        delta (float, optional): The bucket width. Defaults to the
+            heaviest weight over the mean number of edges per node.
+        processes (int, optional): The processes to relax over.
+            Defaults to `DELTA_STEPPING_PROCESSES`.
+        stats (Dict[str, int], optional): A dictionary filled with the
+            search effort.
+        progress (Callable[[int, int, Any], None], optional): Called
+            after each bucket once another `PROGRESS_INTERVAL` nodes
+            were expanded, with the nodes expanded, the nodes left in
+            buckets and the distance reached.
+
+    Returns:
+        Dict[str, Any]: The 'path' as a list of nodes and its 'cost', or
+            an empty path and a None cost if no path exists.
+    """
+    if not wide_graph(graph):
+        return csr_dijkstra(graph, start, goal, stats=stats,
+                            progress=progress)
+    if start not in graph.index or goal not in graph.index:
+        return {'path': [], 'cost': None}
+    n, compiled = len(graph.nodes), len(graph.indptr) - 1
+    source, target = graph.index[start], graph.index[goal]
+    # The compiled arrays and the distances, copied into shared memory
+    # for the pool workers.
+    rows = [np.frombuffer(graph.indptr, dtype=np.int64),
+            np.frombuffer(graph.indices, dtype=np.int64),
+            np.frombuffer(graph.weights, dtype=np.int64
+                          if graph.weights.typecode == 'q' else np.float64),
+            np.empty(n, dtype=np.float64)]
+    if delta is None:
+        delta = rows[2].max(initial=0) / max(len(rows[1]) / compiled, 1)
+    delta = delta or 1
+    processes = processes or DELTA_STEPPING_PROCESSES
+    patched = np.array(sorted(graph.patches), dtype=np.int64)
+    blocks, layout = [], None
+    try:
+        try:
+            while processes > 1 and len(blocks) < len(rows):
+                blocks.append(SharedMemory(
+                    create=True, size=max(rows[len(blocks)].nbytes, 1)))
+        except OSError:
+            processes = 1
+        if processes > 1:
+            layout = tuple((block.name, len(values), values.dtype.str)
+                           for block, values in zip(blocks, rows))
+            for i, block in enumerate(blocks):
+                values = rows[i]
+                rows[i] = np.ndarray(values.shape, values.dtype,
+                                     buffer=block.buf)
+                rows[i][:] = values
+        distances = rows[3]
+        distances[:] = math.inf
+        distances[source] = 0
+        came_from = np.full(n, -1, dtype=np.int64)
+        buckets: Dict[int, List[Any]] = {0: [np.array([source])]}
+        expanded = peak = relaxations = reported = 0
+
+        def relax(nodes: Any, light: bool) -> None:
+            nonlocal processes, relaxations
+            requests = []
+            if len(patched):
+                inside = np.isin(nodes, patched)
+                for node in nodes[inside].tolist():
+                    for neighbor, weight in graph.patches[node]:
+                        if (weight <= delta) == light:
+                            requests.append((
+                                np.array([neighbor]),
+                                np.array([distances[node] + weight]),
+                                np.array([node])))
+                nodes = nodes[~inside]
+            if processes > 1 and len(nodes) >= PARALLEL_RELAX_NODES:
+                try:
+                    requests += get_relax_pool(processes).map(
+                        relax_edges, np.array_split(nodes, processes),
+                        repeat(light), repeat(delta), repeat(None),
+                        repeat(layout))
+                    nodes = nodes[:0]
+                except (OSError, AssertionError, BrokenProcessPool):
+                    drop_relax_pool()
+                    processes = 1
+            requests.append(relax_edges(nodes, light, delta, rows))
+            targets, new_distances, sources = lightest_requests(
+                *(np.concatenate(i) for i in zip(*requests)))
+            better = new_distances < distances[targets]
+            targets, new_distances = targets[better], new_distances[better]
+            distances[targets] = new_distances
+            came_from[targets] = sources[better]
+            relaxations += len(targets)
+            indices = (new_distances // delta).astype(np.int64)
+            for i in np.unique(indices).tolist():
+                buckets.setdefault(i, []).append(targets[indices == i])
+
+        while buckets:
+            index = min(buckets)
+            if distances[target] < math.inf and \
+                    distances[target] // delta < index:
+                break
+            settled = []
+            while index in buckets:
+                nodes = np.unique(np.concatenate(buckets.pop(index)))
+                reached = distances[nodes]
+                # Nodes since moved to a lower bucket were already done.
+                # The bucket is recomputed as it was assigned, since
+                # `index * delta` can round past a float distance that
+                # `//` put below it.
+                nodes = nodes[(reached // delta).astype(np.int64) == index]
+                settled.append(nodes)
+                expanded += len(nodes)
+                peak = max(peak, len(nodes))
+                relax(nodes, True)
+            relax(np.unique(np.concatenate(settled)), False)
+            if progress is not None and \
+                    expanded // PROGRESS_INTERVAL > reported:
+                reported = expanded // PROGRESS_INTERVAL
+                progress(expanded, sum(len(i) for bucket in buckets.values()
+                                       for i in bucket), index * delta)
+        record_stats(stats, expanded, peak, relaxations)
+        if distances[target] == math.inf:
+            return {'path': [], 'cost': None}
+        return path_result(graph, trace_back(came_from.tolist(), target,
+                                             source)[::-1])
+    finally:
+        # The arrays over the shared memory must go before it is closed.
+        rows = distances = values = None
+        for block in blocks:
+            block.close()
+            block.unlink()
+
+
+def csr_auto(graph: CompiledGraph, start: Any, goal: Any,
+             stats: Optional[Dict[str, int]] = None,
+             progress: Optional[Callable[[int, int, Any], None]] = None
+             ) -> Dict[str, Any]:
+    """
+    `path_finding.auto` over a compiled graph, making the same choices
+    as `path_finding.choose_solver` from its arrays: `frontier_bfs` if
+    every edge weighs the same, which is `csr_bfs` without NumPy,
+    `csr_bfs` on a tree, whose narrow levels `frontier_bfs` cannot
+    vectorize, `csr_dijkstra` for other non-negative weights, or
+    `delta_stepping` on graphs `wide_graph` accepts, and
+    `path_finding.spfa` through the dict view for negative ones.
+
+    Returns:
+        Dict[str, Any]: The chosen solver's result, with its name as
+            'solver' and why it was picked as 'reason'.
+    """
+    lightest, heaviest = graph.weight_range()
+    if lightest < 0:
+        solver, reason = spfa, f'negative weights (lightest edge {lightest})'
+    elif lightest == heaviest:
+        solver, reason = frontier_bfs if np is not None else csr_bfs, \
+            f'every edge has the same weight ({lightest})'
+    elif graph.is_tree():
+        solver, reason = csr_bfs, 'a tree, so the only path is the shortest'
+    else:
+        solver = delta_stepping if wide_graph(graph) else csr_dijkstra
+        reason = f'non-negative weights ({lightest} to {heaviest})'
+    result = solver(graph, start, goal, stats=stats, progress=progress)
+    return dict(result, solver=solver.__name__, reason=reason)
+
+
+# The solvers of `tasks.SOLVERS` run on compiled graphs instead, by name.
+# The others either are approximations whose own behaviour is what the
+# caller asked for, or run once per node or pair anyway.
+COMPILED_SOLVERS = {'djikstra': csr_dijkstra, 'bfs': csr_breadth_first,
+                    'auto': csr_auto}
@@ -0,0 +1,288 @@
+import os
+import json
+import time
+
+from collections import ChainMap, OrderedDict
+
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from file_locks import temp_path
+
+FILE_PREF = 'maze_data' if 'maze_solver' in os.getcwd() else '/tmp/'
+COMPRESS_CORRIDORS = os.environ.get('MAZE_COMPRESS_CORRIDORS', '1') != '0'
+CORRIDOR_DIR = os.path.join(FILE_PREF, 'corridors')
+# Compressed mazes each worker process keeps, for repeated solves.
+CORRIDOR_CACHE_SIZE = int(os.environ.get('MAZE_CORRIDOR_CACHE_SIZE', 8))
+CORRIDOR_TTL = int(os.environ.get('MAZE_ARTIFACT_TTL', 24 * 60 * 60))
+
+Node = Tuple[int, int]
+Graph = Dict[Node, Dict[Node, int]]
+
+memory: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+
+
+def is_corridor(graph: Graph, cell: Node) -> bool:
+    """
+    Whether a cell is the inside of a corridor: it has two neighbors
+    and both lead back to it.
+    """
+    neighbors = graph[cell]
+    return len(neighbors) == 2 and all(
+        cell in graph.get(neighbor, ()) for neighbor in neighbors)
+
+
+def compress_corridors(graph: Graph) -> Dict[str, Any]:
+    """
+    Collapses every chain of corridor cells into one edge between the
+    junctions or dead ends at its ends, weighing the sum of its steps.
+    Of two corridors joining the same cells only the lighter is kept,
+    and corridors leading back to where they started, or not reaching
+    any junction at all, are dropped, as no shortest path takes them.
+
+    Args:
+        graph (Graph): A maze from `filter_maze_passages`.
+
+    Returns:
+        Dict[str, Any]: The reduced 'graph' over junctions and dead
+            ends, and the 'corridors' mapping each of its edges (u, v)
+            to the cells it stands for, in order from u to v, flattened
+            to [x0, y0, x1, y1, ...].
+    """
+    corridor = {cell for cell in graph if is_corridor(graph, cell)}
+    reduced: Graph = {}
+    corridors: Dict[Tuple[Node, Node], List[int]] = {}
+    for junction, neighbors in graph.items():
+        if junction in corridor:
+            continue
+        edges = reduced.setdefault(junction, {})
+        for first, weight in neighbors.items():
+            previous, current, cells = junction, first, []
+            while current in corridor and current != junction:
+                cells.extend(current)
+                a, b = graph[current]
+                following = b if a == previous else a
+                weight += graph[current][following]
+                previous, current = current, following
+            if current == junction:
+                continue
+            if current not in edges or weight < edges[current]:
+                edges[current] = weight
+                corridors[(junction, current)] = cells
+    return {'graph': reduced, 'corridors': corridors}
+
+
+def splice_endpoints(graph: Graph, compressed: Dict[str, Any],
+                     *endpoints: Node
+                     ) -> Tuple[Graph, Dict[Tuple[Node, Node], List[int]]]:
+    """
+    Finds the edges that join endpoints lying inside corridors to a
+    compressed maze, each joined both ways to the cells on either side
+    of it along its corridor, or to the next endpoint in the same
+    corridor.
+
+    Args:
+        graph (Graph): The full maze, for the weights of the corridors.
+        compressed (Dict[str, Any]): From `compress_corridors`.
+        endpoints (Node): The start and goal of a search.
+
+    Returns:
+        Tuple[Graph, Dict[Tuple[Node, Node], List[int]]]: The new edges
+            of every node they touch, old edges included, and the cells
+            of the new corridors.
+    """
+    reduced = compressed['graph']
+    inside = [node for node in dict.fromkeys(endpoints)
+              if node not in reduced and node in graph]
+    patch: Graph = {}
+    extra: Dict[Tuple[Node, Node], List[int]] = {}
+    for node in inside:
+        if node in patch:
+            continue
+        # Walk to the junction on one side, then along to the other.
+        previous, current = node, next(iter(graph[node]))
+        while current in graph and is_corridor(graph, current) and \
+                current != node:
+            a, b = graph[current]
+            previous, current = current, b if a == previous else a
+        if current == node:
+            continue
+        start, steps = current, [current, previous]
+        while steps[-1] != start and is_corridor(graph, steps[-1]):
+            a, b = graph[steps[-1]]
+            steps.append(b if a == steps[-2] else a)
+        stops = [i for i, cell in enumerate(steps)
+                 if i in (0, len(steps) - 1) or cell in inside]
+        for i, j in zip(stops[:-1], stops[1:]):
+            u, v = steps[i], steps[j]
+            if u == v:
+                continue
+            cells = [c for cell in steps[i + 1:j] for c in cell]
+            forward = sum(graph[a][b] for a, b in
+                          zip(steps[i:j], steps[i + 1:j + 1]))
+            backward = sum(graph[b][a] for a, b in
+                           zip(steps[i:j], steps[i + 1:j + 1]))
+            back = [c for cell in steps[j - 1:i:-1] for c in cell]
+            for a, b, weight, path in ((u, v, forward, cells),
+                                       (v, u, backward, back)):
+                edges = patch[a] = dict(patch.get(a, reduced.get(a, {})))
+                if b not in edges or weight < edges[b]:
+                    edges[b] = weight
+                    extra[(a, b)] = path
+    return patch, extra
+
+
+def attach_endpoints(graph: Graph, compressed: Dict[str, Any],
+                     *endpoints: Node
+                     ) -> Tuple[Graph, Dict[Tuple[Node, Node], List[int]]]:
+    """
+    Adds endpoints lying inside corridors to a compressed maze, as
+    `splice_endpoints` joins them. Only the touched nodes are copied, so
+    the cached compressed maze is left as it is.
+
+    Args:
+        graph (Graph): The full maze, for the weights of the corridors.
+        compressed (Dict[str, Any]): From `compress_corridors`.
+        endpoints (Node): The start and goal of a search.
+
+    Returns:
+        Tuple[Graph, Dict[Tuple[Node, Node], List[int]]]: The reduced
+            graph and the corridors, with the endpoints' edges added.
+    """
+    reduced, corridors = compressed['graph'], compressed['corridors']
+    patch, extra = splice_endpoints(graph, compressed, *endpoints)
+    if not patch:
+        return reduced, corridors
+    return {**reduced, **patch}, ChainMap(extra, corridors)
+
+
+def expand_path(path: List[Node],
+                corridors: Dict[Tuple[Node, Node], List[int]]
+                ) -> List[Node]:
+    """
+    Expands a path found on a compressed maze back into every cell.
+    """
+    if not path:
+        return path
+    cells = [path[0]]
+    for u, v in zip(path[:-1], path[1:]):
+        flat = corridors.get((u, v), ())
+        cells.extend(zip(flat[::2], flat[1::2]))
+        cells.append(v)
+    return cells
+
+
+def solve_compressed(solver: Callable[..., Any], graph: Graph,
+                     compressed: Dict[str, Any], start: Node, goal: Node,
+                     waypoints: Sequence[Node] = (),
+                     compiled: Optional[Any] = None, **kwargs: Any) -> Any:
+    """
+    Runs a solver on a compressed maze and expands the path it finds.
+
+    Args:
+        solver (Callable[..., Any]): One of `tasks.SOLVERS`.
+        graph (Graph): The full maze.
+        compressed (Dict[str, Any]): From `compress_corridors`.
+        start (Node): The starting cell.
+        goal (Node): The goal cell.
+        waypoints (Sequence[Node], optional): Other cells the solver
+            must find as nodes, spliced in like the endpoints.
+        compiled (CompiledGraph, optional): The compressed maze compiled
+            by `compiled_graph.compiled_graph`, to run the solver on
+            instead, with the endpoints patched in.
+        kwargs (Any): Passed on to the solver.
+
+    Returns:
+        Any: The solver's result, with the path through every cell.
+    """
+    if compiled is None:
+        reduced, corridors = attach_endpoints(graph, compressed, start,
+                                              goal, *waypoints)
+    else:
+        patch, extra = splice_endpoints(graph, compressed, start, goal,
+                                        *waypoints)
+        reduced = compiled.patched(patch) if patch else compiled
+        corridors = ChainMap(extra, compressed['corridors'])
+    result = solver(reduced, start, goal, **kwargs)
+    if isinstance(result, dict) and result.get('path'):
+        result = dict(result, path=expand_path(result['path'], corridors))
+    return result
+
+
+def corridors_to_json(compressed: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Flattens a compressed maze into JSON: its nodes as [x0, y0, ...]
+    and its edges as [ux, uy, vx, vy, weight, [x0, y0, ...]].
+    """
+    corridors = compressed['corridors']
+    return {'nodes': [i for node in compressed['graph'] for i in node],
+            'edges': [[*u, *v, weight, corridors[(u, v)]]
+                      for u, edges in compressed['graph'].items()
+                      for v, weight in edges.items()]}
+
+
+def corridors_from_json(data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Rebuilds a compressed maze flattened by `corridors_to_json`.
+    """
+    nodes = data['nodes']
+    reduced: Graph = {(nodes[i], nodes[i + 1]): {}
+                      for i in range(0, len(nodes), 2)}
+    corridors = {}
+    for ux, uy, vx, vy, weight, cells in data['edges']:
+        reduced[(ux, uy)][(vx, vy)] = weight
+        corridors[((ux, uy), (vx, vy))] = cells
+    return {'graph': reduced, 'corridors': corridors}
+
+
+def compressed_maze(graph: Graph, key: Optional[str] = None
+                    ) -> Dict[str, Any]:
+    """
+    Returns the compressed form of a maze, from this process's LRU or
+    from `CORRIDOR_DIR` if the maze was compressed before, so repeated
+    solves with other endpoints or algorithms skip the compression.
+
+    Args:
+        graph (Graph): The full maze.
+        key (str, optional): The maze's content hash. Without one the
+            maze is compressed and nothing is cached.
+
+    Returns:
+        Dict[str, Any]: From `compress_corridors`.
+    """
+    if key is None:
+        return compress_corridors(graph)
+    if key in memory:
+        memory.move_to_end(key)
+        return memory[key]
+    path_ = os.path.join(CORRIDOR_DIR, f'{key}.json')
+    try:
+        with open(path_, 'r') as f:
+            compressed = corridors_from_json(json.load(f))
+        os.utime(path_)
+    except (OSError, ValueError, KeyError, TypeError):
+        compressed = compress_corridors(graph)
+        os.makedirs(CORRIDOR_DIR, exist_ok=True)
+        with open(temp_ := temp_path(path_), 'w') as f:
+            json.dump(corridors_to_json(compressed), f,
+                      separators=(',', ':'))
+        os.replace(temp_, path_)
+    memory[key] = compressed
+    while len(memory) > CORRIDOR_CACHE_SIZE:
+        memory.popitem(last=False)
+    return compressed
+
+
+def prune_corridors(max_age: int = CORRIDOR_TTL) -> None:
+    """
+    Deletes compressed mazes not used for `max_age` seconds.
+    """
+    if not os.path.isdir(CORRIDOR_DIR):
+        return
+    cutoff = time.time() - max_age
+    for filename in os.listdir(CORRIDOR_DIR):
+        file_path = os.path.join(CORRIDOR_DIR, filename)
+        try:
+            if os.path.getmtime(file_path) < cutoff:
+                os.remove(file_path)
+        except OSError:
+            pass
@@ -0,0 +1,277 @@
+import os
+
+from contextlib import contextmanager
+
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from fastapi import HTTPException
+
+from metrics import inc
+
+TIME_BUDGET = float(os.environ.get('MAZE_TIME_BUDGET', 10))
+MEMORY_BUDGET = int(os.environ.get('MAZE_MEMORY_BUDGET', 512 << 20))
+JOB_TIME_BUDGET = float(os.environ.get('MAZE_JOB_TIME_BUDGET', 600))
+JOB_MEMORY_BUDGET = int(os.environ.get('MAZE_JOB_MEMORY_BUDGET', 2 << 30))
+WORKERS = int(os.environ.get('MAZE_WORKERS', 1))
+# Split between the server processes, which each track their own.
+GLOBAL_MEMORY_BUDGET = int(os.environ.get('MAZE_GLOBAL_MEMORY_BUDGET',
+                                          2 << 30)) // WORKERS
+OVER_BUDGET = [i.strip() for i in os.environ.get(
+    'MAZE_OVER_BUDGET', 'downgrade,job').split(',') if i.strip()]
+PREVIEW_SIZE = int(os.environ.get('MAZE_PREVIEW_SIZE', 100))
+DOWNGRADE_SOLVER = 'beam_search'
+BYTES_PER_CELL = 64
+
+# Seconds and bytes per unit of work, measured on the maze and graph
+# functions with one core. Generating a maze is quadratic in its cells
+# because of the linear `visited` lookups, and so is Bellman-Ford.
+COSTS = {
+    'generate_cell': 1.5e-4,
+    'generate_cell_pair': 2e-7,
+    'draw_cell': 2.8e-4,
+    'parse_cell': 2e-5,
+    'maze_cell_bytes': 1000,
+    'image_cell_bytes': 1300,
+    'graph_node_seconds': 1e-6,
+    'graph_edge_seconds': 1e-5,
+    'graph_node_bytes': 250,
+    'graph_edge_bytes': 100,
+    'figure_seconds': 0.4,
+    'figure_bytes': 64 << 20,
+    'dict_edge_seconds': 0.02,
+    'coords_edge_seconds': 0.05,
+    'matrix_edge_seconds': 0.012,
+    'matrix_cell_bytes': 2500,
+}
+SOLVER_CELL_SECONDS = {
+    'djikstra': 2.5e-6,
+    'a_star': 4e-6,
+    'bfs': 1.2e-6,
+    'dfs': 0.7e-6,
+    'bidirectional_search': 1.7e-6,
+    'beam_search': 3e-6,
+    'auto': 2.5e-6,
+    # Per search: one from the start and one from each waypoint.
+    'waypoint_route': 2.5e-6,
+    # Per path found.
+    'alternative_paths': 2.5e-6,
+    'anytime_a_star': 3e-6,
+    # Building an editing session and searching it from scratch, which
+    # bounds what repairing it after edits costs.
+    'lpa_star': 9e-6,
+}
+QUADRATIC_SOLVERS = {'bellman_ford': 6e-7}
+
+reserved = 0
+
+
+def maze_cost(width: int, height: int, render_cells: Optional[int] = None
+              ) -> Dict[str, float]:
+    """
+    Projects the cost of generating a maze and drawing it.
+
+    Args:
+        width (int): The width of the maze.
+        height (int): The height of the maze.
+        render_cells (int, optional): How many cells are drawn, 0 for
+            none. Defaults to all of them.
+
+    Returns:
+        Dict[str, float]: The projected 'seconds' and 'memory' in bytes.
+    """
+    cells = max(width, 0) * max(height, 0)
+    render_cells = cells if render_cells is None else render_cells
+    return {
+        'seconds': cells * (COSTS['generate_cell']
+                            + COSTS['generate_cell_pair'] * cells)
+        + render_cells * COSTS['draw_cell'],
+        'memory': cells * COSTS['maze_cell_bytes']
+        + render_cells * COSTS['image_cell_bytes'],
+    }
+
+
+def solve_cost(cells: int, algorithm: str,
+               render_cells: Optional[int] = None,
+               searches: int = 1,
+               deadline_ms: Optional[float] = None) -> Dict[str, float]:
+    """
+    Projects the cost of parsing a maze, solving it and drawing the
+    solution.
+
+    Args:
+        cells (int): The number of cells in the maze.
+        algorithm (str): The solver's function name.
+        render_cells (int, optional): How many cells are drawn, 0 for
+            none. Defaults to all of them.
+        searches (int, optional): How many times the solver searches
+            the maze, for a route through waypoints or several paths.
+            Defaults to 1.
+        deadline_ms (float, optional): The most the search may take.
+            Defaults to none.
+
+    Returns:
+        Dict[str, float]: The projected 'seconds' and 'memory' in bytes.
+    """
+    render_cells = cells if render_cells is None else render_cells
+    if algorithm in QUADRATIC_SOLVERS:
+        solve_seconds = QUADRATIC_SOLVERS[algorithm] * cells * cells
+    else:
+        solve_seconds = SOLVER_CELL_SECONDS.get(algorithm, 5e-6) * cells
+    solve_seconds *= searches
+    if deadline_ms is not None:
+        solve_seconds = min(solve_seconds, deadline_ms / 1000)
+    return {
+        'seconds': cells * COSTS['parse_cell'] + solve_seconds
+        + render_cells * COSTS['draw_cell'],
+        'memory': cells * COSTS['maze_cell_bytes']
+        + render_cells * COSTS['image_cell_bytes'],
+    }
+
+
+def solve_downgrade(cells: int, algorithm: str, searches: int = 1,
+                    deadline_ms: Optional[float] = None
+                    ) -> Tuple[str, Dict[str, float]]:
+    """
+    Picks the downgraded form of a solve: a preview render of the top
+    left `PREVIEW_SIZE` squared cells and, if the chosen solver alone is
+    still over `TIME_BUDGET`, the approximate `DOWNGRADE_SOLVER`. Routes
+    through waypoints and several paths keep their solver, which the
+    other cannot replace, and so do searches with a deadline, which
+    bounds them already.
+
+    Args:
+        cells (int): The number of cells in the maze.
+        algorithm (str): The requested solver's function name.
+        searches (int, optional): See `solve_cost`. Defaults to 1.
+        deadline_ms (float, optional): See `solve_cost`. Defaults to
+            none.
+
+    Returns:
+        Tuple[str, Dict[str, float]]: The solver to use and the
+            projected cost.
+    """
+    preview_cells = min(cells, PREVIEW_SIZE ** 2)
+    cost = solve_cost(cells, algorithm, preview_cells, searches, deadline_ms)
+    if searches > 1 or deadline_ms is not None or \
+            fits(cost, TIME_BUDGET, MEMORY_BUDGET):
+        return algorithm, cost
+    return DOWNGRADE_SOLVER, solve_cost(cells, DOWNGRADE_SOLVER,
+                                        preview_cells)
+
+
+def upload_cells(size: int) -> int:
+    """
+    Estimates how many cells an uploaded maze file of `size` bytes has.
+    """
+    return size // BYTES_PER_CELL + 1
+
+
+def graph_cost(kind: str, num_nodes: int, num_edges: int,
+               render: bool = True) -> Dict[str, float]:
+    """
+    Projects the cost of generating one of the random graphs and
+    drawing it with matplotlib.
+
+    Args:
+        kind (str): 'dict', 'coords' or 'matrix'.
+        num_nodes (int): The requested number of nodes. A coords graph
+            has `num_nodes ** 2` of them.
+        num_edges (int): The requested number of edges.
+        render (bool, optional): Whether it is drawn. Defaults to True.
+
+    Raises:
+        HTTPException: 400 if the graph cannot have that many edges,
+            which would make the generator loop forever.
+
+    Returns:
+        Dict[str, float]: The projected 'seconds' and 'memory' in bytes.
+    """
+    nodes = num_nodes ** 2 if kind == 'coords' else num_nodes
+    if num_edges > nodes * (nodes - 1) or num_edges < 0:
+        raise HTTPException(status_code=400, detail=(
+            f'A graph with {nodes} nodes has at most '
+            f'{max(nodes * (nodes - 1), 0)} edges'))
+    seconds = nodes * COSTS['graph_node_seconds'] \
+        + num_edges * COSTS['graph_edge_seconds']
+    memory = nodes * COSTS['graph_node_bytes'] \
+        + num_edges * COSTS['graph_edge_bytes']
+    if kind == 'matrix':
+        memory += nodes * nodes * 8
+    if render:
+        seconds += COSTS['figure_seconds'] \
+            + COSTS[f'{kind}_edge_seconds'] * num_edges
+        memory += COSTS['figure_bytes']
+        if kind == 'matrix':
+            memory += nodes * nodes * COSTS['matrix_cell_bytes']
+    return {'seconds': seconds, 'memory': memory}
+
+
+def fits(cost: Dict[str, float], seconds: float, memory: float) -> bool:
+    """
+    Tells whether a projected cost is within a time and memory budget.
+    """
+    return cost['seconds'] <= seconds and cost['memory'] <= memory
+
+
+def admit(cost: Dict[str, float],
+          downgraded: Optional[Dict[str, float]] = None,
+          job: bool = True) -> str:
+    """
+    Decides how to serve a request from its projected cost, before any
+    work starts. Requests within `TIME_BUDGET` and `MEMORY_BUDGET` run
+    right away unless the in-flight requests already hold
+    `GLOBAL_MEMORY_BUDGET`. Otherwise the fallbacks listed in
+    `MAZE_OVER_BUDGET` are tried in order.
+
+    Args:
+        cost (Dict[str, float]): The projected cost of the request.
+        downgraded (Dict[str, float], optional): The projected cost of
+            its downgraded form, such as a preview render or an
+            approximate solver, if it has one. Defaults to None.
+        job (bool, optional): Whether it can be queued as a background
+            job instead. Defaults to True.
+
+    Raises:
+        HTTPException: 413 if no allowed fallback fits its budget, 503
+            if it only has to wait for memory to be released.
+
+    Returns:
+        str: 'run', 'downgrade' or 'job'.
+    """
+    options: List[str] = []
+    if fits(cost, TIME_BUDGET, MEMORY_BUDGET):
+        if reserved + cost['memory'] <= GLOBAL_MEMORY_BUDGET:
+            options.append('run')
+    for fallback in OVER_BUDGET:
+        if (fallback == 'downgrade' and downgraded is not None
+                and fits(downgraded, TIME_BUDGET, MEMORY_BUDGET)
+                and reserved + downgraded['memory'] <= GLOBAL_MEMORY_BUDGET):
+            options.append(fallback)
+        elif fallback == 'job' and job and fits(cost, JOB_TIME_BUDGET,
+                                                JOB_MEMORY_BUDGET):
+            options.append(fallback)
+    if not options:
+        inc('maze_admission_total', decision='reject')
+        if fits(cost, TIME_BUDGET, MEMORY_BUDGET):
+            raise HTTPException(status_code=503,
+                                detail='Server memory budget is in use',
+                                headers={'Retry-After': '5'})
+        raise HTTPException(status_code=413, detail=(
+            f"Projected cost of {cost['seconds']:.1f} s and "
+            f"{cost['memory'] / 2**20:.0f} MiB is over the budget"))
+    inc('maze_admission_total', decision=options[0])
+    return options[0]
+
+
+@contextmanager
+def reserve(cost: Dict[str, float]) -> Iterator[None]:
+    """
+    Counts a running request's projected memory against
+    `GLOBAL_MEMORY_BUDGET` for the duration of the `with` block.
+    """
+    global reserved
+    reserved += cost['memory']
+    try:
+        yield
+    finally:
+        reserved -= cost['memory']
@@ -0,0 +1,152 @@
+import os
+import queue
+import asyncio
+import multiprocessing
+
+from functools import partial
+from concurrent.futures import (Executor, ProcessPoolExecutor,
+                                ThreadPoolExecutor)
+
+from typing import Any, Callable, Optional
+
+from fastapi import HTTPException
+
+from tasks import warm_worker
+
+EXECUTOR_MODE = os.environ.get('MAZE_EXECUTOR', 'process')
+WORKERS = int(os.environ.get('MAZE_WORKERS', 1))
+# Each server process gets its share of the cores for its own pool.
+PROCESS_WORKERS = int(os.environ.get('MAZE_PROCESS_WORKERS', max(
+    1, (os.cpu_count() or 1) // WORKERS)))
+THREAD_WORKERS = int(os.environ.get('MAZE_THREAD_WORKERS', 4))
+MAX_PENDING = int(os.environ.get('MAZE_MAX_PENDING', PROCESS_WORKERS * 4))
+QUEUE_TIMEOUT = float(os.environ.get('MAZE_QUEUE_TIMEOUT', 30))
+
+process_pool: Optional[Executor] = None
+thread_pool: Optional[Executor] = None
+running: Optional[asyncio.Semaphore] = None
+manager: Optional[Any] = None
+in_flight = 0
+
+
+def start_executors() -> None:
+    """
+    Creates the worker pools and prewarms every process worker.
+    `MAZE_EXECUTOR` selects where CPU-bound work runs: 'process'
+    (default) or 'thread', e.g. for debugging or single-core hosts.
+    """
+    global process_pool, thread_pool, running
+    thread_pool = ThreadPoolExecutor(max_workers=THREAD_WORKERS,
+                                     thread_name_prefix='maze-io')
+    if EXECUTOR_MODE == 'process':
+        process_pool = ProcessPoolExecutor(max_workers=PROCESS_WORKERS)
+        for future in [process_pool.submit(warm_worker)
+                       for _ in range(PROCESS_WORKERS)]:
+            future.result()
+    else:
+        process_pool = thread_pool
+    running = asyncio.Semaphore(PROCESS_WORKERS)
+
+
+def stop_executors() -> None:
+    """
+    Shuts the worker pools down, waiting for running work to finish.
+    Work still waiting for a process is dropped, so a recycled server
+    process exits as soon as its in-flight requests are done.
+    """
+    global manager
+    if process_pool is not None and process_pool is not thread_pool:
+        process_pool.shutdown(wait=True, cancel_futures=True)
+    if thread_pool is not None:
+        thread_pool.shutdown(wait=True)
+    if manager is not None:
+        manager.shutdown()
+        manager = None
+
+
+def event_queue() -> Any:
+    """
+    Creates a queue that CPU-bound tasks can put progress events on
+    while the server reads them. In process mode it is served by a
+    `multiprocessing.Manager`, started on first use, so it can be
+    pickled to the workers.
+
+    Returns:
+        Any: A queue with `put` and `get_nowait`.
+    """
+    global manager
+    if EXECUTOR_MODE != 'process':
+        return queue.Queue()
+    if manager is None:
+        manager = multiprocessing.Manager()
+    return manager.Queue()
+
+
+async def run_cpu(func: Callable, *args: Any, **kwargs: Any) -> Any:
+    """
+    Runs a CPU-bound task on the process pool behind a bounded
+    admission queue, so one large request never blocks the event loop.
+
+    Args:
+        func (Callable): A picklable top-level function.
+        *args, **kwargs: Its arguments.
+
+    Raises:
+        HTTPException: 429 if the queue is full, 503 if the task waited
+            longer than `QUEUE_TIMEOUT` for a worker.
+
+    Returns:
+        Any: The task's return value.
+    """
+    global in_flight
+    if in_flight >= PROCESS_WORKERS + MAX_PENDING:
+        raise HTTPException(status_code=429, detail='Server is saturated',
+                            headers={'Retry-After': '1'})
+    in_flight += 1
+    try:
+        try:
+            await asyncio.wait_for(running.acquire(), QUEUE_TIMEOUT)
+        except asyncio.TimeoutError:
+            raise HTTPException(status_code=503,
+                                detail='Timed out waiting for a worker',
+                                headers={'Retry-After': '5'})
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                process_pool, partial(func, *args, **kwargs))
+        finally:
+            running.release()
+    finally:
+        in_flight -= 1
+
+
+async def run_background(func: Callable, *args: Any, **kwargs: Any) -> Any:
+    """
+    Runs a CPU-bound task on the process pool without going through the
+    admission queue. Used by callers that bound their own concurrency,
+    such as the job workers.
+
+    Args:
+        func (Callable): A picklable top-level function.
+        *args, **kwargs: Its arguments.
+
+    Returns:
+        Any: The task's return value.
+    """
+    return await asyncio.get_running_loop().run_in_executor(
+        process_pool, partial(func, *args, **kwargs))
+
+
+async def run_io(func: Callable, *args: Any, **kwargs: Any) -> Any:
+    """
+    Runs a blocking task that releases the GIL, such as image encoding,
+    hashing or file IO, on the thread pool.
+
+    Args:
+        func (Callable): The function to run.
+        *args, **kwargs: Its arguments.
+
+    Returns:
+        Any: The task's return value.
+    """
+    return await asyncio.get_running_loop().run_in_executor(
+        thread_pool, partial(func, *args, **kwargs))
@@ -0,0 +1,57 @@
+import os
+import threading
+
+from contextlib import contextmanager
+
+from typing import Iterator
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+FILE_PREF = 'maze_data' if 'maze_solver' in os.getcwd() else '/tmp/'
+LOCK_DIR = os.path.join(FILE_PREF, 'locks')
+
+
+@contextmanager
+def file_lock(name: str, shared: bool = False,
+              blocking: bool = True) -> Iterator[bool]:
+    """
+    Holds an advisory lock that every worker process on the host sees,
+    for the duration of the `with` block. Without `fcntl`, e.g. on
+    Windows, nothing is locked and it always succeeds.
+
+    Args:
+        name (str): The lock name.
+        shared (bool, optional): Take a shared lock, which only excludes
+            exclusive holders. Defaults to False.
+        blocking (bool, optional): Wait for the lock instead of giving
+            up at once. Defaults to True.
+
+    Returns:
+        Iterator[bool]: Whether the lock was acquired.
+    """
+    if fcntl is None:
+        yield True
+        return
+    os.makedirs(LOCK_DIR, exist_ok=True)
+    with open(os.path.join(LOCK_DIR, f'{name}.lock'), 'a') as f:
+        try:
+            fcntl.flock(f, (fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+                        | (0 if blocking else fcntl.LOCK_NB))
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def temp_path(path_: str) -> str:
+    """
+    Returns a temporary file name next to `path_` that is unique to the
+    calling process and thread, to be moved over it with `os.replace`.
+    """
+    return f'{path_}.{os.getpid()}.{threading.get_ident()}.tmp'
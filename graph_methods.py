@@ -1,15 +1,32 @@
 import os
 import random
-import matplotlib.pyplot as plt
 
 from uuid import uuid4
 from math import pi, cos, sin
 
-from typing import Dict, List, Optional, Union, Tuple
+from typing import Dict, List, Optional, Union, Tuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import matplotlib.pyplot as plt
 
 FILE_PREF = 'maze_data' if 'maze_solver' in os.getcwd() else '/tmp/'
 
 
+def pyplot():
+    """
+    Imports pyplot on first use with the non-interactive Agg backend.
+    matplotlib takes hundreds of milliseconds to import, so processes
+    that never draw a graph never pay for it.
+
+    Returns:
+        module: matplotlib.pyplot.
+    """
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    return plt
+
+
 def random_letter_weighted_dict(num_nodes: int, num_edges: int,
                                 min_weight: int, max_weight: int,
                                 directional: bool = False,
@@ -98,7 +115,7 @@ def draw_letter_weighted_dict(
     graph: Dict[str, Dict[str, Union[int, float]]],
     weighted: bool = False,
     name_: str = 'lettered',
-    tries: int = 0) -> Union[str, Tuple[plt.Figure, str]]:
+    tries: int = 0) -> Union[str, Tuple['plt.Figure', str]]:
     """
     Draws a graph visualization of a letter-labeled
     weighted dictionary graph.
@@ -119,6 +136,7 @@ def draw_letter_weighted_dict(
         If an error occurs, returns "Error" string or retries
         the function up to 2 times.
     """
+    plt = pyplot()
     try:
         fig, ax = plt.subplots(figsize=(15, 15))
         nodes = list(graph.keys())
@@ -196,7 +214,7 @@ def random_coords_graph(num_nodes: int, num_edges: int, min_weight: int,
 
 def draw_random_coords_graph(
         graph: Dict[Tuple[float, float], Dict[Tuple[float, float], float]],
-        name_: str = 'coords') -> Tuple[plt.Figure, str]:
+        name_: str = 'coords') -> Tuple['plt.Figure', str]:
     """
     Draws a graph represented as a dictionary with nodes as keys and
     their connections as values, as a random coordinates graph.
@@ -212,6 +230,7 @@ def draw_random_coords_graph(
     - fig: The matplotlib Figure object.
     - f: The path to the saved image file.
     """
+    plt = pyplot()
     fig, ax = plt.subplots(figsize=(15, 15))
     for node, connections in graph.items():
         for connection, weight in connections.items():
@@ -266,7 +285,7 @@ def random_weighted_adjacency_matrix(num_nodes: int, num_edges: int,
 
 
 def draw_adjacency_matrix(matrix: List[List[int]],
-                          name_: str = 'matrix') -> Tuple[plt.Figure, str]:
+                          name_: str = 'matrix') -> Tuple['plt.Figure', str]:
     """
     Draws a graph's adjacency matrix with weighted edges.
 
@@ -277,6 +296,7 @@ def draw_adjacency_matrix(matrix: List[List[int]],
     Returns:
     - Tuple[plt.Figure, str]: The figure object and the filename.
     """
+    plt = pyplot()
     fig, ax = plt.subplots(figsize=(len(matrix)/2, len(matrix)/2))
     nodes = [chr(65+i) for i in range(len(matrix))]
     for i in range(len(matrix)):
@@ -0,0 +1,19 @@
+import os
+
+# Multi-process serving: `gunicorn -c gunicorn.conf.py maze_app:app`.
+# The app modules split the cores and the memory budget between the
+# server processes by reading MAZE_WORKERS, so it is exported for them.
+workers = int(os.environ.setdefault('MAZE_WORKERS',
+                                    str(os.cpu_count() or 1)))
+worker_class = 'uvicorn.workers.UvicornWorker'
+bind = f"0.0.0.0:{os.environ.get('PORT', 8000)}"
+
+# Recycle each server process after a number of requests, with jitter so
+# they do not all restart at once. A recycled process finishes its
+# in-flight requests and hands its queued jobs back within the timeout.
+max_requests = int(os.environ.get('MAZE_MAX_REQUESTS', 10000))
+max_requests_jitter = int(os.environ.get('MAZE_MAX_REQUESTS_JITTER',
+                                         max_requests // 10))
+graceful_timeout = int(os.environ.get('MAZE_GRACEFUL_TIMEOUT', 30))
+timeout = int(os.environ.get('MAZE_WORKER_TIMEOUT', 120))
+keepalive = 5
@@ -0,0 +1,343 @@
+import os
+import json
+import time
+import asyncio
+
+from uuid import uuid4
+
+from typing import Any, Dict, List, Optional, Set
+
+from fastapi import HTTPException
+
+from artifacts import store_artifact_file, artifact_url
+from executors import PROCESS_WORKERS, run_background, run_io
+from file_locks import temp_path
+from tasks import (generate_maze_task, solve_maze_file_task, dict_graph_task,
+                   coords_graph_task, matrix_graph_task)
+
+FILE_PREF = 'maze_data' if 'maze_solver' in os.getcwd() else '/tmp/'
+JOB_DIR = os.path.join(FILE_PREF, 'jobs')
+JOB_WORKERS = int(os.environ.get('MAZE_JOB_WORKERS',
+                                 max(1, PROCESS_WORKERS // 2)))
+JOB_QUEUE_SIZE = int(os.environ.get('MAZE_JOB_QUEUE_SIZE', 64))
+JOB_TTL = int(os.environ.get('MAZE_JOB_TTL', 24 * 60 * 60))
+JOB_DRAIN_TIMEOUT = float(os.environ.get('MAZE_JOB_DRAIN_TIMEOUT', 20))
+JOB_KINDS = {
+    'generate': generate_maze_task,
+    'solve': solve_maze_file_task,
+    'dict': dict_graph_task,
+    'coords': coords_graph_task,
+    'matrix': matrix_graph_task,
+}
+
+jobs: Dict[str, Dict[str, Any]] = {}
+queue: Optional[asyncio.Queue] = None
+workers: List[asyncio.Task] = []
+idle: Set[asyncio.Task] = set()
+draining = False
+
+
+def start_jobs() -> None:
+    """
+    Creates the job queue, starts `JOB_WORKERS` workers consuming it
+    and adopts the jobs other server processes left queued.
+    """
+    global queue, draining
+    os.makedirs(JOB_DIR, exist_ok=True)
+    queue = asyncio.Queue(maxsize=JOB_QUEUE_SIZE)
+    draining = False
+    workers.extend(asyncio.create_task(job_worker())
+                   for _ in range(JOB_WORKERS))
+    adopt_jobs()
+
+
+async def stop_jobs() -> None:
+    """
+    Stops the job workers. Running jobs get `JOB_DRAIN_TIMEOUT` seconds
+    to finish; the ones that do not, and the ones still queued, are put
+    back in their persisted 'queued' state for another server process
+    to adopt, so recycling a process does not lose them.
+    """
+    global draining
+    draining = True
+    for worker in idle:
+        worker.cancel()
+    if workers:
+        await asyncio.wait(workers, timeout=JOB_DRAIN_TIMEOUT)
+    for worker in workers:
+        worker.cancel()
+    await asyncio.gather(*workers, return_exceptions=True)
+    workers.clear()
+    while not queue.empty():
+        job = jobs.get(queue.get_nowait())
+        if job is not None and job['status'] == 'queued':
+            release_job(job['id'])
+
+
+def save_job(job: Dict[str, Any]) -> None:
+    """
+    Persists a job record next to its results so it can still be
+    polled after the process that ran it is gone.
+    """
+    path_ = os.path.join(JOB_DIR, f"{job['id']}.json")
+    with open(temp_ := temp_path(path_), 'w') as f:
+        json.dump(job, f)
+    os.replace(temp_, path_)
+
+
+def load_job(job_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Reads a job's persisted record, which may have been updated by
+    another server process.
+
+    Returns:
+        Optional[Dict[str, Any]]: The job record, or None if unknown.
+    """
+    path_ = os.path.join(JOB_DIR, f'{os.path.basename(job_id)}.json')
+    try:
+        with open(path_, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def claim_job(job_id: str) -> bool:
+    """
+    Marks a job as owned by this server process. The claim file is
+    created atomically, so only one process can own a job.
+
+    Returns:
+        bool: False if another process already owns it.
+    """
+    try:
+        fd = os.open(os.path.join(JOB_DIR, f'{job_id}.claim'),
+                     os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        return False
+    os.write(fd, str(os.getpid()).encode())
+    os.close(fd)
+    return True
+
+
+def release_job(job_id: str) -> None:
+    """
+    Gives up the ownership of a job so another process can adopt it.
+    """
+    try:
+        os.remove(os.path.join(JOB_DIR, f'{job_id}.claim'))
+    except FileNotFoundError:
+        pass
+
+
+def adopt_jobs() -> None:
+    """
+    Queues the persisted jobs that are waiting without an owner, such
+    as the ones a recycled server process gave back, while there is
+    room in the queue.
+    """
+    if queue is None or draining or not os.path.isdir(JOB_DIR):
+        return
+    for filename in sorted(os.listdir(JOB_DIR)):
+        job_id, ext = os.path.splitext(filename)
+        if ext != '.json' or job_id in jobs or queue.full() or \
+                os.path.exists(os.path.join(JOB_DIR, f'{job_id}.claim')):
+            continue
+        job = load_job(job_id)
+        if job is None or job['status'] != 'queued' or \
+                not claim_job(job_id):
+            continue
+        jobs[job_id] = job
+        queue.put_nowait(job_id)
+
+
+def submit_job(kind: str, args: List[Any],
+               input_path: Optional[str] = None,
+               job_id: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Queues a job.
+
+    Args:
+        kind (str): One of `JOB_KINDS`.
+        args (List[Any]): The arguments for the kind's task.
+        input_path (str, optional): A spooled input file that is
+            removed once the job finishes. Defaults to None.
+        job_id (str, optional): The id to use. Defaults to a new UUID.
+
+    Raises:
+        HTTPException: 400 for an unknown kind, 429 if the queue is full.
+
+    Returns:
+        Dict[str, Any]: The job record.
+    """
+    if kind not in JOB_KINDS:
+        raise HTTPException(status_code=400, detail=(
+            f'kind not allowed: {kind}; ' + ', '.join(JOB_KINDS)))
+    if queue.full():
+        raise HTTPException(status_code=429, detail='Job queue is full',
+                            headers={'Retry-After': '5'})
+    job = {'id': job_id or str(uuid4()), 'kind': kind, 'status': 'queued',
+           'stage': 'queued', 'args': args, 'input_path': input_path,
+           'submitted': time.time(), 'started': None, 'finished': None,
+           'result': None, 'error': None}
+    claim_job(job['id'])
+    jobs[job['id']] = job
+    save_job(job)
+    queue.put_nowait(job['id'])
+    return job
+
+
+def get_job(job_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Looks a job up in memory, falling back to its persisted record.
+
+    Returns:
+        Optional[Dict[str, Any]]: The job record, or None if unknown.
+    """
+    if job_id in jobs:
+        return jobs[job_id]
+    return load_job(job_id)
+
+
+def job_status(job: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Returns the public view of a job, with its queue position while
+    it is waiting and its elapsed time once it has started.
+    """
+    status = {key: job[key] for key in (
+        'id', 'kind', 'status', 'stage', 'submitted', 'started',
+        'finished', 'result', 'error')}
+    if job['status'] == 'queued':
+        status['queue_position'] = sum(
+            1 for other in jobs.values() if other['status'] == 'queued'
+            and other['submitted'] < job['submitted'])
+    if job['started']:
+        status['elapsed'] = (job['finished'] or time.time()) - job['started']
+    return status
+
+
+def cancel_job(job_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Cancels a job. Queued jobs never run; a running job cannot be
+    interrupted inside its worker process, so its result is discarded
+    when it completes. Jobs owned by another server process are
+    cancelled through their persisted record.
+
+    Returns:
+        Optional[Dict[str, Any]]: The job record, or None if unknown.
+    """
+    job = get_job(job_id)
+    if job is None or job['status'] in ('done', 'failed', 'cancelled'):
+        return job
+    job.update(status='cancelled', stage='cancelled', finished=time.time())
+    save_job(job)
+    return job
+
+
+async def job_worker() -> None:
+    """
+    Takes jobs off the queue one at a time and runs them on the process
+    pool, storing their outputs as artifacts. Stops taking new ones
+    once the server process starts draining.
+    """
+    task = asyncio.current_task()
+    while not draining:
+        idle.add(task)
+        try:
+            job = jobs.get(await queue.get())
+        finally:
+            idle.discard(task)
+        requeued = False
+        try:
+            if job is None or cancelled(job):
+                continue
+            job.update(status='running', stage='computing',
+                       started=time.time())
+            save_job(job)
+            output = await run_background(JOB_KINDS[job['kind']],
+                                          *job['args'])
+            if cancelled(job):
+                continue
+            if output == 'Error':
+                raise RuntimeError('Drawing the graph failed')
+            job['stage'] = 'storing'
+            job['result'] = await run_io(store_job_result, job['kind'],
+                                         job['args'], output)
+            job.update(status='done', stage='done')
+        except asyncio.CancelledError:
+            if job is not None and job['status'] == 'running':
+                job.update(status='queued', stage='queued', started=None)
+                requeued = True
+            raise
+        except Exception as e:
+            job.update(status='failed', stage='failed', error=repr(e))
+        finally:
+            if requeued:
+                save_job(job)
+                release_job(job['id'])
+            elif job is not None:
+                if job['input_path'] and os.path.exists(job['input_path']):
+                    os.remove(job['input_path'])
+                job['finished'] = job['finished'] or time.time()
+                save_job(job)
+            queue.task_done()
+
+
+def cancelled(job: Dict[str, Any]) -> bool:
+    """
+    Tells whether a job was cancelled, here or, through its persisted
+    record, by another server process.
+    """
+    if job['status'] != 'cancelled':
+        persisted = load_job(job['id'])
+        if persisted is not None and persisted['status'] == 'cancelled':
+            job.update(status='cancelled', stage='cancelled',
+                       finished=persisted['finished'])
+    return job['status'] == 'cancelled'
+
+
+def store_job_result(kind: str, args: List[Any],
+                     output: str) -> Dict[str, str]:
+    """
+    Stores a finished job's image and data files as artifacts.
+
+    Args:
+        kind (str): The job kind.
+        args (List[Any]): The job arguments; the last one is the name
+            the generators saved their files under.
+        output (str): The task's return value, the PNG path for the
+            generators or the solution name for 'solve'.
+
+    Returns:
+        Dict[str, str]: The image and data artifact URLs.
+    """
+    if kind == 'solve':
+        image_path = os.path.join(FILE_PREF, output + '.png')
+        data_path = os.path.join(FILE_PREF, output + '.json')
+    else:
+        image_path = output
+        data_path = os.path.join(FILE_PREF, f'{args[-1]}.json')
+    return {
+        'image': artifact_url(store_artifact_file(image_path, 'png'), 'png'),
+        'data': artifact_url(store_artifact_file(data_path, 'json'), 'json'),
+    }
+
+
+def prune_jobs(max_age: int = JOB_TTL) -> None:
+    """
+    Forgets finished jobs older than `max_age` seconds, in memory and
+    on disk, and adopts jobs left queued by other server processes.
+    """
+    adopt_jobs()
+    cutoff = time.time() - max_age
+    for job_id, job in list(jobs.items()):
+        if job['finished'] and job['finished'] < cutoff:
+            del jobs[job_id]
+    if not os.path.isdir(JOB_DIR):
+        return
+    for filename in os.listdir(JOB_DIR):
+        file_path = os.path.join(JOB_DIR, filename)
+        try:
+            if os.path.getmtime(file_path) < cutoff:
+                os.remove(file_path)
+        except OSError:
+            pass
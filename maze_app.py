@@ -1,558 +1,1205 @@
-import io
-import os
-import base64
-import zipfile
-
-from uuid import uuid4
-
-from typing import Dict, Union, Optional, List
-
-from fastapi import FastAPI, Response, UploadFile, Form
-from fastapi.responses import StreamingResponse, HTMLResponse
-
-from maze_methods import generate_maze_, draw_maze, filter_maze_passages
-from path_finding import (djikstra, a_star, bfs, dfs, bellman_ford,
-                          bidirectional_search, beam_search)
-from graph_methods import (random_letter_weighted_dict, draw_letter_weighted_dict,
-                           random_coords_graph, draw_random_coords_graph,
-                           random_weighted_adjacency_matrix, draw_adjacency_matrix)
-
-app = FastAPI()
-FILE_PREF = 'maze_data' if 'maze_solver' in os.getcwd() else '/tmp/'
-
-
-@app.get('/')
-async def main() -> HTMLResponse:
-    """
-    A FastAPI endpoint that returns a JSON response with a
-    message about the application.
-
-    Returns:
-        A dictionary containing a message about the application.
-    """
-    with open(os.path.join('html_responses', 'home_page.html'),
-              'r') as f:
-        response_ = f.read()
-    return HTMLResponse(response_) 
-
-
-@app.get('/maze_generator', response_class=HTMLResponse)
-async def maze_generator() -> HTMLResponse:
-    """
-    Returns the HTML response for the maze generator form.
-
-    Returns:
-        HTMLResponse: An HTML response containing the maze generator form.
-    """
-    headers = {
-        "Cache-Control": "no-cache, no-store, must-revalidate",
-        "Pragma": "no-cache",
-        "Expires": "0",
-    }
-    with open(os.path.join('html_responses', 'maze_generator_form.html'),
-              'r') as f:
-        response_ = f.read()
-    return HTMLResponse(response_, headers=headers)
-
-
-@app.get("/download/{type_}/{name_}")
-async def stream_image(type_: str, name_: str):
-    """
-    This endpoint serves for downloading files generated by the maze generator.
-
-    Parameters:
-    -----------
-    type_: str
-        Type of file to download. Possible values: "image", "text" or "zip".
-    name_: str
-        Name of the file to download.
-
-    Returns:
-    --------
-    Union[StreamingResponse, Response, FileResponse]
-        The file to be downloaded in the appropriate format,
-        depending on the `type_` parameter.
-    """
-    if type_ == 'image':
-        with open(os.path.join(FILE_PREF, f'{name_}.png'), 'rb') as f:
-            image_data = f.read()
-        response = StreamingResponse(io.BytesIO(image_data),
-                                     media_type="image/jpeg")
-        response.headers["Content-Disposition"
-                         ] = f'attachment; filename="{name_}.png"'
-        response.headers["Cache-Control"
-                         ] = "no-cache, no-store, must-revalidate"
-        response.headers["Pragma"] = "no-cache"
-        response.headers["Expires"] = "0"
-        delete_temp_files()
-        return response
-    elif type_ == 'text':
-        with open(os.path.join(FILE_PREF, f'{name_}.json'), 'rb') as f:
-            maze_dict = eval(f.read())
-        response = Response(content=str(maze_dict))
-        response.headers["Content-Disposition"
-                         ] = f"attachment; filename={name_}.json"
-        response.headers["Content-Type"] = "text/plain"
-        delete_temp_files()
-        return response
-    elif type_ == 'zip':
-        file_list = [os.path.join(FILE_PREF, f'{name_}.png'),
-                     os.path.join(FILE_PREF, f'{name_}.json')]
-        zip_ = zipfiles(file_list)
-        delete_temp_files()
-        return zip_
-
-
-@app.get('/generate_maze')
-async def generate_maze(width: int, height: int, strict: float,
-                        weight: float, name_: Union[str, None] = None,
-                        img_show: bool = False, download: int = 0
-                        ) -> HTMLResponse:
-    """
-    Generates a maze with the given width and height, using the given `strict`
-    value and `weight` probability to add weights to the maze edges.
-    If `name_` is not provided, a random UUID will be generated to
-    name the maze. If `img_show` is True, the maze image will be displayed in
-    the HTML response. If `download` is non-zero, the corresponding file(s)
-    will be available for download. Returns an HTMLResponse containing the
-    generated maze and options for downloading it in various formats.
-
-    :param width: The width of the maze.
-    :param height: The height of the maze.
-    :param strict: The strictness of the maze.
-    :param weight: The probability of adding weights to the maze edges.
-    :param name_: The name of the maze.
-    :param img_show: A flag indicating whether the maze image should be
-        displayed.
-    :param download: A flag indicating whether files should be available
-        for download.
-    :return: An HTMLResponse containing the generated maze and
-        download options.
-    """
-    delete_temp_files()
-    name_ = str(uuid4()) if not name_ else name_
-    maze_dict: Dict = generate_maze_(width=width, height=height, strict=strict,
-                                     add_weights_prob=weight, name_=name_)
-    maze_image, _ = draw_maze(maze_dict, name_=name_)
-
-    buffer = io.BytesIO()
-    maze_image.save(buffer, format="JPEG")
-    image_data = buffer.getvalue()
-    image_base64 = base64.b64encode(image_data).decode()
-
-    return HTMLResponse(f"""
-    <html>
-    <body {'onload="download__()"' if download != 0 else delete_temp_files()}>
-        {'' if img_show else '<!--'
-        }<img src="data:image/jpeg;base64,{image_base64}" />{
-            '' if img_show else '-->'}
-        <p></p>
-        <p>{maze_dict}</p>
-
-        <a id="download-link" href="/download/{
-            'image' if download == 1 else 'text'
-            if download == 2 else 'zip'}/{name_}" style="display:none"></a>
-        <script>
-        function download__() {{
-            var downloadLink = document.getElementById('download-link');
-            downloadLink.click();
-        }}
-        </script>
-    </body>
-    </html>
-    """, headers={
-        "Cache-Control": "no-cache, no-store, must-revalidate",
-        "Pragma": "no-cache",
-        "Expires": "0",
-    })
-
-
-@app.get("/upload_maze", response_class=HTMLResponse)
-async def upload_maze() -> HTMLResponse:
-    """
-    A route for uploading a maze.
-
-    Returns:
-        HTMLResponse: An HTML response with a maze uploader form.
-    """
-    with open(os.path.join('html_responses', 'maze_uploader.html'), 'r') as f:
-        response_ = f.read()
-    return HTMLResponse(response_)
-
-
-@app.post("/maze_solver")
-async def maze_solver(file: UploadFile = Form(...),
-                      solve_algorithm: int = Form(...),
-                      start_coords: str = Form(...),
-                      end_coords: str = Form(...),
-                      img_show: Optional[bool] = Form(False),
-                      download: int = Form(...)
-                      ) -> HTMLResponse:
-    """
-    A route for solving a maze.
-
-    Args:
-        file (UploadFile): The uploaded maze file.
-        solve_algorithm (int): The algorithm used to solve the maze.
-        start_coords (str): The starting coordinates of the maze in
-            the form "x,y".
-        end_coords (str): The ending coordinates of the maze in the form "x,y".
-        img_show (Optional[bool], optional): Whether or not to display the
-            maze image. Defaults to False.
-        download (int): The type of download to offer after solving the maze.
-            0 for no download, 1 for image only, 2 for text only, 3 for both.
-
-    Returns:
-        HTMLResponse: An HTML response with the solved maze image, path,
-        and download link.
-    """
-    file_contents = await file.read()
-
-    start_coords = [int(i) for i in start_coords.split(',')]
-    start_coords = (start_coords[0], start_coords[1])
-    end_coords = [int(i) for i in end_coords.split(',')]
-    end_coords = (end_coords[0], end_coords[1])
-
-    methods_ = [djikstra, a_star, bfs, dfs, bellman_ford,
-                bidirectional_search, beam_search]
-    path = methods_[solve_algorithm](filter_maze_passages(eval(file_contents)),
-                                     start_coords, end_coords)
-    maze_image, image_name = draw_maze(eval(file_contents), path)
-    image_name = image_name.replace(FILE_PREF, '').replace(
-        '/', '').split('.')[0].replace('\\', '')
-    with open(os.path.join(FILE_PREF, image_name + '.json'), 'w') as f:
-        f.write(str(path))
-
-    buffer = io.BytesIO()
-    maze_image.save(buffer, format="JPEG")
-    image_data = buffer.getvalue()
-    image_base64 = base64.b64encode(image_data).decode()
-
-    return HTMLResponse(f"""
-    <html>
-    <body {'onload="download__()"' if download != 0 else delete_temp_files()}>
-        {'' if img_show else '<!--'
-        }<img src="data:image/jpeg;base64,{image_base64}" />{
-            '' if img_show else '-->'}
-        <p></p>
-        <p>{path}</p>
-
-        <a id="download-link" href="/download/{
-            'image' if download == 1 else 'text'
-            if download == 2 else 'zip'}/{
-                image_name.replace(FILE_PREF, '').replace(
-                    '/', '').split('.')[0]}" style="display:none"></a>
-        <script>
-        function download__() {{
-            var downloadLink = document.getElementById('download-link');
-            downloadLink.click();
-        }}
-        </script>
-    </body>
-    </html>
-    """, headers={
-        "Cache-Control": "no-cache, no-store, must-revalidate",
-        "Pragma": "no-cache",
-        "Expires": "0",
-    })
-
-
-@app.get("/generate_dict", response_class=HTMLResponse)
-async def generate_dict() -> HTMLResponse:
-    """
-    A route for generating a dict graph.
-
-    Returns:
-        HTMLResponse: An HTML response with a dict generator form.
-    """
-    with open(os.path.join('html_responses',
-                           'dict_generator_form.html'), 'r') as f:
-        response_ = f.read()
-    return HTMLResponse(response_)
-
-
-@app.get("/dict_generator")
-async def dict_generator(num_nodes: int, num_edges: int, min_weight: int,
-                         max_weight: int, directional: Optional[bool] = False,
-                         name_: Union[str, None] = None, img_show: bool = False,
-                         download: int = 0) -> HTMLResponse:
-    """
-    Generates a dictionary of letters and weights,
-    and returns an HTML response containing the dictionary
-    and an image of the graph.
-
-    Args:
-        num_nodes (int): The number of nodes in the graph.
-        num_edges (int): The number of edges in the graph.
-        min_weight (int): The minimum weight of an edge in the graph.
-        max_weight (int): The maximum weight of an edge in the graph.
-        directional (bool, optional): Whether the graph should be directional or not.
-            Defaults to False.
-        name_ (str, optional): The name of the graph. Defaults to None.
-        img_show (bool, optional): Whether the graph image should be shown or not.
-            Defaults to False.
-        download (int, optional): Whether to download the image, text,
-            or zip file of the graph. 0 = no download, 1 = image download,
-            2 = text download, 3 = zip download (image and text). Defaults to 0.
-
-    Returns:
-        HTMLResponse: An HTML response containing the dictionary
-        and an image of the graph.
-    """
-    delete_temp_files()
-    name_ = str(uuid4()) if not name_ else name_
-    
-    lettered_dict = random_letter_weighted_dict(
-        num_nodes, num_edges, min_weight, max_weight,
-        directional, name_)
-    graph_image, path_ = draw_letter_weighted_dict(
-        lettered_dict, name_=name_) if max_weight > 0 else draw_letter_weighted_dict(
-            lettered_dict, True, name_=name_)
-    if graph_image == 'Error':
-        return '400, Letter Dict failed'
-
-    buffer = io.BytesIO()
-    canvas = graph_image.canvas
-    canvas.print_jpg(buffer)
-    buffer.seek(0)
-
-    with open(path_, "wb") as f:
-        f.write(buffer.read())
-    image_data = buffer.getvalue()
-    image_base64 = base64.b64encode(image_data).decode()
-
-    return HTMLResponse(f"""
-    <html>
-    <body {'onload="download__()"' if download != 0 else delete_temp_files()}>
-        {'' if img_show else '<!--'
-        }<img src="data:image/jpeg;base64,{image_base64}" />{
-            '' if img_show else '-->'}
-        <p></p>
-        <p>{lettered_dict}</p>
-
-        <a id="download-link" href="/download/{
-            'image' if download == 1 else 'text'
-            if download == 2 else 'zip'}/{name_}" style="display:none"></a>
-        <script>
-        function download__() {{
-            var downloadLink = document.getElementById('download-link');
-            downloadLink.click();
-        }}
-        </script>
-    </body>
-    </html>
-    """, headers={
-        "Cache-Control": "no-cache, no-store, must-revalidate",
-        "Pragma": "no-cache",
-        "Expires": "0",
-    })
-
-
-@app.get("/generate_coords", response_class=HTMLResponse)
-async def generate_coords() -> HTMLResponse:
-    """
-    A route for generating a coords graph.
-
-    Returns:
-        HTMLResponse: An HTML response with a coords generator form.
-    """
-    with open(os.path.join('html_responses',
-                           'coords_generator_form.html'), 'r') as f:
-        response_ = f.read()
-    return HTMLResponse(response_)
-
-
-@app.get("/coords_generator")
-async def coords_generator(num_nodes: int, num_edges: int, min_weight: int,
-                         max_weight: int, directional: Optional[bool] = False,
-                         name_: Union[str, None] = None, img_show: bool = False,
-                         download: int = 0) -> HTMLResponse:
-    """
-    Generates a dictionary of coords and weights,
-    and returns an HTML response containing the dictionary
-    and an image of the graph.
-
-    Args:
-        num_nodes (int): The number of nodes in the graph.
-        num_edges (int): The number of edges in the graph.
-        min_weight (int): The minimum weight of an edge in the graph.
-        max_weight (int): The maximum weight of an edge in the graph.
-        directional (bool, optional): Whether the graph should be directional or not.
-            Defaults to False.
-        name_ (str, optional): The name of the graph. Defaults to None.
-        img_show (bool, optional): Whether the graph image should be shown or not.
-            Defaults to False.
-        download (int, optional): Whether to download the image, text,
-            or zip file of the graph. 0 = no download, 1 = image download,
-            2 = text download, 3 = zip download (image and text). Defaults to 0.
-
-    Returns:
-        HTMLResponse: An HTML response containing the coordinates
-        and an image of the graph.
-    """
-    delete_temp_files()
-    name_ = str(uuid4()) if not name_ else name_
-    
-    coords_dict = random_coords_graph(
-        num_nodes, num_edges, min_weight, max_weight,
-        directional, name_)
-    graph_image, path_ = draw_random_coords_graph(coords_dict, name_=name_)
-
-    buffer = io.BytesIO()
-    canvas = graph_image.canvas
-    canvas.print_jpg(buffer)
-    buffer.seek(0)
-
-    with open(path_, "wb") as f:
-        f.write(buffer.read())
-    image_data = buffer.getvalue()
-    image_base64 = base64.b64encode(image_data).decode()
-
-    return HTMLResponse(f"""
-    <html>
-    <body {'onload="download__()"' if download != 0 else delete_temp_files()}>
-        {'' if img_show else '<!--'
-        }<img src="data:image/jpeg;base64,{image_base64}" />{
-            '' if img_show else '-->'}
-        <p></p>
-        <p>{coords_dict}</p>
-
-        <a id="download-link" href="/download/{
-            'image' if download == 1 else 'text'
-            if download == 2 else 'zip'}/{name_}" style="display:none"></a>
-        <script>
-        function download__() {{
-            var downloadLink = document.getElementById('download-link');
-            downloadLink.click();
-        }}
-        </script>
-    </body>
-    </html>
-    """, headers={
-        "Cache-Control": "no-cache, no-store, must-revalidate",
-        "Pragma": "no-cache",
-        "Expires": "0",
-    })
-
-
-@app.get("/generate_matrix", response_class=HTMLResponse)
-async def generate_matrix() -> HTMLResponse:
-    """
-    A route for generating a matrix graph.
-
-    Returns:
-        HTMLResponse: An HTML response with a matrix generator form.
-    """
-    with open(os.path.join('html_responses',
-                           'matrix_generator_form.html'), 'r') as f:
-        response_ = f.read()
-    return HTMLResponse(response_)
-
-
-@app.get("/matrix_generator")
-async def matrix_generator(num_nodes: int, num_edges: int, min_weight: int,
-                         max_weight: int, name_: Union[str, None] = None,
-                         img_show: bool = False, download: int = 0) -> HTMLResponse:
-    """
-    Generates a matrix of weights,
-    and returns an HTML response containing the dictionary
-    and an image of the matrix.
-
-    Args:
-        num_nodes (int): The number of nodes in the matrix.
-        num_edges (int): The number of edges in the matrix.
-        min_weight (int): The minimum weight of an edge in the matrix.
-        max_weight (int): The maximum weight of an edge in the matrix.
-        name_ (str, optional): The name of the matrix. Defaults to None.
-        img_show (bool, optional): Whether the matrix image should be shown or not.
-            Defaults to False.
-        download (int, optional): Whether to download the image, text,
-            or zip file of the matrix. 0 = no download, 1 = image download,
-            2 = text download, 3 = zip download (image and text). Defaults to 0.
-
-    Returns:
-        HTMLResponse: An HTML response containing the coordinates
-        and an image of the matrix.
-    """
-    delete_temp_files()
-    name_ = str(uuid4()) if not name_ else name_
-    
-    matrix_dict = random_weighted_adjacency_matrix(
-        num_nodes, num_edges, min_weight, max_weight, name_)
-    matrix_image, path_ = draw_adjacency_matrix(matrix_dict, name_=name_)
-
-    buffer = io.BytesIO()
-    canvas = matrix_image.canvas
-    canvas.print_jpg(buffer)
-    buffer.seek(0)
-
-    with open(path_, "wb") as f:
-        f.write(buffer.read())
-    image_data = buffer.getvalue()
-    image_base64 = base64.b64encode(image_data).decode()
-
-    return HTMLResponse(f"""
-    <html>
-    <body {'onload="download__()"' if download != 0 else delete_temp_files()}>
-        {'' if img_show else '<!--'
-        }<img src="data:image/jpeg;base64,{image_base64}" />{
-            '' if img_show else '-->'}
-        <p></p>
-        <p>{matrix_dict}</p>
-
-        <a id="download-link" href="/download/{
-            'image' if download == 1 else 'text'
-            if download == 2 else 'zip'}/{name_}" style="display:none"></a>
-        <script>
-        function download__() {{
-            var downloadLink = document.getElementById('download-link');
-            downloadLink.click();
-        }}
-        </script>
-    </body>
-    </html>
-    """, headers={
-        "Cache-Control": "no-cache, no-store, must-revalidate",
-        "Pragma": "no-cache",
-        "Expires": "0",
-    })
-
-
-def delete_temp_files() -> None:
-    """
-    Deletes all temporary files in the specified file prefix directory.
-    """
-    for filename in os.listdir(FILE_PREF):
-        file_path = os.path.join(FILE_PREF, filename)
-        try:
-            if os.path.isfile(file_path):
-                os.remove(file_path)
-        except Exception as e:
-            print(f"Error deleting file {file_path}: {e}")
-
-
-def zipfiles(file_list: List[str]) -> StreamingResponse:
-    """
-    Creates a zip file containing the files in the specified
-    list of file paths.
-
-    Args:
-    file_list (List[str]): A list of file paths to be zipped.
-
-    Returns:
-    StreamingResponse: A streaming response that is a zip file
-    containing the specified files.
-    """
-    io_ = io.BytesIO()
-    zip_sub_dir = FILE_PREF
-    zip_filename = zip_sub_dir.replace('/', '') + '.zip'
-    with zipfile.ZipFile(io_, mode='w',
-                         compression=zipfile.ZIP_DEFLATED) as zip:
-        for fpath in file_list:
-            zip.write(fpath)
-        zip.close()
-    return StreamingResponse(
-        iter([io_.getvalue()]),
-        media_type="application/x-zip-compressed",
-        headers={"Content-Disposition": f"attachment;filename={zip_filename}"}
-    )
+import io
+import os
+import time
+import queue
+import asyncio
+import hashlib
+import zipfile
+
+from uuid import uuid4
+from functools import partial
+
+from typing import (Dict, Union, Optional, List, Tuple, Any, Awaitable,
+                    Callable, Sequence)
+
+from fastapi import (FastAPI, HTTPException, Request, Response, UploadFile,
+                     Form, File, WebSocket, WebSocketDisconnect)
+from fastapi.responses import (StreamingResponse, HTMLResponse, JSONResponse,
+                               FileResponse)
+
+from api import router as api_router, SOLVER_NAMES
+from artifacts import (ARTIFACT_DIR, MEDIA_TYPES, store_artifact_file,
+                       restore_artifact_file, artifact_url, artifact_response,
+                       prune_artifacts)
+import executors
+from executors import (start_executors, stop_executors, run_cpu, run_io,
+                       event_queue)
+from jobs import (JOB_DIR, JOB_KINDS, start_jobs, stop_jobs, submit_job,
+                  get_job, job_status, cancel_job, prune_jobs)
+from templates import load_templates, template_response
+from profiling import profiling_requested, profile_task, store_profile
+from metrics import ENABLED as METRICS_ENABLED, timer, observe, inc, \
+    record_report, render
+from cost_model import (PREVIEW_SIZE, admit, reserve, maze_cost, solve_cost,
+                        solve_downgrade, graph_cost, upload_cells)
+from solve_cache import (hash_solve_key, cache_get, cache_put, cache_stats,
+                         prune_cache)
+from file_locks import file_lock
+from corridors import prune_corridors
+from sessions import prune_sessions
+from maze_methods import MazeLimitError
+from tasks import (generate_maze_task, generate_maze_timed_task,
+                   solve_maze_task, dict_graph_task, coords_graph_task,
+                   matrix_graph_task, path_events, solve_plan)
+
+app = FastAPI()
+app.include_router(api_router)
+FILE_PREF = 'maze_data' if 'maze_solver' in os.getcwd() else '/tmp/'
+TEMP_FILE_GRACE = int(os.environ.get('MAZE_TEMP_FILE_GRACE', 60))
+SWEEP_INTERVAL = float(os.environ.get('MAZE_SWEEP_INTERVAL', 10))
+MAX_UPLOAD_BYTES = int(os.environ.get('MAZE_MAX_UPLOAD_BYTES', 64 << 20))
+UPLOAD_CHUNK_SIZE = 1 << 20
+EVENT_POLL_SECONDS = 0.05
+last_sweep = 0.0
+
+
+@app.on_event('startup')
+async def startup() -> None:
+    """
+    Loads the HTML templates and starts and prewarms the worker pools
+    and the job workers before serving requests.
+    """
+    load_templates()
+    start_executors()
+    start_jobs()
+
+
+@app.on_event('shutdown')
+async def shutdown() -> None:
+    """
+    Stops the job workers and the worker pools.
+    """
+    await stop_jobs()
+    stop_executors()
+
+
+@app.middleware('http')
+async def limit_body_size(request: Request, call_next) -> Response:
+    """
+    Rejects requests declaring a body larger than `MAX_UPLOAD_BYTES`
+    before any of it is read. Bodies sent without a length are checked
+    as they are spooled, see `spool_upload`.
+    """
+    length = request.headers.get('content-length', '')
+    if length.isdigit() and int(length) > MAX_UPLOAD_BYTES:
+        return JSONResponse({'detail': 'Request body is too large'},
+                            status_code=413)
+    return await call_next(request)
+
+
+if METRICS_ENABLED:
+    @app.middleware('http')
+    async def record_request(request: Request, call_next) -> Response:
+        """
+        Records the latency, status and body sizes of every request,
+        labelled by endpoint function to keep the label set small.
+        """
+        start = time.perf_counter()
+        response = await call_next(request)
+        endpoint = getattr(request.scope.get('endpoint'), '__name__',
+                           'unmatched')
+        observe('maze_http_request_seconds', time.perf_counter() - start,
+                endpoint=endpoint)
+        inc('maze_http_requests_total', endpoint=endpoint,
+            status=str(response.status_code))
+        inc('maze_http_bytes_in_total',
+            int(request.headers.get('content-length', 0)), endpoint=endpoint)
+        inc('maze_http_bytes_out_total',
+            int(response.headers.get('content-length', 0)),
+            endpoint=endpoint)
+        return response
+
+
+@app.get('/metrics')
+async def metrics() -> Response:
+    """
+    Exposes request, pipeline stage and search effort metrics in the
+    Prometheus text format, along with cache and queue gauges.
+
+    Returns:
+        Response: The exposition text, or a 404 if MAZE_METRICS=0.
+    """
+    if not METRICS_ENABLED:
+        return Response(status_code=404)
+    gauges = {f'maze_solve_cache_{key}': value
+              for key, value in cache_stats().items()}
+    gauges['maze_requests_in_flight'] = executors.in_flight
+    return Response(render(gauges),
+                    media_type='text/plain; version=0.0.4')
+
+
+@app.get('/')
+async def main(request: Request) -> Response:
+    """
+    A FastAPI endpoint that returns a JSON response with a
+    message about the application.
+
+    Returns:
+        A dictionary containing a message about the application.
+    """
+    return template_response('home_page.html', request.headers.get(
+        'if-none-match', ''), request.headers.get('accept-encoding', ''))
+
+
+@app.get('/maze_generator', response_class=HTMLResponse)
+async def maze_generator(request: Request) -> Response:
+    """
+    Returns the HTML response for the maze generator form.
+
+    Returns:
+        HTMLResponse: An HTML response containing the maze generator form.
+    """
+    headers = {
+        "Cache-Control": "no-cache, no-store, must-revalidate",
+        "Pragma": "no-cache",
+        "Expires": "0",
+    }
+    return template_response(
+        'maze_generator_form.html', request.headers.get('if-none-match', ''),
+        request.headers.get('accept-encoding', ''), headers)
+
+
+@app.get("/download/{type_}/{name_}")
+async def stream_image(type_: str, name_: str):
+    """
+    This endpoint serves for downloading files generated by the maze generator.
+
+    Parameters:
+    -----------
+    type_: str
+        Type of file to download. Possible values: "image", "text" or "zip".
+    name_: str
+        Name of the file to download.
+
+    Returns:
+    --------
+    Union[StreamingResponse, Response, FileResponse]
+        The file to be downloaded in the appropriate format,
+        depending on the `type_` parameter.
+    """
+    if type_ == 'image':
+        with open(os.path.join(FILE_PREF, f'{name_}.png'), 'rb') as f:
+            image_data = f.read()
+        response = StreamingResponse(io.BytesIO(image_data),
+                                     media_type="image/jpeg")
+        response.headers["Content-Disposition"
+                         ] = f'attachment; filename="{name_}.png"'
+        response.headers["Cache-Control"
+                         ] = "no-cache, no-store, must-revalidate"
+        response.headers["Pragma"] = "no-cache"
+        response.headers["Expires"] = "0"
+        delete_temp_files()
+        return response
+    elif type_ == 'text':
+        # Streamed as written, whether a Python repr or, for the 'moves'
+        # path format, JSON.
+        with open(os.path.join(FILE_PREF, f'{name_}.json'), 'rb') as f:
+            response = Response(content=f.read())
+        response.headers["Content-Disposition"
+                         ] = f"attachment; filename={name_}.json"
+        response.headers["Content-Type"] = "text/plain"
+        delete_temp_files()
+        return response
+    elif type_ == 'zip':
+        file_list = [os.path.join(FILE_PREF, f'{name_}.png'),
+                     os.path.join(FILE_PREF, f'{name_}.json')]
+        zip_ = zipfiles(file_list)
+        delete_temp_files()
+        return zip_
+
+
+@app.get("/artifacts/{name_}")
+async def serve_artifact(name_: str, request: Request) -> Response:
+    """
+    Serves a generated image or data file by its content-addressed name.
+    Artifacts never change once written, so they are sent with a strong
+    ETag and an immutable Cache-Control, and text artifacts are
+    compressed when the client accepts it.
+
+    Args:
+        name_ (str): The artifact file name, '<sha256>.<ext>'.
+        request (Request): The incoming request, used for its
+            conditional and encoding headers.
+
+    Returns:
+        Response: The artifact contents, a 304 or a 404.
+    """
+    return artifact_response(name_,
+                             request.headers.get('if-none-match', ''),
+                             request.headers.get('accept-encoding', ''))
+
+
+@app.get('/generate_maze')
+async def generate_maze(request: Request, width: int, height: int,
+                        strict: float, weight: float,
+                        name_: Union[str, None] = None,
+                        img_show: bool = False, download: int = 0
+                        ) -> HTMLResponse:
+    """
+    Generates a maze with the given width and height, using the given `strict`
+    value and `weight` probability to add weights to the maze edges.
+    If `name_` is not provided, a random UUID will be generated to
+    name the maze. If `img_show` is True, the maze image will be displayed in
+    the HTML response. If `download` is non-zero, the corresponding file(s)
+    will be available for download. Returns an HTMLResponse containing the
+    generated maze and options for downloading it in various formats.
+
+    Profiled requests (see `profiling.profiling_requested`) also get
+    links to a cProfile and tracemalloc report. Mazes projected to be
+    over budget are drawn as a preview, queued as a job or rejected, see
+    `cost_model.admit`.
+
+    :param request: The incoming request.
+    :param width: The width of the maze.
+    :param height: The height of the maze.
+    :param strict: The strictness of the maze.
+    :param weight: The probability of adding weights to the maze edges.
+    :param name_: The name of the maze.
+    :param img_show: A flag indicating whether the maze image should be
+        displayed.
+    :param download: A flag indicating whether files should be available
+        for download.
+    :return: An HTMLResponse containing the generated maze and
+        download options.
+    """
+    delete_temp_files()
+    name_ = str(uuid4()) if not name_ else name_
+    result = await run_generation(width, height, strict, weight, name_,
+                                  profiling_requested(request))
+    if 'job' in result:
+        return job_accepted(result['job'])
+    response_ = result_page(result['image'], result['data'], name_,
+                            img_show, download, result['links'])
+    if result['downgraded']:
+        response_.headers['X-Maze-Downgraded'] = ','.join(
+            result['downgraded'])
+    return response_
+
+
+@app.get("/upload_maze", response_class=HTMLResponse)
+async def upload_maze(request: Request) -> Response:
+    """
+    A route for uploading a maze.
+
+    Returns:
+        HTMLResponse: An HTML response with a maze uploader form.
+    """
+    return template_response('maze_uploader.html', request.headers.get(
+        'if-none-match', ''), request.headers.get('accept-encoding', ''))
+
+
+@app.post("/maze_solver")
+async def maze_solver(request: Request,
+                      file: UploadFile = Form(...),
+                      solve_algorithm: int = Form(...),
+                      start_coords: str = Form(...),
+                      end_coords: str = Form(...),
+                      img_show: Optional[bool] = Form(False),
+                      download: int = Form(...),
+                      waypoints: Optional[str] = Form(None),
+                      k: int = Form(1),
+                      deadline_ms: Optional[float] = Form(None),
+                      max_expansions: Optional[int] = Form(None)
+                      ) -> HTMLResponse:
+    """
+    A route for solving a maze. The upload is spooled to disk and parsed
+    in chunks by the worker, so it is never held in memory whole.
+    Profiled requests bypass the solve cache and run the whole pipeline
+    under the profiler. Solves projected to be over budget are drawn as
+    a preview, possibly with an approximate solver, queued as a job or
+    rejected, see `cost_model.admit`.
+
+    Args:
+        request (Request): The incoming request.
+        file (UploadFile): The uploaded maze file.
+        solve_algorithm (int): The algorithm used to solve the maze.
+        start_coords (str): The starting coordinates of the maze in
+            the form "x,y".
+        end_coords (str): The ending coordinates of the maze in the form "x,y".
+        img_show (Optional[bool], optional): Whether or not to display the
+            maze image. Defaults to False.
+        download (int): The type of download to offer after solving the maze.
+            0 for no download, 1 for image only, 2 for text only, 3 for both.
+        waypoints (Optional[str], optional): Cells to visit on the way,
+            in any order, in the form "x,y;x,y". The algorithm is not
+            used then, see `path_finding.waypoint_route`.
+        k (int, optional): How many shortest loopless paths to find,
+            up to `MAZE_MAX_PATHS`, see `path_finding.alternative_paths`.
+            Defaults to 1.
+        deadline_ms (Optional[float], optional): Milliseconds the search
+            may take, after which the best path found so far is returned,
+            see `path_finding.anytime_a_star`. The algorithm is not used
+            then. Defaults to None.
+        max_expansions (Optional[int], optional): Nodes the search may
+            expand, likewise. Defaults to None.
+
+    Returns:
+        HTMLResponse: An HTML response with the solved maze image, path,
+        and download link, a 413 if the maze is over the size limits or
+        a 400 if it cannot be parsed. With the 'auto' algorithm, the
+        solver it picked and why are in the `X-Maze-Solver` and
+        `X-Maze-Solver-Reason` headers. With waypoints, the order they
+        are visited in is in the `X-Maze-Waypoint-Order` header, and
+        with `k`, the costs of the other paths, drawn fainter, are in
+        the `X-Maze-Alternative-Costs` header. With a deadline or a
+        limit on expansions, how many times the shortest path's cost the
+        path may be at most is in the `X-Maze-Bound` header, empty if
+        not known.
+    """
+    start_coords = parse_coords(start_coords)
+    end_coords = parse_coords(end_coords)
+    waypoints = parse_waypoints(waypoints)
+    check_plan(solve_algorithm, waypoints, k, deadline_ms, max_expansions)
+
+    maze_path = os.path.join(FILE_PREF, f'{uuid4()}.maze')
+    with timer('maze_stage_seconds', stage='read'):
+        maze_hash = await spool_upload(
+            partial(file.read, UPLOAD_CHUNK_SIZE), maze_path)
+    result = await run_solve(maze_path, maze_hash, solve_algorithm,
+                             start_coords, end_coords,
+                             profiling_requested(request),
+                             waypoints=waypoints, k=k,
+                             deadline_ms=deadline_ms,
+                             max_expansions=max_expansions)
+    if 'job' in result:
+        return job_accepted(result['job'])
+    response_ = result_page(result['image'], result['data'], result['name'],
+                            img_show, download, result['links'])
+    if result['downgraded']:
+        response_.headers['X-Maze-Downgraded'] = ','.join(
+            result['downgraded'])
+    if isinstance(result['path'], dict) and 'solver' in result['path']:
+        response_.headers['X-Maze-Solver'] = result['path']['solver']
+        response_.headers['X-Maze-Solver-Reason'] = result['path']['reason']
+    if isinstance(result['path'], dict) and 'order' in result['path']:
+        response_.headers['X-Maze-Waypoint-Order'] = ','.join(
+            map(str, result['path']['order']))
+    if isinstance(result['path'], dict) and 'alternatives' in result['path']:
+        response_.headers['X-Maze-Alternative-Costs'] = ','.join(
+            str(i['cost']) for i in result['path']['alternatives'])
+    if isinstance(result['path'], dict) and 'bound' in result['path']:
+        bound = result['path']['bound']
+        response_.headers['X-Maze-Bound'] = '' if bound is None else \
+            f'{bound:.4g}'
+    return response_
+
+
+@app.websocket('/ws/generate_maze')
+async def ws_generate_maze(websocket: WebSocket) -> None:
+    """
+    Generates a maze like `/generate_maze`, streaming its progress.
+    The client sends the parameters as one JSON message, {'width',
+    'height', 'strict', 'weight'}, and receives JSON events until the
+    server closes the socket:
+
+    - {'event': 'stage', 'stage'} when the generate and draw stages start.
+    - {'event': 'progress', 'stage': 'generate', 'cells', 'total'}.
+    - {'event': 'result', 'image', 'data', 'name', 'downgraded'} with the
+      artifact URLs, {'event': 'job', ...} with the job status if it was
+      queued instead, or {'event': 'error', 'status', 'detail'}.
+
+    Args:
+        websocket (WebSocket): The client connection.
+    """
+    await websocket.accept()
+    try:
+        params = await websocket.receive_json()
+        name_ = str(uuid4())
+        events = event_queue()
+        result = await stream_events(websocket, events, run_generation(
+            int(params['width']), int(params['height']),
+            float(params.get('strict', 0.9)),
+            float(params.get('weight', 0.2)), name_, events=events))
+        await websocket.send_json(result_event(result))
+    except WebSocketDisconnect:
+        return
+    except HTTPException as e:
+        await websocket.send_json({'event': 'error',
+                                   'status': e.status_code,
+                                   'detail': e.detail})
+    except (KeyError, TypeError, ValueError) as e:
+        await websocket.send_json({'event': 'error', 'status': 400,
+                                   'detail': f'Bad parameters: {e}'})
+    await websocket.close()
+
+
+@app.websocket('/ws/maze_solver')
+async def ws_maze_solver(websocket: WebSocket) -> None:
+    """
+    Solves a maze like `/maze_solver`, streaming its progress. The
+    client sends the parameters as one JSON message, {'solve_algorithm',
+    'start_coords', 'end_coords'} with coordinates as "x,y", and
+    optionally 'waypoints' as "x,y;x,y", 'k', 'deadline_ms' or
+    'max_expansions', then the maze file as binary messages ended by an
+    empty one. It receives JSON events until the server closes the
+    socket:
+
+    - {'event': 'stage', 'stage'} when the parse, solve and draw stages
+      start.
+    - {'event': 'progress', 'stage': 'solve', 'expanded', 'frontier',
+      'best_cost'} while searching.
+    - {'event': 'path', 'offset', 'path': [x0, y0, ...]} chunks of the
+      path as soon as it is found, before the image is drawn, then
+      {'event': 'solved', 'length', 'cost'}, plus the 'solver' and
+      'reason' the 'auto' algorithm picked, the waypoint 'order', or
+      the other paths as 'alternatives', [{'path', 'cost'}], or the
+      suboptimality 'bound' of a search with a deadline.
+    - {'event': 'result', 'image', 'data', 'name', 'downgraded'}, or
+      'job' or 'error' events as for `/ws/generate_maze`.
+
+    Args:
+        websocket (WebSocket): The client connection.
+    """
+    await websocket.accept()
+    try:
+        params = await websocket.receive_json()
+        start_coords = parse_coords(params['start_coords'])
+        end_coords = parse_coords(params['end_coords'])
+        waypoints = parse_waypoints(params.get('waypoints'))
+        solve_algorithm = int(params.get('solve_algorithm', 0))
+        k = int(params.get('k', 1))
+        deadline_ms = params.get('deadline_ms')
+        max_expansions = params.get('max_expansions')
+        deadline_ms = None if deadline_ms is None else float(deadline_ms)
+        max_expansions = None if max_expansions is None else \
+            int(max_expansions)
+        solve_plan(solve_algorithm, waypoints, k, deadline_ms, max_expansions)
+        maze_path = os.path.join(FILE_PREF, f'{uuid4()}.maze')
+        maze_hash = await spool_upload(websocket.receive_bytes, maze_path)
+        events = event_queue()
+        result = await stream_events(websocket, events, run_solve(
+            maze_path, maze_hash, solve_algorithm, start_coords, end_coords,
+            events=events, waypoints=waypoints, k=k, deadline_ms=deadline_ms,
+            max_expansions=max_expansions))
+        if result.get('cached'):
+            for event in path_events(result['path']):
+                await websocket.send_json(event)
+        await websocket.send_json(result_event(result))
+    except WebSocketDisconnect:
+        return
+    except HTTPException as e:
+        await websocket.send_json({'event': 'error',
+                                   'status': e.status_code,
+                                   'detail': e.detail})
+    except (KeyError, TypeError, ValueError, IndexError) as e:
+        await websocket.send_json({'event': 'error', 'status': 400,
+                                   'detail': f'Bad parameters: {e}'})
+    await websocket.close()
+
+
+@app.get("/generate_dict", response_class=HTMLResponse)
+async def generate_dict(request: Request) -> Response:
+    """
+    A route for generating a dict graph.
+
+    Returns:
+        HTMLResponse: An HTML response with a dict generator form.
+    """
+    return template_response('dict_generator_form.html', request.headers.get(
+        'if-none-match', ''), request.headers.get('accept-encoding', ''))
+
+
+@app.get("/dict_generator")
+async def dict_generator(num_nodes: int, num_edges: int, min_weight: int,
+                         max_weight: int, directional: Optional[bool] = False,
+                         name_: Union[str, None] = None, img_show: bool = False,
+                         download: int = 0) -> HTMLResponse:
+    """
+    Generates a dictionary of letters and weights,
+    and returns an HTML response containing the dictionary
+    and an image of the graph.
+
+    Args:
+        num_nodes (int): The number of nodes in the graph.
+        num_edges (int): The number of edges in the graph.
+        min_weight (int): The minimum weight of an edge in the graph.
+        max_weight (int): The maximum weight of an edge in the graph.
+        directional (bool, optional): Whether the graph should be directional or not.
+            Defaults to False.
+        name_ (str, optional): The name of the graph. Defaults to None.
+        img_show (bool, optional): Whether the graph image should be shown or not.
+            Defaults to False.
+        download (int, optional): Whether to download the image, text,
+            or zip file of the graph. 0 = no download, 1 = image download,
+            2 = text download, 3 = zip download (image and text). Defaults to 0.
+
+    Returns:
+        HTMLResponse: An HTML response containing the dictionary
+        and an image of the graph.
+    """
+    delete_temp_files()
+    name_ = str(uuid4()) if not name_ else name_
+    args = [num_nodes, num_edges, min_weight, max_weight, directional, name_]
+    cost = graph_cost('dict', num_nodes, num_edges)
+    if admit(cost) == 'job':
+        return job_accepted(submit_job('dict', args))
+
+    with reserve(cost):
+        path_ = await run_cpu(dict_graph_task, *args)
+    if path_ == 'Error':
+        return '400, Letter Dict failed'
+
+    image_digest = await run_io(store_artifact_file, path_, 'png')
+    data_digest = await run_io(store_artifact_file, os.path.join(
+        FILE_PREF, f'{name_}.json'), 'json')
+    return result_page(image_digest, data_digest, name_, img_show, download)
+
+
+@app.get("/generate_coords", response_class=HTMLResponse)
+async def generate_coords(request: Request) -> Response:
+    """
+    A route for generating a coords graph.
+
+    Returns:
+        HTMLResponse: An HTML response with a coords generator form.
+    """
+    return template_response('coords_generator_form.html', request.headers.get(
+        'if-none-match', ''), request.headers.get('accept-encoding', ''))
+
+
+@app.get("/coords_generator")
+async def coords_generator(num_nodes: int, num_edges: int, min_weight: int,
+                         max_weight: int, directional: Optional[bool] = False,
+                         name_: Union[str, None] = None, img_show: bool = False,
+                         download: int = 0) -> HTMLResponse:
+    """
+    Generates a dictionary of coords and weights,
+    and returns an HTML response containing the dictionary
+    and an image of the graph.
+
+    Args:
+        num_nodes (int): The number of nodes in the graph.
+        num_edges (int): The number of edges in the graph.
+        min_weight (int): The minimum weight of an edge in the graph.
+        max_weight (int): The maximum weight of an edge in the graph.
+        directional (bool, optional): Whether the graph should be directional or not.
+            Defaults to False.
+        name_ (str, optional): The name of the graph. Defaults to None.
+        img_show (bool, optional): Whether the graph image should be shown or not.
+            Defaults to False.
+        download (int, optional): Whether to download the image, text,
+            or zip file of the graph. 0 = no download, 1 = image download,
+            2 = text download, 3 = zip download (image and text). Defaults to 0.
+
+    Returns:
+        HTMLResponse: An HTML response containing the coordinates
+        and an image of the graph.
+    """
+    delete_temp_files()
+    name_ = str(uuid4()) if not name_ else name_
+    args = [num_nodes, num_edges, min_weight, max_weight, directional, name_]
+    cost = graph_cost('coords', num_nodes, num_edges)
+    if admit(cost) == 'job':
+        return job_accepted(submit_job('coords', args))
+
+    with reserve(cost):
+        path_ = await run_cpu(coords_graph_task, *args)
+
+    image_digest = await run_io(store_artifact_file, path_, 'png')
+    data_digest = await run_io(store_artifact_file, os.path.join(
+        FILE_PREF, f'{name_}.json'), 'json')
+    return result_page(image_digest, data_digest, name_, img_show, download)
+
+
+@app.get("/generate_matrix", response_class=HTMLResponse)
+async def generate_matrix(request: Request) -> Response:
+    """
+    A route for generating a matrix graph.
+
+    Returns:
+        HTMLResponse: An HTML response with a matrix generator form.
+    """
+    return template_response('matrix_generator_form.html', request.headers.get(
+        'if-none-match', ''), request.headers.get('accept-encoding', ''))
+
+
+@app.get("/matrix_generator")
+async def matrix_generator(num_nodes: int, num_edges: int, min_weight: int,
+                         max_weight: int, name_: Union[str, None] = None,
+                         img_show: bool = False, download: int = 0) -> HTMLResponse:
+    """
+    Generates a matrix of weights,
+    and returns an HTML response containing the dictionary
+    and an image of the matrix.
+
+    Args:
+        num_nodes (int): The number of nodes in the matrix.
+        num_edges (int): The number of edges in the matrix.
+        min_weight (int): The minimum weight of an edge in the matrix.
+        max_weight (int): The maximum weight of an edge in the matrix.
+        name_ (str, optional): The name of the matrix. Defaults to None.
+        img_show (bool, optional): Whether the matrix image should be shown or not.
+            Defaults to False.
+        download (int, optional): Whether to download the image, text,
+            or zip file of the matrix. 0 = no download, 1 = image download,
+            2 = text download, 3 = zip download (image and text). Defaults to 0.
+
+    Returns:
+        HTMLResponse: An HTML response containing the coordinates
+        and an image of the matrix.
+    """
+    delete_temp_files()
+    name_ = str(uuid4()) if not name_ else name_
+    args = [num_nodes, num_edges, min_weight, max_weight, name_]
+    cost = graph_cost('matrix', num_nodes, num_edges)
+    if admit(cost) == 'job':
+        return job_accepted(submit_job('matrix', args))
+
+    with reserve(cost):
+        path_ = await run_cpu(matrix_graph_task, *args)
+
+    image_digest = await run_io(store_artifact_file, path_, 'png')
+    data_digest = await run_io(store_artifact_file, os.path.join(
+        FILE_PREF, f'{name_}.json'), 'json')
+    return result_page(image_digest, data_digest, name_, img_show, download)
+
+
+@app.post("/jobs", status_code=202)
+async def create_job(kind: str = Form(...),
+                     name_: Optional[str] = Form(None),
+                     width: Optional[int] = Form(None),
+                     height: Optional[int] = Form(None),
+                     strict: Optional[float] = Form(0.9),
+                     weight: Optional[float] = Form(0.2),
+                     file: Optional[UploadFile] = File(None),
+                     solve_algorithm: Optional[int] = Form(0),
+                     start_coords: Optional[str] = Form(None),
+                     end_coords: Optional[str] = Form(None),
+                     waypoints: Optional[str] = Form(None),
+                     k: int = Form(1),
+                     deadline_ms: Optional[float] = Form(None),
+                     max_expansions: Optional[int] = Form(None),
+                     num_nodes: Optional[int] = Form(None),
+                     num_edges: Optional[int] = Form(None),
+                     min_weight: Optional[int] = Form(None),
+                     max_weight: Optional[int] = Form(None),
+                     directional: Optional[bool] = Form(False)
+                     ) -> JSONResponse:
+    """
+    Submits a long-running generation or solve as a background job,
+    so the client does not have to hold the connection open while
+    it computes.
+
+    Args:
+        kind (str): 'generate', 'solve', 'dict', 'coords' or 'matrix'.
+        name_ (str, optional): The name of the generated files.
+        width, height, strict, weight: The `/generate_maze` parameters,
+            for 'generate'.
+        file, solve_algorithm, start_coords, end_coords, waypoints, k,
+            deadline_ms, max_expansions: The `/maze_solver` parameters,
+            for 'solve'. The upload is spooled
+            to disk instead of being held in memory.
+        num_nodes, num_edges, min_weight, max_weight, directional: The
+            graph generator parameters, for 'dict', 'coords' and 'matrix'.
+
+    Returns:
+        JSONResponse: The queued job's status with a Location header
+        to poll, or a 400/429 error.
+    """
+    job_id = str(uuid4())
+    name_ = name_ or job_id
+    if kind == 'generate':
+        args = [width, height, strict, weight, name_]
+    elif kind == 'solve':
+        args = [file, solve_algorithm, start_coords, end_coords]
+    elif kind in ('dict', 'coords'):
+        args = [num_nodes, num_edges, min_weight, max_weight,
+                directional, name_]
+    else:
+        args = [num_nodes, num_edges, min_weight, max_weight, name_]
+    if kind in JOB_KINDS and None in args:
+        return JSONResponse({'detail': f'missing parameters for {kind}'},
+                            status_code=400)
+    input_path = None
+    if kind == 'solve':
+        waypoints = parse_waypoints(waypoints)
+        check_plan(solve_algorithm, waypoints, k, deadline_ms,
+                   max_expansions)
+        input_path = os.path.join(JOB_DIR, f'{job_id}.maze')
+        await spool_upload(partial(file.read, UPLOAD_CHUNK_SIZE),
+                           input_path)
+        args = [input_path, solve_algorithm, parse_coords(start_coords),
+                parse_coords(end_coords), waypoints, k, deadline_ms,
+                max_expansions]
+    try:
+        job = submit_job(kind, args, input_path, job_id)
+    except Exception:
+        if input_path:
+            os.remove(input_path)
+        raise
+    return job_accepted(job)
+
+
+@app.get("/jobs/{job_id}")
+async def read_job(job_id: str) -> JSONResponse:
+    """
+    Returns a job's status, stage, queue position and, once it is done,
+    the URLs of its image and data artifacts.
+    """
+    job = get_job(job_id)
+    if job is None:
+        return JSONResponse({'detail': 'Job not found'}, status_code=404)
+    return JSONResponse(job_status(job))
+
+
+@app.get("/jobs/{job_id}/result")
+async def read_job_result(job_id: str, type_: str = 'text') -> Response:
+    """
+    Streams a finished job's data ('text') or image ('image') from disk.
+
+    Returns:
+        Response: The result file, a 404 for unknown jobs, or a 409 with
+        the job's status if it has not finished successfully.
+    """
+    job = get_job(job_id)
+    if job is None:
+        return JSONResponse({'detail': 'Job not found'}, status_code=404)
+    if job['status'] != 'done':
+        return JSONResponse(job_status(job), status_code=409)
+    name_ = os.path.basename(job['result']['image' if type_ == 'image'
+                                            else 'data'])
+    path_ = os.path.join(ARTIFACT_DIR, name_)
+    if not os.path.exists(path_):
+        return JSONResponse({'detail': 'Result expired'}, status_code=410)
+    return FileResponse(path_, media_type=MEDIA_TYPES[name_.split('.')[-1]],
+                        filename=f"{job_id}.{name_.split('.')[-1]}")
+
+
+@app.delete("/jobs/{job_id}")
+async def delete_job(job_id: str) -> JSONResponse:
+    """
+    Cancels a queued or running job.
+    """
+    job = cancel_job(job_id)
+    if job is None:
+        return JSONResponse({'detail': 'Job not found'}, status_code=404)
+    return JSONResponse(job_status(job))
+
+
+async def run_generation(width: int, height: int, strict: float,
+                         weight: float, name_: str, profiled: bool = False,
+                         events: Any = None) -> Dict[str, Any]:
+    """
+    Admits, generates, draws and stores a maze, as shared by
+    `/generate_maze` and `/ws/generate_maze`.
+
+    Args:
+        width, height, strict, weight: The maze parameters.
+        name_ (str): The name of the generated files.
+        profiled (bool, optional): Run under the profiler. Defaults to
+            False.
+        events (Any, optional): A queue from `executors.event_queue` for
+            the worker's progress events. Defaults to None.
+
+    Raises:
+        HTTPException: 413 or 503 if it cannot be admitted.
+
+    Returns:
+        Dict[str, Any]: {'job': job} if it was queued, otherwise the
+        'image' and 'data' artifact digests, the 'name', the profile
+        'links' and the list of 'downgraded' parts.
+    """
+    cost = maze_cost(width, height)
+    downgraded = maze_cost(width, height, min(width, PREVIEW_SIZE)
+                           * min(height, PREVIEW_SIZE))
+    decision = admit(cost, downgraded)
+    if decision == 'job':
+        return {'job': submit_job(
+            'generate', [width, height, strict, weight, name_])}
+    preview = PREVIEW_SIZE if decision == 'downgrade' else 0
+    links = {}
+    with reserve(downgraded if preview else cost):
+        if profiled:
+            (image_path, report), profile = await run_cpu(
+                profile_task, generate_maze_timed_task, width, height,
+                strict, weight, name_, preview)
+            links = await run_io(store_profile,
+                                 f'generate_maze {width}x{height}', profile,
+                                 report['stages'])
+        else:
+            with timer('maze_stage_seconds', stage='generate'):
+                image_path = await run_cpu(generate_maze_task, width,
+                                           height, strict, weight, name_,
+                                           preview, events)
+
+    image_digest = await run_io(store_artifact_file, image_path, 'png')
+    data_digest = await run_io(store_artifact_file, os.path.join(
+        FILE_PREF, f'{name_}.json'), 'json')
+    return {'image': image_digest, 'data': data_digest, 'name': name_,
+            'links': links, 'downgraded': ['preview'] if preview else []}
+
+
+async def run_solve(maze_path: str, maze_hash: str, solve_algorithm: int,
+                    start_coords: Tuple[int, int],
+                    end_coords: Tuple[int, int], profiled: bool = False,
+                    events: Any = None,
+                    waypoints: Sequence[Tuple[int, int]] = (), k: int = 1,
+                    deadline_ms: Optional[float] = None,
+                    max_expansions: Optional[int] = None
+                    ) -> Dict[str, Any]:
+    """
+    Admits, solves, draws and stores a spooled maze upload, going
+    through the solve cache, as shared by `/maze_solver` and
+    `/ws/maze_solver`. The spooled file is removed or handed to a job.
+
+    Args:
+        maze_path (str): Where the upload was spooled.
+        maze_hash (str): Its SHA-256 hex digest.
+        solve_algorithm (int): The index of the solver.
+        start_coords (Tuple[int, int]): The starting coordinates.
+        end_coords (Tuple[int, int]): The ending coordinates.
+        profiled (bool, optional): Bypass the cache and run under the
+            profiler. Defaults to False.
+        events (Any, optional): A queue from `executors.event_queue` for
+            the worker's progress and path events. Defaults to None.
+        waypoints (Sequence[Tuple[int, int]], optional): Cells to route
+            through instead of solving with the algorithm, see
+            `tasks.solve_graph`. Defaults to none.
+        k (int, optional): How many shortest loopless paths to find,
+            see `tasks.solve_graph`. Defaults to 1.
+        deadline_ms, max_expansions (optional): Limits on the search,
+            see `tasks.solve_graph`. Defaults to none.
+
+    Raises:
+        HTTPException: 413 if the maze is over the size limits or the
+            budget, 400 if it cannot be parsed, 503 if it has to wait.
+
+    Returns:
+        Dict[str, Any]: {'job': job} if it was queued, otherwise the
+        solver result 'path', the 'image' and 'data' artifact digests,
+        the 'name', the profile 'links', the list of 'downgraded' parts
+        and whether it was 'cached'.
+    """
+    params = {key: value for key, value in (
+        ('waypoints', [list(i) for i in waypoints]), ('k', k > 1 and k),
+        ('deadline_ms', deadline_ms), ('max_expansions', max_expansions))
+        if value} or None
+    key = hash_solve_key(maze_hash, solve_algorithm, start_coords,
+                         end_coords, params)
+    links = {}
+    downgraded = []
+    try:
+        if not profiled:
+            entry = cache_get(key)
+            if entry is not None and await run_io(restore_solution, entry):
+                return dict(entry, links=links, downgraded=downgraded,
+                            cached=True)
+
+        cells = upload_cells(os.path.getsize(maze_path))
+        algorithm, searches = solve_plan(solve_algorithm, waypoints, k,
+                                         deadline_ms, max_expansions)
+        cost = solve_cost(cells, algorithm, searches=searches,
+                          deadline_ms=deadline_ms)
+        downgrade_algorithm, downgrade_cost = solve_downgrade(
+            cells, algorithm, searches, deadline_ms)
+        decision = admit(cost, downgrade_cost)
+        if decision == 'job':
+            job_id = str(uuid4())
+            input_path = os.path.join(JOB_DIR, f'{job_id}.maze')
+            os.replace(maze_path, input_path)
+            try:
+                return {'job': submit_job('solve', [
+                    input_path, solve_algorithm, start_coords, end_coords,
+                    waypoints, k, deadline_ms, max_expansions], input_path,
+                    job_id)}
+            except Exception:
+                os.remove(input_path)
+                raise
+        preview = 0
+        if decision == 'downgrade':
+            cost, preview = downgrade_cost, PREVIEW_SIZE
+            downgraded.append('preview')
+            if downgrade_algorithm != algorithm:
+                solve_algorithm = SOLVER_NAMES.index(downgrade_algorithm)
+                downgraded.append(downgrade_algorithm)
+        with reserve(cost):
+            if profiled:
+                (path, report, image_name), profile = await run_cpu(
+                    profile_task, solve_maze_task, maze_path,
+                    solve_algorithm, start_coords, end_coords, preview,
+                    None, None, waypoints, k, deadline_ms, max_expansions)
+                links = await run_io(
+                    store_profile,
+                    f'maze_solver {algorithm}'
+                    f' {start_coords} -> {end_coords}', profile,
+                    report['stages'])
+            else:
+                path, report, image_name = await run_cpu(
+                    solve_maze_task, maze_path, solve_algorithm,
+                    start_coords, end_coords, preview, events, maze_hash,
+                    waypoints, k, deadline_ms, max_expansions)
+    except MazeLimitError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        if os.path.exists(maze_path):
+            os.remove(maze_path)
+    record_report(report, solve_plan(solve_algorithm, waypoints, k,
+                                     deadline_ms, max_expansions)[0])
+
+    with timer('maze_stage_seconds', stage='store'):
+        image_digest = await run_io(store_artifact_file, os.path.join(
+            FILE_PREF, image_name + '.png'), 'png')
+        data_digest = await run_io(store_artifact_file, os.path.join(
+            FILE_PREF, image_name + '.json'), 'json')
+    entry = {'path': path, 'name': image_name, 'image': image_digest,
+             'data': data_digest}
+    if not downgraded:
+        cache_put(key, entry)
+    return dict(entry, links=links, downgraded=downgraded, cached=False)
+
+
+async def stream_events(websocket: WebSocket, events: Any,
+                        pipeline: Awaitable[Dict[str, Any]]
+                        ) -> Dict[str, Any]:
+    """
+    Runs a pipeline while forwarding the events its worker puts on
+    `events` to a WebSocket, polling every `EVENT_POLL_SECONDS`.
+
+    Args:
+        websocket (WebSocket): The client connection.
+        events (Any): The queue from `executors.event_queue`.
+        pipeline (Awaitable[Dict[str, Any]]): `run_generation` or
+            `run_solve`.
+
+    Returns:
+        Dict[str, Any]: The pipeline's result.
+    """
+    task = asyncio.ensure_future(pipeline)
+    try:
+        while True:
+            done = task.done()
+            while True:
+                try:
+                    event = events.get_nowait()
+                except queue.Empty:
+                    break
+                await websocket.send_json(event)
+            if done:
+                return task.result()
+            await asyncio.wait({task}, timeout=EVENT_POLL_SECONDS)
+    except BaseException:
+        # The client is gone: let the pipeline finish and clean up.
+        if not task.done():
+            await asyncio.wait({task})
+        raise
+
+
+def result_event(result: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Turns a `run_generation` or `run_solve` result into the final
+    WebSocket event.
+    """
+    if 'job' in result:
+        return dict(job_status(result['job']), event='job',
+                    location=f"/jobs/{result['job']['id']}")
+    return {'event': 'result', 'name': result['name'],
+            'image': artifact_url(result['image'], 'png'),
+            'data': artifact_url(result['data'], 'json'),
+            'downgraded': result['downgraded'],
+            **({'links': result['links']} if result['links'] else {})}
+
+
+def job_accepted(job: Dict[str, Any]) -> JSONResponse:
+    """
+    Answers 202 with a queued job's status and where to poll it.
+    """
+    return JSONResponse(job_status(job), status_code=202,
+                        headers={'Location': f"/jobs/{job['id']}"})
+
+
+def parse_coords(coords: str) -> Tuple[int, int]:
+    """
+    Parses coordinates given in the form "x,y".
+    """
+    coords = [int(i) for i in coords.split(',')]
+    return (coords[0], coords[1])
+
+
+def check_plan(solve_algorithm: int, waypoints: Sequence[Tuple[int, int]],
+               k: int, deadline_ms: Optional[float],
+               max_expansions: Optional[int]) -> None:
+    """
+    Raises:
+        HTTPException: 400 if the solve options do not go together, see
+            `tasks.solve_plan`.
+    """
+    try:
+        solve_plan(solve_algorithm, waypoints, k, deadline_ms,
+                   max_expansions)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def parse_waypoints(waypoints: Optional[str]) -> List[Tuple[int, int]]:
+    """
+    Parses a list of coordinates given in the form "x,y;x,y".
+    """
+    return [parse_coords(i) for i in (waypoints or '').split(';')
+            if i.strip()]
+
+
+async def spool_upload(read: Callable[[], Awaitable[bytes]],
+                       path_: str) -> str:
+    """
+    Copies an upload to disk a chunk at a time, hashing it on the way,
+    so it can be handed to a worker by path.
+
+    Args:
+        read (Callable[[], Awaitable[bytes]]): Returns the next chunk,
+            or an empty one at the end, e.g. a bound `UploadFile.read`
+            or `WebSocket.receive_bytes`.
+        path_ (str): Where to write it.
+
+    Raises:
+        HTTPException: 413 if it is larger than `MAX_UPLOAD_BYTES`.
+
+    Returns:
+        str: The upload's SHA-256 hex digest.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with open(path_, 'wb') as f:
+            while chunk := await read():
+                size += len(chunk)
+                if size > MAX_UPLOAD_BYTES:
+                    raise HTTPException(status_code=413,
+                                        detail='Upload is too large')
+                digest.update(chunk)
+                f.write(chunk)
+    except BaseException:
+        os.remove(path_)
+        raise
+    return digest.hexdigest()
+
+
+def restore_solution(entry: Dict[str, Any]) -> bool:
+    """
+    Puts a cached solution's image and data back under its name so the
+    download endpoint can find them.
+
+    Args:
+        entry (Dict[str, Any]): The solve cache entry.
+
+    Returns:
+        bool: False if its artifacts have expired and it must be re-solved.
+    """
+    return all(restore_artifact_file(entry[kind], ext, os.path.join(
+        FILE_PREF, f"{entry['name']}.{ext}")) for kind, ext in (
+            ('image', 'png'), ('data', 'json')))
+
+
+def result_page(image_digest: str, data_digest: str, name_: str,
+                img_show: bool, download: int,
+                links: Optional[Dict[str, str]] = None) -> HTMLResponse:
+    """
+    Builds the HTML page shown after generating or solving, referencing
+    the image and data artifacts by URL instead of inlining them.
+
+    Args:
+        image_digest (str): The digest of the stored PNG artifact.
+        data_digest (str): The digest of the stored data artifact.
+        name_ (str): The name the download endpoint knows the files by.
+        img_show (bool): Whether the image should be displayed.
+        download (int): 0 for no download, 1 for image only,
+            2 for text only, 3 for both.
+        links (Dict[str, str], optional): Extra labelled links, such as
+            profile reports, to list under the data link.
+
+    Returns:
+        HTMLResponse: The result page.
+    """
+    image_url = artifact_url(image_digest, 'png')
+    data_url = artifact_url(data_digest, 'json')
+    links = links or {}
+    return HTMLResponse(f"""
+    <html>
+    <body {'onload="download__()"' if download != 0 else delete_temp_files()}>
+        {f'<img src="{image_url}" />' if img_show else ''}
+        <p></p>
+        <p><a href="{data_url}">{data_url}</a></p>
+        {''.join(f'<p><a href="{url}">{label}</a></p>'
+                 for label, url in links.items())}
+
+        <a id="download-link" href="/download/{
+            'image' if download == 1 else 'text'
+            if download == 2 else 'zip'}/{name_}" style="display:none"></a>
+        <script>
+        function download__() {{
+            var downloadLink = document.getElementById('download-link');
+            downloadLink.click();
+        }}
+        </script>
+    </body>
+    </html>
+    """, headers={
+        "Cache-Control": "no-cache, no-store, must-revalidate",
+        "Pragma": "no-cache",
+        "Expires": "0",
+        **({"X-Maze-Profile-Report": links['Profile report']}
+           if 'Profile report' in links else {}),
+    })
+
+
+def delete_temp_files() -> None:
+    """
+    Deletes all temporary files in the specified file prefix directory.
+    Files younger than `TEMP_FILE_GRACE` seconds are kept, since other
+    requests may still be writing or linking them. Content-addressed
+    artifacts live in a subdirectory and are only removed once they expire.
+    The directory is shared by every server process, so it is swept at
+    most once every `SWEEP_INTERVAL` seconds per process and by one
+    process at a time.
+    """
+    global last_sweep
+    if time.monotonic() - last_sweep < SWEEP_INTERVAL:
+        return
+    last_sweep = time.monotonic()
+    prune_jobs()
+    with file_lock('sweep', blocking=False) as locked:
+        if not locked:
+            return
+        prune_artifacts()
+        prune_cache()
+        prune_corridors()
+        prune_sessions()
+        cutoff = time.time() - TEMP_FILE_GRACE
+        for filename in os.listdir(FILE_PREF):
+            file_path = os.path.join(FILE_PREF, filename)
+            try:
+                if os.path.isfile(file_path) and \
+                        os.path.getmtime(file_path) < cutoff:
+                    os.remove(file_path)
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                print(f"Error deleting file {file_path}: {e}")
+
+
+def zipfiles(file_list: List[str]) -> StreamingResponse:
+    """
+    Creates a zip file containing the files in the specified
+    list of file paths.
+
+    Args:
+    file_list (List[str]): A list of file paths to be zipped.
+
+    Returns:
+    StreamingResponse: A streaming response that is a zip file
+    containing the specified files.
+    """
+    io_ = io.BytesIO()
+    zip_sub_dir = FILE_PREF
+    zip_filename = zip_sub_dir.replace('/', '') + '.zip'
+    with zipfile.ZipFile(io_, mode='w',
+                         compression=zipfile.ZIP_DEFLATED) as zip:
+        for fpath in file_list:
+            zip.write(fpath)
+        zip.close()
+    return StreamingResponse(
+        iter([io_.getvalue()]),
+        media_type="application/x-zip-compressed",
+        headers={"Content-Disposition": f"attachment;filename={zip_filename}"}
+    )
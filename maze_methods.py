@@ -1,212 +1,393 @@
-import os
-import random
-
-from uuid import uuid4
-from PIL import Image, ImageDraw
-
-from typing import Dict, Tuple, Optional, Union, List
-
-FILE_PREF = 'maze_data' if 'maze_solver' in os.getcwd() else '/tmp/'
-
-
-def generate_maze_(width: int, height: int, strict: float = 0.9,
-                   add_weights_prob: float = 0.2, name_: str = None
-                   ) -> Dict[Tuple[int, int], Dict[Tuple[int, int], int]]:
-    """
-    Generates a maze using a modified version of the
-    Depth-First Search algorithm.
-
-    Args:
-        width (int): The width of the maze.
-        height (int): The height of the maze.
-        strict (float, optional): The strictness of the maze.
-            A value between 0 and 1, where 1 generates a perfect maze.
-            Defaults to 0.9.
-        add_weights_prob (float, optional): The probability of adding
-            weights to the edges. A value between 0 and 1. Defaults to 0.2.
-        name_ (str, optional): The name of the file where the maze
-            will be saved. Defaults to None.
-
-    Returns:
-        Dict[Tuple[int, int], Dict[Tuple[int, int], int]]:
-            The maze represented as a dictionary of dictionaries. The keys
-            of the outer dictionary are the coordinates of the cells, and
-            the values are dictionaries containing the neighbors of the
-            cells and the weights of the edges that connect them.
-    """
-    maze = {}
-    for x in range(width):
-        for y in range(height):
-            maze[(x, y)] = {}
-    for x in range(width):
-        for y in range(height):
-            if x > 0:
-                maze[(x, y)][(x-1, y)] = 100
-            if x < width - 1:
-                maze[(x, y)][(x+1, y)] = 100
-            if y > 0:
-                maze[(x, y)][(x, y-1)] = 100
-            if y < height - 1:
-                maze[(x, y)][(x, y+1)] = 100
-    visited = []
-    stack = [(0, 0)]
-    while stack:
-        current = stack[-1]
-        visited.append(current)
-        unvisited_neighbors = []
-        for neighbor in maze[current]:
-            if neighbor not in visited:
-                unvisited_neighbors.append(neighbor)
-        if unvisited_neighbors:
-            neighbor = random.choice(unvisited_neighbors)
-            maze[current][neighbor] = 0
-            maze[neighbor][current] = 0
-            if random.random() <= add_weights_prob:
-                weight = random.randint(1, 10)
-                maze[current][neighbor] = weight
-                maze[neighbor][current] = weight
-            if random.randint(1, 10) <= 10*(1-strict):
-                neighbor = random.choice(unvisited_neighbors)
-                maze[current][neighbor] = 0
-                maze[neighbor][current] = 0
-                if random.random() <= add_weights_prob:
-                    weight = random.randint(1, 10)
-                    maze[current][neighbor] = weight
-                    maze[neighbor][current] = weight
-            stack.append(neighbor)
-        else:
-            stack.pop()
-    with open(os.path.join(FILE_PREF, name_ + '.json'), 'w') as f:
-        f.write(str(maze))
-    return maze
-
-
-def draw_maze(maze: Dict[Tuple[int, int], Dict[Tuple[int, int], int]],
-              path: Optional[Dict[str, Union[int, List[Tuple[int, int]]]]
-                             ] = None, name_: str = 'maze') -> Tuple[
-                                 Image.Image, str]:
-    """
-    Draws a maze represented as a dictionary of coordinates and walls.
-
-    Args:
-        maze: A dictionary of coordinates and their connected walls.
-        path: An optional dictionary containing the path taken
-            through the maze and its cost.
-        name_: An optional name for the saved image file.
-
-    Returns:
-        A tuple containing the drawn image and the file path.
-    """
-    max_x = max(coord[0] for coord in maze.keys())
-    max_y = max(coord[1] for coord in maze.keys())
-    cell_size = 20
-    wall_size = 3
-    image_width = max_x * cell_size + wall_size + cell_size
-    image_height = max_y * cell_size + wall_size + cell_size
-    img = Image.new("RGB", (image_width, image_height), "white")
-    img_draw = ImageDraw.Draw(img)
-    for coord, walls in maze.items():
-        x, y = coord
-        for neighbor, wall in walls.items():
-            weight = 255 - wall * 25
-            color = (255, weight, weight)
-            if wall == 100:
-                dx = neighbor[0] - x
-                dy = neighbor[1] - y
-                if dx == 1:
-                    x1 = (x + 1) * cell_size + wall_size // 2
-                    y1 = y * cell_size + wall_size // 2
-                    x2 = x1
-                    y2 = (y + 1) * cell_size - wall_size // 2
-                elif dx == -1:
-                    x1 = x * cell_size + wall_size // 2
-                    y1 = y * cell_size + wall_size // 2
-                    x2 = x1
-                    y2 = (y + 1) * cell_size - wall_size // 2
-                elif dy == 1:
-                    x1 = x * cell_size + wall_size // 2
-                    y1 = (y + 1) * cell_size + wall_size // 2
-                    x2 = (x + 1) * cell_size - wall_size // 2
-                    y2 = y1
-                elif dy == -1:
-                    x1 = x * cell_size + wall_size // 2
-                    y1 = y * cell_size + wall_size // 2
-                    x2 = (x + 1) * cell_size - wall_size // 2
-                    y2 = y1
-                img_draw.line((x1, y1, x2, y2), fill="black", width=wall_size)
-            else:
-                if wall != 0:
-                    dx = neighbor[0] - x
-                    dy = neighbor[1] - y
-                    x1 = coord[0] * cell_size + wall_size
-                    y1 = coord[1] * cell_size + wall_size
-                    x2 = (coord[0] + 1) * cell_size - wall_size
-                    y2 = (coord[1] + 1) * cell_size - wall_size
-                    img_draw.rectangle((x1, y1, x2, y2), fill=color)
-                    img_draw.text((x1, y1), text=str(wall), fill='black')
-                    img_draw = ImageDraw.Draw(img)
-                    if dx > 0:
-                        img_draw.polygon([(x2-wall_size*2, y2-wall_size*2),
-                                          (x2-wall_size*2, y2),
-                                          (x2-wall_size, y2-wall_size)],
-                                         fill="black")
-                    elif dx < 0:
-                        img_draw.polygon([(x2-wall_size, y2),
-                                          (x2-wall_size, y2-wall_size*2),
-                                          (x2-wall_size*2, y2-wall_size)],
-                                         fill="black")
-                    elif dy > 0:
-                        img_draw.polygon([(x2-wall_size*2, y1+wall_size*3),
-                                          (x2, y1+wall_size*3),
-                                          (x2-wall_size, y1+wall_size*4)],
-                                         fill="black")
-                    elif dy < 0:
-                        img_draw.polygon([(x2, y1+wall_size*4),
-                                          (x2-wall_size*2, y1+wall_size*4),
-                                          (x2-wall_size, y1+wall_size*3)],
-                                         fill="black")
-    img_draw.ellipse((cell_size//2-3, cell_size//2-3, cell_size//2+3,
-                      cell_size//2+3), fill="green", outline="green")
-    img_draw.ellipse((image_width-cell_size//2-3, image_height-cell_size//2-3,
-                      image_width-cell_size//2+3, image_height-cell_size//2+3),
-                     fill="red", outline="red")
-    if name_ == 'maze':
-        name_ = str(uuid4()) + '_' + name_
-    if path:
-        path_coords = [(coord[0] * cell_size + cell_size // 2,
-                        coord[1] * cell_size + cell_size // 2)
-                       for coord in path['path']]
-        img_draw.line(path_coords, fill="blue", width=4)
-        img.save(f := os.path.join(
-            FILE_PREF, f"{name_}_{path.get('cost', '')}_solution.png"))
-    else:
-        img.save(f := os.path.join(FILE_PREF, f"{name_}.png"))
-    return img, f
-
-
-def filter_maze_passages(maze: Dict[str, Dict[str, int]]
-                         ) -> Dict[str, Dict[str, int]]:
-    """
-    Filters out any closed passages from the given maze.
-
-    Args:
-        maze (Dict[str, Dict[str, int]]): A dictionary
-        representing the maze where each key represents a cell
-        and each value represents a dictionary of adjacent cells
-        and their weights.
-
-    Returns:
-        Dict[str, Dict[str, int]]: A filtered version of the
-        maze dictionary containing only open passages where each key
-        represents a cell and each value represents a dictionary
-        of adjacent cells and their weights.
-    """
-    open_passages = {}
-    for cell, adjacents in maze.items():
-        open_adjacents = {}
-        for adj, weight in adjacents.items():
-            if weight != 100:
-                open_adjacents[adj] = weight
-        if open_adjacents:
-            open_passages[cell] = open_adjacents
-    return open_passages
+import os
+import re
+import random
+
+from array import array
+from uuid import uuid4
+
+from typing import (Dict, Tuple, Optional, Union, List, Iterable, Callable,
+                    TYPE_CHECKING)
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+FILE_PREF = 'maze_data' if 'maze_solver' in os.getcwd() else '/tmp/'
+MAZE_TOKEN = re.compile(rb'\(\s*(\d+)\s*,\s*(\d+)\s*\)\s*:\s*(\{|-?\d+)')
+MAX_TOKEN_SIZE = 256
+PROGRESS_INTERVAL = 1024
+
+
+class MazeLimitError(ValueError):
+    """
+    Raised when an uploaded maze has more cells or edges than allowed.
+    """
+
+
+def generate_maze_(width: int, height: int, strict: float = 0.9,
+                   add_weights_prob: float = 0.2, name_: str = None,
+                   progress: Optional[Callable[[int, int], None]] = None
+                   ) -> Dict[Tuple[int, int], Dict[Tuple[int, int], int]]:
+    """
+    Generates a maze using a modified version of the
+    Depth-First Search algorithm.
+
+    Args:
+        width (int): The width of the maze.
+        height (int): The height of the maze.
+        strict (float, optional): The strictness of the maze.
+            A value between 0 and 1, where 1 generates a perfect maze.
+            Defaults to 0.9.
+        add_weights_prob (float, optional): The probability of adding
+            weights to the edges. A value between 0 and 1. Defaults to 0.2.
+        name_ (str, optional): The name of the file where the maze
+            will be saved. Defaults to None.
+        progress (Callable[[int, int], None], optional): Called every
+            `PROGRESS_INTERVAL` carved cells with the cells carved so far
+            and the total. Defaults to None.
+
+    Returns:
+        Dict[Tuple[int, int], Dict[Tuple[int, int], int]]:
+            The maze represented as a dictionary of dictionaries. The keys
+            of the outer dictionary are the coordinates of the cells, and
+            the values are dictionaries containing the neighbors of the
+            cells and the weights of the edges that connect them.
+    """
+    maze = {}
+    for x in range(width):
+        for y in range(height):
+            maze[(x, y)] = {}
+    for x in range(width):
+        for y in range(height):
+            if x > 0:
+                maze[(x, y)][(x-1, y)] = 100
+            if x < width - 1:
+                maze[(x, y)][(x+1, y)] = 100
+            if y > 0:
+                maze[(x, y)][(x, y-1)] = 100
+            if y < height - 1:
+                maze[(x, y)][(x, y+1)] = 100
+    visited = []
+    stack = [(0, 0)]
+    carved = 1
+    while stack:
+        current = stack[-1]
+        visited.append(current)
+        unvisited_neighbors = []
+        for neighbor in maze[current]:
+            if neighbor not in visited:
+                unvisited_neighbors.append(neighbor)
+        if unvisited_neighbors:
+            neighbor = random.choice(unvisited_neighbors)
+            maze[current][neighbor] = 0
+            maze[neighbor][current] = 0
+            if random.random() <= add_weights_prob:
+                weight = random.randint(1, 10)
+                maze[current][neighbor] = weight
+                maze[neighbor][current] = weight
+            if random.randint(1, 10) <= 10*(1-strict):
+                neighbor = random.choice(unvisited_neighbors)
+                maze[current][neighbor] = 0
+                maze[neighbor][current] = 0
+                if random.random() <= add_weights_prob:
+                    weight = random.randint(1, 10)
+                    maze[current][neighbor] = weight
+                    maze[neighbor][current] = weight
+            stack.append(neighbor)
+            carved += 1
+            if progress is not None and carved % PROGRESS_INTERVAL == 0:
+                progress(carved, width * height)
+        else:
+            stack.pop()
+    with open(os.path.join(FILE_PREF, name_ + '.json'), 'w') as f:
+        f.write(str(maze))
+    return maze
+
+
+def draw_maze(maze: Dict[Tuple[int, int], Dict[Tuple[int, int], int]],
+              path: Optional[Dict[str, Union[int, List[Tuple[int, int]]]]
+                             ] = None, name_: str = 'maze') -> Tuple[
+                                 'Image.Image', str]:
+    """
+    Draws a maze represented as a dictionary of coordinates and walls.
+
+    Args:
+        maze: A dictionary of coordinates and their connected walls.
+        path: An optional dictionary containing the path taken
+            through the maze and its cost, and any 'alternatives',
+            drawn fainter beneath it.
+        name_: An optional name for the saved image file.
+
+    Returns:
+        A tuple containing the drawn image and the file path.
+    """
+    from PIL import Image, ImageDraw
+    max_x = max(coord[0] for coord in maze.keys())
+    max_y = max(coord[1] for coord in maze.keys())
+    cell_size = 20
+    wall_size = 3
+    image_width = max_x * cell_size + wall_size + cell_size
+    image_height = max_y * cell_size + wall_size + cell_size
+    img = Image.new("RGB", (image_width, image_height), "white")
+    img_draw = ImageDraw.Draw(img)
+    for coord, walls in maze.items():
+        x, y = coord
+        for neighbor, wall in walls.items():
+            weight = 255 - wall * 25
+            color = (255, weight, weight)
+            if wall == 100:
+                dx = neighbor[0] - x
+                dy = neighbor[1] - y
+                if dx == 1:
+                    x1 = (x + 1) * cell_size + wall_size // 2
+                    y1 = y * cell_size + wall_size // 2
+                    x2 = x1
+                    y2 = (y + 1) * cell_size - wall_size // 2
+                elif dx == -1:
+                    x1 = x * cell_size + wall_size // 2
+                    y1 = y * cell_size + wall_size // 2
+                    x2 = x1
+                    y2 = (y + 1) * cell_size - wall_size // 2
+                elif dy == 1:
+                    x1 = x * cell_size + wall_size // 2
+                    y1 = (y + 1) * cell_size + wall_size // 2
+                    x2 = (x + 1) * cell_size - wall_size // 2
+                    y2 = y1
+                elif dy == -1:
+                    x1 = x * cell_size + wall_size // 2
+                    y1 = y * cell_size + wall_size // 2
+                    x2 = (x + 1) * cell_size - wall_size // 2
+                    y2 = y1
+                img_draw.line((x1, y1, x2, y2), fill="black", width=wall_size)
+            else:
+                if wall != 0:
+                    dx = neighbor[0] - x
+                    dy = neighbor[1] - y
+                    x1 = coord[0] * cell_size + wall_size
+                    y1 = coord[1] * cell_size + wall_size
+                    x2 = (coord[0] + 1) * cell_size - wall_size
+                    y2 = (coord[1] + 1) * cell_size - wall_size
+                    img_draw.rectangle((x1, y1, x2, y2), fill=color)
+                    img_draw.text((x1, y1), text=str(wall), fill='black')
+                    img_draw = ImageDraw.Draw(img)
+                    if dx > 0:
+                        img_draw.polygon([(x2-wall_size*2, y2-wall_size*2),
+                                          (x2-wall_size*2, y2),
+                                          (x2-wall_size, y2-wall_size)],
+                                         fill="black")
+                    elif dx < 0:
+                        img_draw.polygon([(x2-wall_size, y2),
+                                          (x2-wall_size, y2-wall_size*2),
+                                          (x2-wall_size*2, y2-wall_size)],
+                                         fill="black")
+                    elif dy > 0:
+                        img_draw.polygon([(x2-wall_size*2, y1+wall_size*3),
+                                          (x2, y1+wall_size*3),
+                                          (x2-wall_size, y1+wall_size*4)],
+                                         fill="black")
+                    elif dy < 0:
+                        img_draw.polygon([(x2, y1+wall_size*4),
+                                          (x2-wall_size*2, y1+wall_size*4),
+                                          (x2-wall_size, y1+wall_size*3)],
+                                         fill="black")
+    img_draw.ellipse((cell_size//2-3, cell_size//2-3, cell_size//2+3,
+                      cell_size//2+3), fill="green", outline="green")
+    img_draw.ellipse((image_width-cell_size//2-3, image_height-cell_size//2-3,
+                      image_width-cell_size//2+3, image_height-cell_size//2+3),
+                     fill="red", outline="red")
+    if name_ == 'maze':
+        name_ = str(uuid4()) + '_' + name_
+    if path:
+        for alternative in path.get('alternatives', ()):
+            img_draw.line([(coord[0] * cell_size + cell_size // 2,
+                            coord[1] * cell_size + cell_size // 2)
+                           for coord in alternative['path']],
+                          fill=(150, 150, 255), width=2)
+        path_coords = [(coord[0] * cell_size + cell_size // 2,
+                        coord[1] * cell_size + cell_size // 2)
+                       for coord in path['path']]
+        img_draw.line(path_coords, fill="blue", width=4)
+        img.save(f := os.path.join(
+            FILE_PREF, f"{name_}_{path.get('cost', '')}_solution.png"))
+    else:
+        img.save(f := os.path.join(FILE_PREF, f"{name_}.png"))
+    return img, f
+
+
+def crop_maze(maze: Dict[Tuple[int, int], Dict[Tuple[int, int], int]],
+              width: int, height: int
+              ) -> Dict[Tuple[int, int], Dict[Tuple[int, int], int]]:
+    """
+    Keeps the top left `width` by `height` cells of a maze, for drawing
+    a preview of a maze too large to draw whole.
+
+    Args:
+        maze (Dict[Tuple[int, int], Dict[Tuple[int, int], int]]):
+            The maze.
+        width (int): The number of columns to keep.
+        height (int): The number of rows to keep.
+
+    Returns:
+        Dict[Tuple[int, int], Dict[Tuple[int, int], int]]: The cropped
+            maze.
+    """
+    return {(x, y): {(nx, ny): wall for (nx, ny), wall in walls.items()
+                     if nx < width and ny < height}
+            for (x, y), walls in maze.items() if x < width and y < height}
+
+
+def filter_maze_passages(maze: Dict[str, Dict[str, int]]
+                         ) -> Dict[str, Dict[str, int]]:
+    """
+    Filters out any closed passages from the given maze.
+
+    Args:
+        maze (Dict[str, Dict[str, int]]): A dictionary
+        representing the maze where each key represents a cell
+        and each value represents a dictionary of adjacent cells
+        and their weights.
+
+    Returns:
+        Dict[str, Dict[str, int]]: A filtered version of the
+        maze dictionary containing only open passages where each key
+        represents a cell and each value represents a dictionary
+        of adjacent cells and their weights.
+    """
+    open_passages = {}
+    for cell, adjacents in maze.items():
+        open_adjacents = {}
+        for adj, weight in adjacents.items():
+            if weight != 100:
+                open_adjacents[adj] = weight
+        if open_adjacents:
+            open_passages[cell] = open_adjacents
+    return open_passages
+
+
+def maze_to_grid(maze: Dict[Tuple[int, int], Dict[Tuple[int, int], int]]
+                 ) -> Dict[str, Union[int, List[int]]]:
+    """
+    Encodes a maze as a compact grid, storing for every cell, in
+    row-major order, the weight of the passage to its right and the one
+    below it. A weight of 100 is a wall, as in the maze dictionaries.
+    Passages are assumed to weigh the same in both directions, which
+    holds for every maze made by `generate_maze_`.
+
+    Args:
+        maze (Dict[Tuple[int, int], Dict[Tuple[int, int], int]]):
+            The maze as returned by `generate_maze_`.
+
+    Returns:
+        Dict[str, Union[int, List[int]]]: The grid with keys 'width',
+            'height', 'right' and 'down'.
+    """
+    width = max(coord[0] for coord in maze) + 1
+    height = max(coord[1] for coord in maze) + 1
+    right = [100] * (width * height)
+    down = [100] * (width * height)
+    for (x, y), walls in maze.items():
+        right[y * width + x] = walls.get((x + 1, y), 100)
+        down[y * width + x] = walls.get((x, y + 1), 100)
+    return {'width': width, 'height': height, 'right': right, 'down': down}
+
+
+def grid_to_maze(grid: Dict[str, Union[int, List[int]]]
+                 ) -> Dict[Tuple[int, int], Dict[Tuple[int, int], int]]:
+    """
+    Decodes a grid made by `maze_to_grid` back into a maze dictionary.
+
+    Args:
+        grid (Dict[str, Union[int, List[int]]]): The compact grid.
+
+    Returns:
+        Dict[Tuple[int, int], Dict[Tuple[int, int], int]]: The maze.
+    """
+    width, height = grid['width'], grid['height']
+    right, down = grid['right'], grid['down']
+    maze = {(x, y): {} for x in range(width) for y in range(height)}
+    for y in range(height):
+        for x in range(width):
+            if x < width - 1:
+                maze[(x, y)][(x + 1, y)] = right[y * width + x]
+                maze[(x + 1, y)][(x, y)] = right[y * width + x]
+            if y < height - 1:
+                maze[(x, y)][(x, y + 1)] = down[y * width + x]
+                maze[(x, y + 1)][(x, y)] = down[y * width + x]
+    return maze
+
+
+def parse_maze_stream(chunks: Iterable[bytes], max_cells: int = 0,
+                      max_edges: int = 0) -> Dict[str, Union[int, List[int]]]:
+    """
+    Parses a maze file, as written by `generate_maze_`, chunk by chunk
+    straight into the compact grid of `maze_to_grid`, without ever
+    holding the whole file or the maze dictionary in memory. Only the
+    passages to the right and below each cell are kept, as passages are
+    assumed to weigh the same in both directions.
+
+    Args:
+        chunks (Iterable[bytes]): The file's contents, in any chunks.
+        max_cells (int, optional): The most cells the grid may span,
+            0 for no limit. Defaults to 0.
+        max_edges (int, optional): The most neighbour entries the file
+            may list, 0 for no limit. Defaults to 0.
+
+    Raises:
+        MazeLimitError: If the maze is larger than the limits.
+        ValueError: If the file is not a grid maze.
+
+    Returns:
+        Dict[str, Union[int, List[int]]]: The grid with keys 'width',
+            'height', 'right' and 'down'.
+    """
+    passages = array('i')
+    cell = None
+    cells = edges = width = height = 0
+    tail = b''
+    chunks = iter(chunks)
+    while True:
+        chunk = next(chunks, None)
+        data = tail + (chunk or b'')
+        end = 0
+        for match in MAZE_TOKEN.finditer(data):
+            if chunk is not None and match.end() == len(data):
+                break
+            if data[end:match.start()].strip(b' \t\r\n,{}'):
+                raise ValueError('Not a maze file')
+            end = match.end()
+            x, y = int(match[1]), int(match[2])
+            if match[3] == b'{':
+                cell = (x, y)
+                cells += 1
+                width, height = max(width, x + 1), max(height, y + 1)
+                if max_cells and (cells > max_cells
+                                  or width * height > max_cells):
+                    raise MazeLimitError(
+                        f'Maze is larger than {max_cells} cells')
+                continue
+            edges += 1
+            if max_edges and edges > max_edges:
+                raise MazeLimitError(f'Maze has more than {max_edges} edges')
+            if cell is None:
+                raise ValueError('Not a maze file')
+            dx, dy = x - cell[0], y - cell[1]
+            if (dx, dy) in ((1, 0), (0, 1)):
+                passages.extend((cell[0], cell[1], dx, int(match[3])))
+            elif (dx, dy) not in ((-1, 0), (0, -1)):
+                raise ValueError(
+                    f'Cell {cell} is linked to {(x, y)}, which is not '
+                    'next to it')
+        tail = data[end:]
+        if chunk is None:
+            break
+        if len(tail) > MAX_TOKEN_SIZE:
+            tail = tail.lstrip(b' \t\r\n,{}')
+            if len(tail) > MAX_TOKEN_SIZE:
+                raise ValueError('Not a maze file')
+    if tail.strip(b' \t\r\n,{}') or not cells:
+        raise ValueError('Not a maze file')
+    right = [100] * (width * height)
+    down = [100] * (width * height)
+    for i in range(0, len(passages), 4):
+        x, y, dx, weight = passages[i:i + 4]
+        (right if dx else down)[y * width + x] = weight
+    return {'width': width, 'height': height, 'right': right, 'down': down}
@@ -0,0 +1,152 @@
+import os
+import time
+
+from contextlib import contextmanager
+
+from typing import Dict, Iterator, List, Tuple
+
+ENABLED = os.environ.get('MAZE_METRICS', '1') != '0'
+TIME_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0,
+                2.5, 5.0, 10.0, 30.0, 60.0)
+SIZE_BUCKETS = (10, 100, 1000, 10000, 100000, 1000000)
+HELP = {
+    'maze_stage_seconds': 'Time spent in each pipeline stage.',
+    'maze_solve_seconds': 'Time spent searching, by algorithm.',
+    'maze_search_peak_frontier': 'Largest frontier of each search.',
+    'maze_search_nodes_expanded_total': 'Nodes expanded by the solvers.',
+    'maze_search_relaxations_total': 'Edge relaxations by the solvers.',
+    'maze_http_request_seconds': 'HTTP request latency, by endpoint.',
+    'maze_http_requests_total': 'HTTP requests, by endpoint and status.',
+    'maze_http_bytes_in_total': 'Request body bytes, by endpoint.',
+    'maze_http_bytes_out_total': 'Response body bytes, by endpoint.',
+    'maze_admission_total': 'Admission decisions from projected costs.',
+}
+
+histograms: Dict[str, Dict[Tuple, List]] = {}
+counters: Dict[str, Dict[Tuple, float]] = {}
+
+
+def observe(name: str, value: float, buckets: Tuple = TIME_BUCKETS,
+            **labels: str) -> None:
+    """
+    Records one observation in a histogram. Does nothing when metrics
+    are disabled with MAZE_METRICS=0.
+
+    Args:
+        name (str): The metric name.
+        value (float): The observed value.
+        buckets (Tuple, optional): The bucket upper bounds.
+        **labels (str): The metric labels.
+    """
+    if not ENABLED:
+        return
+    series = histograms.setdefault(name, {})
+    key = tuple(sorted(labels.items()))
+    if key not in series:
+        series[key] = [buckets, [0] * len(buckets), 0.0, 0]
+    entry = series[key]
+    for i, bound in enumerate(entry[0]):
+        if value <= bound:
+            entry[1][i] += 1
+    entry[2] += value
+    entry[3] += 1
+
+
+def inc(name: str, value: float = 1, **labels: str) -> None:
+    """
+    Increments a counter. Does nothing when metrics are disabled.
+    """
+    if not ENABLED:
+        return
+    series = counters.setdefault(name, {})
+    key = tuple(sorted(labels.items()))
+    series[key] = series.get(key, 0) + value
+
+
+@contextmanager
+def timer(name: str, **labels: str) -> Iterator[None]:
+    """
+    Observes the time spent in the `with` block.
+    """
+    if not ENABLED:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start, **labels)
+
+
+def record_report(report: Dict[str, Dict[str, float]],
+                  algorithm: str) -> None:
+    """
+    Records the stage timings and search effort a worker reported
+    for one solve.
+
+    Args:
+        report (Dict[str, Dict[str, float]]): 'stages' maps stage names
+            to seconds, 'search' holds the solver's effort counters.
+        algorithm (str): The solver name.
+    """
+    if not ENABLED:
+        return
+    for stage, seconds in report.get('stages', {}).items():
+        observe('maze_stage_seconds', seconds, stage=stage)
+        if stage == 'solve':
+            observe('maze_solve_seconds', seconds, algorithm=algorithm)
+    search = report.get('search', {})
+    if search:
+        inc('maze_search_nodes_expanded_total', search['expanded'],
+            algorithm=algorithm)
+        inc('maze_search_relaxations_total', search['relaxations'],
+            algorithm=algorithm)
+        observe('maze_search_peak_frontier', search['peak_frontier'],
+                SIZE_BUCKETS, algorithm=algorithm)
+
+
+def format_labels(labels: Tuple, **extra: str) -> str:
+    """
+    Formats labels as a Prometheus label set.
+    """
+    items = list(labels) + list(extra.items())
+    if not items:
+        return ''
+    return '{' + ','.join('{}="{}"'.format(
+        key, str(value).replace('\\', '\\\\').replace('"', '\\"'))
+        for key, value in items) + '}'
+
+
+def render(gauges: Dict[str, float]) -> str:
+    """
+    Renders every metric in the Prometheus text exposition format.
+
+    Args:
+        gauges (Dict[str, float]): Point-in-time values, such as cache
+            sizes and hit rates, to append as gauges.
+
+    Returns:
+        str: The exposition text.
+    """
+    lines = []
+    for name, series in sorted(histograms.items()):
+        lines.append(f'# HELP {name} {HELP.get(name, name)}')
+        lines.append(f'# TYPE {name} histogram')
+        for labels, (buckets, counts, total, count) in series.items():
+            for bound, bucket_count in zip(buckets, counts):
+                lines.append(f'{name}_bucket'
+                             f'{format_labels(labels, le=bound)} '
+                             f'{bucket_count}')
+            lines.append(f'{name}_bucket{format_labels(labels, le="+Inf")} '
+                         f'{count}')
+            lines.append(f'{name}_sum{format_labels(labels)} {total}')
+            lines.append(f'{name}_count{format_labels(labels)} {count}')
+    for name, series in sorted(counters.items()):
+        lines.append(f'# HELP {name} {HELP.get(name, name)}')
+        lines.append(f'# TYPE {name} counter')
+        for labels, value in series.items():
+            lines.append(f'{name}{format_labels(labels)} {value}')
+    for name, value in sorted(gauges.items()):
+        lines.append(f'# TYPE {name} gauge')
+        lines.append(f'{name} {value}')
+    return '\n'.join(lines) + '\n'
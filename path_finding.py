@@ -1,442 +1,1593 @@
-import math
-import heapq
-
-from collections import deque
-from queue import PriorityQueue
-
-from typing import List, Dict, Union, Tuple, Callable, Any
-
-
-def floyd_warshall(graph: List[List[Union[int, float]]],
-                   type: str = 'matrix') -> Union[
-                       List[List[Union[int, float]]],
-                       Dict[str, Dict[str, Union[int, float]]]]:
-    """
-    Computes the shortest path between all pairs of nodes in a graph
-    using the Floyd-Warshall algorithm.
-
-    Args:
-        graph (List[List[Union[int, float]]]): A square matrix representing
-            the graph where the value at index (i, j) represents the weight of
-            the edge from node i to node j. A value of float('inf') represents
-            that there is no edge between the nodes.
-        type (str, optional): The format to return the shortest path in.
-            Valid options are 'matrix', 'letters', and 'coords'.
-            Defaults to 'matrix'.
-
-    Returns:
-        Union[List[List[Union[int, float]]],
-            Dict[str, Dict[str, Union[int, float]]]]:
-        A matrix of the shortest path between all pairs of nodes
-            if type is 'matrix'.
-        A dictionary representation of the graph where each key
-            is a node and the value is a dictionary of its neighbors
-            and their weights if type is 'letters' or 'coords'.
-    """
-    if type not in ['matrix', 'letters', 'coords']:
-        return f'type not allowed: {type}; matrix, letters, coords'
-
-    def floyd_warshall_to_dict(matrix: List[List[Union[int, float]]],
-                               type: str = 'letters') -> Dict[
-                                   str, Dict[str, Union[int, float]]]:
-        """
-        Converts a matrix to a dictionary representation of a graph.
-
-        Args:
-            matrix (List[List[Union[int, float]]]): A square matrix
-                representing the graph where the value at index (i, j)
-                represents the weight of the edge from node i to node j.
-                A value of float('inf') represents that there is no
-                edge between the nodes.
-            type (str, optional): The format to return the graph in.
-                Valid options are 'letters' and 'coords'.
-                Defaults to 'letters'.
-
-        Returns:
-            Dict[str, Dict[str, Union[int, float]]]: A dictionary
-            representation of the graph where each key is a node
-            and the value is a dictionary of its neighbors and
-            their weights.
-        """
-        if type == 'letters':
-            nodes = [chr(i) for i in range(ord('A'), ord('A') + len(matrix))]
-            graph = {}
-            for i in range(len(nodes)):
-                node = nodes[i]
-                graph[node] = {}
-                for j in range(len(nodes)):
-                    if matrix[i][j] != float('inf'):
-                        neighbor = nodes[j]
-                        weight = matrix[i][j]
-                        graph[node][neighbor] = weight
-            return graph
-        elif type == 'coords':
-            graph = {}
-            for i in range(len(matrix)):
-                row = matrix[i]
-                for j in range(len(row)):
-                    if row[j] != float('inf'):
-                        graph[(i, j)] = {}
-                        for k in range(len(row)):
-                            if k != j and matrix[j][k] != float('inf'):
-                                graph[(i, j)][
-                                    (j, k)] = matrix[i][j] + matrix[j][k]
-            return graph
-        else:
-            return 'Invalid type'
-
-    n = len(graph)
-    dist = [[math.inf] * n for _ in range(n)]
-    for i in range(n):
-        for j in range(n):
-            if i == j:
-                dist[i][j] = 0
-            elif graph[i][j] != 0:
-                dist[i][j] = graph[i][j]
-    for k in range(n):
-        for i in range(n):
-            for j in range(n):
-                dist[i][j] = min(dist[i][j], dist[i][k] + dist[k][j])
-
-    return dist if type == 'matrix' else floyd_warshall_to_dict(
-        dist, 'letters') if type == 'letters' else floyd_warshall_to_dict(
-            dist, 'coords')
-
-
-def djikstra(graph: Dict[str, Dict[str, float]], start: str,
-             goal: str) -> Union[None, Dict[str, Union[List[str], float]]]:
-    """
-    Finds the shortest path between two nodes in a graph
-    using Dijkstra's algorithm.
-
-    Args:
-        graph: A dictionary representing the graph with nodes as keys
-            and their neighbors and weights as values.
-        start: A string representing the starting node.
-        goal: A string representing the goal node.
-
-    Returns:
-        A dictionary containing the shortest path as a list of nodes
-        and the total cost as a float, or None if no path exists.
-    """
-    distances = {node: float('inf') for node in graph}
-    distances[start] = 0
-    pq = [(0, start, [])]
-    while pq:
-        curr_distance, curr_node, path = heapq.heappop(pq)
-        if curr_distance > distances[curr_node]:
-            continue
-        if curr_node == goal:
-            return {'path': path + [curr_node], 'cost': curr_distance}
-        for neighbor, weight in graph[curr_node].items():
-            distance = curr_distance + weight
-            if distance < distances[neighbor]:
-                distances[neighbor] = distance
-                heapq.heappush(pq, (distance, neighbor, path + [curr_node]))
-    return None
-
-
-def a_star(graph: Dict[Tuple[int, int], Dict[Tuple[int, int], int]],
-           start: Tuple[int, int],
-           goal: Tuple[int, int],
-           heuristic: Callable[[Tuple[int, int], Tuple[int, int]], int]
-           = lambda a, b: abs(a[0] - b[0]) + abs(a[1] - b[1])
-           ) -> Dict[str, Union[List[Tuple[int, int]], int]]:
-    """
-    A* algorithm implementation for finding the shortest path between
-    two nodes in a graph.
-
-    Args:
-        graph: A dictionary containing the graph in the form of
-            an adjacency list. Each node is a tuple of two integers
-            representing its (x, y) coordinates and each edge is a
-            dictionary containing the neighbor node as key and the
-            cost of the edge as value.
-        start: A tuple of two integers representing the starting
-            node's (x, y) coordinates. goal: A tuple of two integers
-            representing the goal node's (x, y) coordinates.
-        heuristic: A heuristic function that takes two nodes as input
-            and returns an estimate of the distance between them.
-            The default heuristic is Manhattan distance.
-
-    Returns:
-        A dictionary containing the shortest path and its cost
-        from the starting node to the goal node. The 'path' key
-        contains a list of tuples representing the nodes along the path
-        in the order they were visited, and the 'cost' key contains
-        the total cost of the path.
-    """
-    frontier = PriorityQueue()
-    frontier.put((0, start))
-    came_from = {start: None}
-    cost_so_far = {start: 0}
-    while not frontier.empty():
-        _, current = frontier.get()
-        if current == goal:
-            break
-        for neighbor, cost in graph[current].items():
-            new_cost = cost_so_far[current] + cost
-            if neighbor not in cost_so_far or new_cost < cost_so_far[neighbor]:
-                cost_so_far[neighbor] = new_cost
-                priority = new_cost + heuristic(goal, neighbor)
-                frontier.put((priority, neighbor))
-                came_from[neighbor] = current
-    current, path = goal,  []
-    while current != start:
-        path.append(current)
-        current = came_from[current]
-    path.append(start)
-    path.reverse()
-    cost = 0
-    for i in range(len(path)-1):
-        cost += graph[path[i]][path[i+1]]
-    return {'path': path, 'cost': cost}
-
-
-def bfs(graph: Dict[str, Dict[str, int]], start: str, goal: str) -> Dict[
-        str, Union[List[str], None]]:
-    """
-    Perform a breadth-first search on a graph.
-
-    Args:
-    - graph: A dictionary representing the graph where the keys are nodes
-        and the values are dictionaries representing edges and weights
-        between the nodes.
-    - start: The starting node for the search.
-    - goal: The goal node for the search.
-
-    Returns:
-    - A dictionary containing the shortest path from the start node to the
-        goal node and the cost of the path.
-    """
-    frontier = deque([(start, 0)])
-    came_from = {start: None}
-    cost_so_far = {start: 0}
-    while frontier:
-        current, current_cost = frontier.popleft()
-        if current == goal:
-            break
-        for neighbor in graph[current]:
-            new_cost = current_cost + graph[current][neighbor]
-            if neighbor not in came_from or new_cost < cost_so_far[neighbor]:
-                frontier.append((neighbor, new_cost))
-                came_from[neighbor] = current
-                cost_so_far[neighbor] = new_cost
-    if goal not in came_from:
-        return {'path': [], 'cost': None}
-    path = []
-    current = goal
-    while current != start:
-        path.append(current)
-        current = came_from[current]
-    path.append(start)
-    path.reverse()
-    return {'path': path, 'cost': cost_so_far[goal]}
-
-
-def dfs(graph: Dict[Tuple, Dict[Tuple, int]], start: Tuple,
-        goal: Tuple) -> Dict[str, Union[List[Tuple], int]]:
-    """
-    Implements depth-first search algorithm to find path from start
-    node to goal node in given graph.
-
-    Args:
-        graph: The graph to search, represented as a dictionary where
-            ach key is a node and the corresponding value is a dictionary
-            of its neighbors and edge costs.
-        start: The starting node for the search.
-        goal: The goal node to reach.
-
-    Returns:
-        A dictionary containing the path from start to goal, represented as
-        a list of nodes in the order they were visited, and the cost of
-        the path as an integer.
-    """
-    stack = [(start, 0)]
-    came_from = {start: None}
-    while stack:
-        current, cost = stack.pop()
-        if current == goal:
-            break
-        for neighbor, edge_cost in graph[current].items():
-            if neighbor not in came_from:
-                stack.append((neighbor, cost + edge_cost))
-                came_from[neighbor] = (current, edge_cost)
-    current, path, total_cost = goal, [], 0
-    while current != start:
-        path.append(current)
-        edge_cost = came_from[current][1]
-        total_cost += edge_cost
-        current = came_from[current][0]
-    path.append(start)
-    path.reverse()
-    return {'path': path, 'cost': total_cost}
-
-
-def bellman_ford(graph: Dict[Any, Dict[Any, Union[int, float]]], start: Any,
-                 goal: Any) -> Dict[str, Union[List[Any], Union[int, float]]]:
-    """
-    Finds the shortest path from a given starting node to a goal node in a
-    weighted directed graph using the Bellman-Ford algorithm.
-
-    Parameters:
-    - `graph` (Dict): A dictionary representation of the graph where the keys
-        represent the nodes and the values represent the outgoing
-        edges from each node with their weights.
-    - `start` (Any): The starting node from which to find the shortest path.
-    - `goal` (Any): The goal node to which the shortest path needs to be found.
-
-    Returns:
-    - A dictionary with the following keys:
-        - `'path'` (List): A list of nodes representing the shortest path from
-            the starting node to the goal node.
-        - `'cost'` (int or float): The total cost of the shortest path.
-    """
-    distance = {node: float('inf') for node in graph}
-    distance[start] = 0
-    predecessor = {node: None for node in graph}
-    for i in range(len(graph) - 1):
-        for u in graph:
-            for v, weight in graph[u].items():
-                if distance[u] + weight < distance[v]:
-                    distance[v] = distance[u] + weight
-                    predecessor[v] = u
-    for u in graph:
-        for v, weight in graph[u].items():
-            if distance[u] + weight < distance[v]:
-                return {'error': 'Graph contains a negative-weight cycle'}
-    current, path, cost = goal, [], 0
-    while current != start:
-        path.append(temp := current)
-        current = predecessor[current]
-        cost += graph[current][temp]
-    path.append(start)
-    path.reverse()
-    return {'path': path, 'cost': cost}
-
-
-def bidirectional_search(graph: Dict[Any, Dict[Any, float]],
-                         start: Any, goal: Any) -> Dict[str, Any]:
-    """
-    Finds the shortest path between `start` and `goal` nodes in an
-    undirected graph `graph` using bidirectional search algorithm.
-
-    Args:
-    - graph: A dictionary representing the undirected graph, where
-        the keys are the nodes and the values are dictionaries
-        representing the neighbors and edge weights of each node.
-    - start: The node to start the search from.
-    - goal: The node to find the shortest path to.
-
-    Returns:
-    - A dictionary containing the shortest path and its cost,
-        with keys 'path' and 'cost'.
-    """
-    def get_path(forward_came_from: Dict[Any, Any],
-                 backward_came_from: Dict[Any, Any],
-                 intersection: Any) -> List:
-        """
-        Given the dictionaries of visited nodes and their parent
-        nodes from both directions, and the intersection node that was found,
-        constructs the shortest path between `start` and `goal`.
-
-        Args:
-        - forward_came_from: A dictionary representing the visited
-            nodes and their parent nodes during the forward search.
-        - backward_came_from: A dictionary representing the visited
-            nodes and their parent nodes during the backward search.
-        - intersection: The node that was found in both searches.
-
-        Returns:
-        - A list of nodes representing the shortest path
-            between `start` and `goal`.
-        """
-        path = []
-        node = intersection
-        while node is not None:
-            path.append(node)
-            node = forward_came_from[node]
-        path = path[::-1]
-        node = backward_came_from[intersection]
-        while node is not None:
-            path.append(node)
-            node = backward_came_from[node]
-        return path
-
-    forward_queue = [start]
-    forward_came_from = {start: None}
-    backward_queue = [goal]
-    backward_came_from = {goal: None}
-    intersection = None
-    while forward_queue and backward_queue:
-        if intersection:
-            path = get_path(forward_came_from, backward_came_from,
-                            intersection)
-            cost = sum(graph[node1][node2] for node1, node2 in zip(
-                path[:-1], path[1:]))
-            return {'path': path, 'cost': cost}
-        current = forward_queue.pop(0)
-        for neighbor in graph[current]:
-            if neighbor not in forward_came_from:
-                forward_came_from[neighbor] = current
-                forward_queue.append(neighbor)
-            if neighbor in backward_came_from:
-                intersection = neighbor
-                break
-        if intersection:
-            path = get_path(forward_came_from, backward_came_from,
-                            intersection)
-            cost = sum(graph[node1][node2] for node1, node2 in zip(
-                path[:-1], path[1:]))
-            return {'path': path, 'cost': cost}
-        current = backward_queue.pop(0)
-        for neighbor in graph[current]:
-            if neighbor not in backward_came_from:
-                backward_came_from[neighbor] = current
-                backward_queue.append(neighbor)
-            if neighbor in forward_came_from:
-                intersection = neighbor
-                break
-    return None
-
-
-def beam_search(graph: Dict[str, Dict[str, int]], start: str, end: str,
-                beam_width: int = 500) -> Dict[
-                    str, Union[None, List[str], int]]:
-    """
-    Given a weighted graph, a start node, an end node and a beam width,
-    returns the shortest path between the start and end node as well
-    as the cost of the path using beam search algorithm.
-
-    Args:
-        graph (Dict[str, Dict[str, int]]): A weighted graph represented
-            as a dictionary where keys are the node names and values are
-            dictionaries representing the neighbors and their
-            corresponding edge weights.
-        start (str): The starting node name.
-        end (str): The ending node name.
-        beam_width (int, optional): The width of the beam. Defaults to 2.
-
-    Returns:
-        Dict[str, Union[None, List[str], int]]: A dictionary with the shortest
-            path as a list of node names under the key 'path',
-            the cost of the path under the key 'cost', and None for
-            both if no path exists.
-    """
-    visited = set()
-    queue = [(0, [start])]
-    while queue:
-        (cost, path) = queue.pop(0)
-        node = path[-1]
-        if node == end:
-            return {'path': path, 'cost': cost}
-        if node not in visited:
-            visited.add(node)
-            neighbors = graph[node]
-            for neighbor, neighbor_cost in neighbors.items():
-                if neighbor not in visited:
-                    new_cost = cost + neighbor_cost
-                    new_path = path + [neighbor]
-                    queue.append((new_cost, new_path))
-            queue = sorted(queue, key=lambda x: x[0])[:int(beam_width)]
-    return {'path': None, 'cost': None}
+import re
+import math
+import time
+import heapq
+import itertools
+
+from collections import deque
+from queue import PriorityQueue
+
+from typing import (List, Dict, Union, Tuple, Callable, Any, Optional,
+                    Iterable)
+
+PROGRESS_INTERVAL = 1024
+# Waypoints up to which `waypoint_route` finds the best order exactly.
+WAYPOINT_DP_LIMIT = 10
+# The first inflation factor of `anytime_a_star`, lowered by
+# `ANYTIME_STEP` after each path it finds.
+ANYTIME_INFLATION = 3.0
+ANYTIME_STEP = 0.5
+# Expansions between two looks at the clock.
+DEADLINE_CHECK_INTERVAL = 256
+# Nodes whose edges `step_weights` averages.
+ANYTIME_SAMPLE = 1000
+# The letters `encode_moves` writes for each step on a grid; y grows down.
+MOVES = {(1, 0): 'R', (-1, 0): 'L', (0, 1): 'D', (0, -1): 'U'}
+STEPS = {letter: step for step, letter in MOVES.items()}
+MOVE_RUN = re.compile(r'([RLDU])(\d+)')
+
+
+def record_stats(stats: Optional[Dict[str, int]], expanded: int,
+                 peak_frontier: int, relaxations: int) -> None:
+    """
+    Stores a search's effort counters in `stats` if the caller asked
+    for them.
+
+    Args:
+        stats (Optional[Dict[str, int]]): The dictionary to fill, or None.
+        expanded (int): The number of nodes expanded.
+        peak_frontier (int): The largest frontier size seen.
+        relaxations (int): The number of successful edge relaxations.
+    """
+    if stats is not None:
+        stats.update(expanded=expanded, peak_frontier=peak_frontier,
+                     relaxations=relaxations)
+
+
+def distances_to_dict(matrix: List[List[Union[int, float]]],
+                      type: str = 'letters') -> Dict[
+                          str, Dict[str, Union[int, float]]]:
+    """
+    Converts a distance matrix to a dictionary representation of a graph,
+    as returned by `floyd_warshall` and `all_pairs.all_pairs`.
+
+    Args:
+        matrix (List[List[Union[int, float]]]): A square matrix
+            representing the graph where the value at index (i, j)
+            represents the weight of the edge from node i to node j.
+            A value of float('inf') represents that there is no
+            edge between the nodes.
+        type (str, optional): The format to return the graph in.
+            Valid options are 'letters' and 'coords'.
+            Defaults to 'letters'.
+
+    Returns:
+        Dict[str, Dict[str, Union[int, float]]]: A dictionary
+        representation of the graph where each key is a node
+        and the value is a dictionary of its neighbors and
+        their weights.
+    """
+    if type == 'letters':
+        nodes = [chr(i) for i in range(ord('A'), ord('A') + len(matrix))]
+        graph = {}
+        for i in range(len(nodes)):
+            node = nodes[i]
+            graph[node] = {}
+            for j in range(len(nodes)):
+                if matrix[i][j] != float('inf'):
+                    neighbor = nodes[j]
+                    weight = matrix[i][j]
+                    graph[node][neighbor] = weight
+        return graph
+    elif type == 'coords':
+        graph = {}
+        for i in range(len(matrix)):
+            row = matrix[i]
+            for j in range(len(row)):
+                if row[j] != float('inf'):
+                    graph[(i, j)] = {}
+                    for k in range(len(row)):
+                        if k != j and matrix[j][k] != float('inf'):
+                            graph[(i, j)][
+                                (j, k)] = matrix[i][j] + matrix[j][k]
+        return graph
+    else:
+        return 'Invalid type'
+
+
+def floyd_warshall(graph: List[List[Union[int, float]]],
+                   type: str = 'matrix') -> Union[
+                       List[List[Union[int, float]]],
+                       Dict[str, Dict[str, Union[int, float]]]]:
+    """
+    Computes the shortest path between all pairs of nodes in a graph
+    using the Floyd-Warshall algorithm.
+
+    Args:
+        graph (List[List[Union[int, float]]]): A square matrix representing
+            the graph where the value at index (i, j) represents the weight of
+            the edge from node i to node j. A value of float('inf') represents
+            that there is no edge between the nodes.
+        type (str, optional): The format to return the shortest path in.
+            Valid options are 'matrix', 'letters', and 'coords'.
+            Defaults to 'matrix'.
+
+    Returns:
+        Union[List[List[Union[int, float]]],
+            Dict[str, Dict[str, Union[int, float]]]]:
+        A matrix of the shortest path between all pairs of nodes
+            if type is 'matrix'.
+        A dictionary representation of the graph where each key
+            is a node and the value is a dictionary of its neighbors
+            and their weights if type is 'letters' or 'coords'.
+    """
+    if type not in ['matrix', 'letters', 'coords']:
+        return f'type not allowed: {type}; matrix, letters, coords'
+
+    n = len(graph)
+    dist = [[math.inf] * n for _ in range(n)]
+    for i in range(n):
+        for j in range(n):
+            if i == j:
+                dist[i][j] = 0
+            elif graph[i][j] != 0:
+                dist[i][j] = graph[i][j]
+    for k in range(n):
+        for i in range(n):
+            for j in range(n):
+                dist[i][j] = min(dist[i][j], dist[i][k] + dist[k][j])
+
+    return dist if type == 'matrix' else distances_to_dict(
+        dist, 'letters') if type == 'letters' else distances_to_dict(
+            dist, 'coords')
+
+
+def djikstra(graph: Dict[str, Dict[str, float]], start: str,
+             goal: str, stats: Optional[Dict[str, int]] = None,
+             progress: Optional[Callable[[int, int, Any], None]] = None
+             ) -> Union[None, Dict[str, Union[List[str], float]]]:
+    """
+    Finds the shortest path between two nodes in a graph
+    using Dijkstra's algorithm.
+
+    Args:
+        graph: A dictionary representing the graph with nodes as keys
+            and their neighbors and weights as values.
+        start: A string representing the starting node.
+        goal: A string representing the goal node.
+        stats: An optional dictionary filled with the search effort.
+        progress: An optional callback, called every `PROGRESS_INTERVAL`
+            expansions with the nodes expanded, the frontier size and
+            the best cost settled so far.
+
+    Returns:
+        A dictionary containing the shortest path as a list of nodes
+        and the total cost as a float, or None if no path exists.
+    """
+    distances = {node: float('inf') for node in graph}
+    distances[start] = 0
+    pq = [(0, start, [])]
+    expanded = peak = relaxations = 0
+    while pq:
+        curr_distance, curr_node, path = heapq.heappop(pq)
+        if curr_distance > distances[curr_node]:
+            continue
+        expanded += 1
+        if progress is not None and expanded % PROGRESS_INTERVAL == 0:
+            progress(expanded, len(pq), curr_distance)
+        if curr_node == goal:
+            record_stats(stats, expanded, peak, relaxations)
+            return {'path': path + [curr_node], 'cost': curr_distance}
+        for neighbor, weight in graph[curr_node].items():
+            distance = curr_distance + weight
+            if distance < distances[neighbor]:
+                distances[neighbor] = distance
+                relaxations += 1
+                heapq.heappush(pq, (distance, neighbor, path + [curr_node]))
+        if len(pq) > peak:
+            peak = len(pq)
+    record_stats(stats, expanded, peak, relaxations)
+    return None
+
+
+def a_star(graph: Dict[Tuple[int, int], Dict[Tuple[int, int], int]],
+           start: Tuple[int, int],
+           goal: Tuple[int, int],
+           heuristic: Callable[[Tuple[int, int], Tuple[int, int]], int]
+           = lambda a, b: abs(a[0] - b[0]) + abs(a[1] - b[1]),
+           stats: Optional[Dict[str, int]] = None,
+           progress: Optional[Callable[[int, int, Any], None]] = None
+           ) -> Dict[str, Union[List[Tuple[int, int]], int]]:
+    """
+    A* algorithm implementation for finding the shortest path between
+    two nodes in a graph.
+
+    Args:
+        graph: A dictionary containing the graph in the form of
+            an adjacency list. Each node is a tuple of two integers
+            representing its (x, y) coordinates and each edge is a
+            dictionary containing the neighbor node as key and the
+            cost of the edge as value.
+        start: A tuple of two integers representing the starting
+            node's (x, y) coordinates. goal: A tuple of two integers
+            representing the goal node's (x, y) coordinates.
+        heuristic: A heuristic function that takes two nodes as input
+            and returns an estimate of the distance between them.
+            The default heuristic is Manhattan distance.
+        stats: An optional dictionary filled with the search effort.
+        progress: An optional callback, called every `PROGRESS_INTERVAL`
+            expansions with the nodes expanded, the frontier size and
+            the cost to the node being expanded.
+
+    Returns:
+        A dictionary containing the shortest path and its cost
+        from the starting node to the goal node. The 'path' key
+        contains a list of tuples representing the nodes along the path
+        in the order they were visited, and the 'cost' key contains
+        the total cost of the path.
+    """
+    frontier = PriorityQueue()
+    frontier.put((0, start))
+    came_from = {start: None}
+    cost_so_far = {start: 0}
+    expanded = peak = relaxations = 0
+    while not frontier.empty():
+        _, current = frontier.get()
+        expanded += 1
+        if progress is not None and expanded % PROGRESS_INTERVAL == 0:
+            progress(expanded, frontier.qsize(), cost_so_far[current])
+        if current == goal:
+            break
+        for neighbor, cost in graph[current].items():
+            new_cost = cost_so_far[current] + cost
+            if neighbor not in cost_so_far or new_cost < cost_so_far[neighbor]:
+                cost_so_far[neighbor] = new_cost
+                priority = new_cost + heuristic(goal, neighbor)
+                frontier.put((priority, neighbor))
+                came_from[neighbor] = current
+                relaxations += 1
+        if frontier.qsize() > peak:
+            peak = frontier.qsize()
+    record_stats(stats, expanded, peak, relaxations)
+    if goal not in came_from:
+        return {'path': [], 'cost': None}
+    current, path = goal,  []
+    while current != start:
+        path.append(current)
+        current = came_from[current]
+    path.append(start)
+    path.reverse()
+    cost = 0
+    for i in range(len(path)-1):
+        cost += graph[path[i]][path[i+1]]
+    return {'path': path, 'cost': cost}
+
+
+def bfs(graph: Dict[str, Dict[str, int]], start: str, goal: str,
+        stats: Optional[Dict[str, int]] = None,
+        progress: Optional[Callable[[int, int, Any], None]] = None
+        ) -> Dict[str, Union[List[str], None]]:
+    """
+    Perform a breadth-first search on a graph.
+
+    Args:
+    - graph: A dictionary representing the graph where the keys are nodes
+        and the values are dictionaries representing edges and weights
+        between the nodes.
+    - start: The starting node for the search.
+    - goal: The goal node for the search.
+    - stats: An optional dictionary filled with the search effort.
+    - progress: An optional callback, called every `PROGRESS_INTERVAL`
+        expansions with the nodes expanded, the frontier size and the
+        cost to the node being expanded.
+
+    Returns:
+    - A dictionary containing the shortest path from the start node to the
+        goal node and the cost of the path.
+    """
+    frontier = deque([(start, 0)])
+    came_from = {start: None}
+    cost_so_far = {start: 0}
+    expanded = peak = relaxations = 0
+    while frontier:
+        current, current_cost = frontier.popleft()
+        expanded += 1
+        if progress is not None and expanded % PROGRESS_INTERVAL == 0:
+            progress(expanded, len(frontier), current_cost)
+        if current == goal:
+            break
+        for neighbor in graph[current]:
+            new_cost = current_cost + graph[current][neighbor]
+            if neighbor not in came_from or new_cost < cost_so_far[neighbor]:
+                frontier.append((neighbor, new_cost))
+                came_from[neighbor] = current
+                cost_so_far[neighbor] = new_cost
+                relaxations += 1
+        if len(frontier) > peak:
+            peak = len(frontier)
+    record_stats(stats, expanded, peak, relaxations)
+    if goal not in came_from:
+        return {'path': [], 'cost': None}
+    path = []
+    current = goal
+    while current != start:
+        path.append(current)
+        current = came_from[current]
+    path.append(start)
+    path.reverse()
+    return {'path': path, 'cost': cost_so_far[goal]}
+
+
+def dfs(graph: Dict[Tuple, Dict[Tuple, int]], start: Tuple,
+        goal: Tuple, stats: Optional[Dict[str, int]] = None,
+        progress: Optional[Callable[[int, int, Any], None]] = None
+        ) -> Dict[str, Union[List[Tuple], int]]:
+    """
+    Implements depth-first search algorithm to find path from start
+    node to goal node in given graph.
+
+    Args:
+        graph: The graph to search, represented as a dictionary where
+            ach key is a node and the corresponding value is a dictionary
+            of its neighbors and edge costs.
+        start: The starting node for the search.
+        goal: The goal node to reach.
+        stats: An optional dictionary filled with the search effort.
+        progress: An optional callback, called every `PROGRESS_INTERVAL`
+            expansions with the nodes expanded, the stack size and the
+            cost to the node being expanded.
+
+    Returns:
+        A dictionary containing the path from start to goal, represented as
+        a list of nodes in the order they were visited, and the cost of
+        the path as an integer.
+    """
+    stack = [(start, 0)]
+    came_from = {start: None}
+    expanded = peak = relaxations = 0
+    while stack:
+        current, cost = stack.pop()
+        expanded += 1
+        if progress is not None and expanded % PROGRESS_INTERVAL == 0:
+            progress(expanded, len(stack), cost)
+        if current == goal:
+            break
+        for neighbor, edge_cost in graph[current].items():
+            if neighbor not in came_from:
+                stack.append((neighbor, cost + edge_cost))
+                came_from[neighbor] = (current, edge_cost)
+                relaxations += 1
+        if len(stack) > peak:
+            peak = len(stack)
+    record_stats(stats, expanded, peak, relaxations)
+    current, path, total_cost = goal, [], 0
+    while current != start:
+        path.append(current)
+        edge_cost = came_from[current][1]
+        total_cost += edge_cost
+        current = came_from[current][0]
+    path.append(start)
+    path.reverse()
+    return {'path': path, 'cost': total_cost}
+
+
+def bellman_ford(graph: Dict[Any, Dict[Any, Union[int, float]]], start: Any,
+                 goal: Any, stats: Optional[Dict[str, int]] = None,
+                 progress: Optional[Callable[[int, int, Any], None]] = None
+                 ) -> Dict[str, Union[List[Any], Union[int, float]]]:
+    """
+    Finds the shortest path from a given starting node to a goal node in a
+    weighted directed graph using the Bellman-Ford algorithm.
+
+    Parameters:
+    - `graph` (Dict): A dictionary representation of the graph where the keys
+        represent the nodes and the values represent the outgoing
+        edges from each node with their weights.
+    - `start` (Any): The starting node from which to find the shortest path.
+    - `goal` (Any): The goal node to which the shortest path needs to be found.
+    - `stats` (Dict, optional): A dictionary filled with the search effort.
+    - `progress` (Callable, optional): Called after every pass over the
+        edges with the nodes expanded, 0 and the best cost to the goal
+        found so far, or None.
+
+    Returns:
+    - A dictionary with the following keys:
+        - `'path'` (List): A list of nodes representing the shortest path from
+            the starting node to the goal node.
+        - `'cost'` (int or float): The total cost of the shortest path.
+    """
+    distance = {node: float('inf') for node in graph}
+    distance[start] = 0
+    predecessor = {node: None for node in graph}
+    expanded = relaxations = 0
+    for i in range(len(graph) - 1):
+        for u in graph:
+            expanded += 1
+            for v, weight in graph[u].items():
+                if distance[u] + weight < distance[v]:
+                    distance[v] = distance[u] + weight
+                    predecessor[v] = u
+                    relaxations += 1
+        if progress is not None:
+            progress(expanded, 0, distance[goal]
+                     if distance[goal] != float('inf') else None)
+    record_stats(stats, expanded, 0, relaxations)
+    for u in graph:
+        for v, weight in graph[u].items():
+            if distance[u] + weight < distance[v]:
+                return {'error': 'Graph contains a negative-weight cycle'}
+    current, path, cost = goal, [], 0
+    while current != start:
+        path.append(temp := current)
+        current = predecessor[current]
+        cost += graph[current][temp]
+    path.append(start)
+    path.reverse()
+    return {'path': path, 'cost': cost}
+
+
+def bidirectional_search(graph: Dict[Any, Dict[Any, float]],
+                         start: Any, goal: Any,
+                         stats: Optional[Dict[str, int]] = None,
+                         progress: Optional[Callable[[int, int, Any], None]]
+                         = None) -> Dict[str, Any]:
+    """
+    Finds the shortest path between `start` and `goal` nodes in an
+    undirected graph `graph` using bidirectional search algorithm.
+
+    Args:
+    - graph: A dictionary representing the undirected graph, where
+        the keys are the nodes and the values are dictionaries
+        representing the neighbors and edge weights of each node.
+    - start: The node to start the search from.
+    - goal: The node to find the shortest path to.
+    - stats: An optional dictionary filled with the search effort.
+    - progress: An optional callback, called every `PROGRESS_INTERVAL`
+        expansions with the nodes expanded, the size of both frontiers
+        and None, as this search does not track costs.
+
+    Returns:
+    - A dictionary containing the shortest path and its cost,
+        with keys 'path' and 'cost'.
+    """
+    def get_path(forward_came_from: Dict[Any, Any],
+                 backward_came_from: Dict[Any, Any],
+                 intersection: Any) -> List:
+        """
+        Given the dictionaries of visited nodes and their parent
+        nodes from both directions, and the intersection node that was found,
+        constructs the shortest path between `start` and `goal`.
+
+        Args:
+        - forward_came_from: A dictionary representing the visited
+            nodes and their parent nodes during the forward search.
+        - backward_came_from: A dictionary representing the visited
+            nodes and their parent nodes during the backward search.
+        - intersection: The node that was found in both searches.
+
+        Returns:
+        - A list of nodes representing the shortest path
+            between `start` and `goal`.
+        """
+        path = []
+        node = intersection
+        while node is not None:
+            path.append(node)
+            node = forward_came_from[node]
+        path = path[::-1]
+        node = backward_came_from[intersection]
+        while node is not None:
+            path.append(node)
+            node = backward_came_from[node]
+        return path
+
+    forward_queue = [start]
+    forward_came_from = {start: None}
+    backward_queue = [goal]
+    backward_came_from = {goal: None}
+    intersection = None
+    expanded = peak = relaxations = 0
+    while forward_queue and backward_queue:
+        if intersection:
+            record_stats(stats, expanded, peak, relaxations)
+            path = get_path(forward_came_from, backward_came_from,
+                            intersection)
+            cost = sum(graph[node1][node2] for node1, node2 in zip(
+                path[:-1], path[1:]))
+            return {'path': path, 'cost': cost}
+        current = forward_queue.pop(0)
+        expanded += 1
+        for neighbor in graph[current]:
+            if neighbor not in forward_came_from:
+                forward_came_from[neighbor] = current
+                forward_queue.append(neighbor)
+                relaxations += 1
+            if neighbor in backward_came_from:
+                intersection = neighbor
+                break
+        if intersection:
+            record_stats(stats, expanded, peak, relaxations)
+            path = get_path(forward_came_from, backward_came_from,
+                            intersection)
+            cost = sum(graph[node1][node2] for node1, node2 in zip(
+                path[:-1], path[1:]))
+            return {'path': path, 'cost': cost}
+        current = backward_queue.pop(0)
+        expanded += 1
+        for neighbor in graph[current]:
+            if neighbor not in backward_came_from:
+                backward_came_from[neighbor] = current
+                backward_queue.append(neighbor)
+                relaxations += 1
+            if neighbor in forward_came_from:
+                intersection = neighbor
+                break
+        if len(forward_queue) + len(backward_queue) > peak:
+            peak = len(forward_queue) + len(backward_queue)
+        if progress is not None and expanded % PROGRESS_INTERVAL == 0:
+            progress(expanded, len(forward_queue) + len(backward_queue),
+                     None)
+    record_stats(stats, expanded, peak, relaxations)
+    return None
+
+
+def beam_search(graph: Dict[str, Dict[str, int]], start: str, end: str,
+                beam_width: int = 500,
+                stats: Optional[Dict[str, int]] = None,
+                progress: Optional[Callable[[int, int, Any], None]] = None
+                ) -> Dict[str, Union[None, List[str], int]]:
+    """
+    Given a weighted graph, a start node, an end node and a beam width,
+    returns the shortest path between the start and end node as well
+    as the cost of the path using beam search algorithm.
+
+    Args:
+        graph (Dict[str, Dict[str, int]]): A weighted graph represented
+            as a dictionary where keys are the node names and values are
+            dictionaries representing the neighbors and their
+            corresponding edge weights.
+        start (str): The starting node name.
+        end (str): The ending node name.
+        beam_width (int, optional): The width of the beam. Defaults to 2.
+        stats (Dict[str, int], optional): A dictionary filled with the
+            search effort.
+        progress (Callable[[int, int, Any], None], optional): Called
+            every `PROGRESS_INTERVAL` expansions with the nodes
+            expanded, the beam size and the cost of the expanded path.
+
+    Returns:
+        Dict[str, Union[None, List[str], int]]: A dictionary with the shortest
+            path as a list of node names under the key 'path',
+            the cost of the path under the key 'cost', and None for
+            both if no path exists.
+    """
+    visited = set()
+    queue = [(0, [start])]
+    expanded = peak = relaxations = 0
+    while queue:
+        (cost, path) = queue.pop(0)
+        node = path[-1]
+        if node == end:
+            record_stats(stats, expanded, peak, relaxations)
+            return {'path': path, 'cost': cost}
+        if node not in visited:
+            visited.add(node)
+            expanded += 1
+            if progress is not None and expanded % PROGRESS_INTERVAL == 0:
+                progress(expanded, len(queue), cost)
+            neighbors = graph[node]
+            for neighbor, neighbor_cost in neighbors.items():
+                if neighbor not in visited:
+                    new_cost = cost + neighbor_cost
+                    new_path = path + [neighbor]
+                    queue.append((new_cost, new_path))
+                    relaxations += 1
+            if len(queue) > peak:
+                peak = len(queue)
+            queue = sorted(queue, key=lambda x: x[0])[:int(beam_width)]
+    record_stats(stats, expanded, peak, relaxations)
+    return {'path': None, 'cost': None}
+
+
+def trace_path(graph: Dict[Any, Dict[Any, Union[int, float]]],
+               came_from: Dict[Any, Any], start: Any,
+               goal: Any) -> Dict[str, Any]:
+    """
+    Follows the parent links of a search back from `goal` to `start`.
+
+    Args:
+        graph: The searched graph, used to add up the path's cost.
+        came_from: Each reached node mapped to its parent.
+        start: The starting node.
+        goal: The goal node.
+
+    Returns:
+        A dictionary with the 'path' as a list of nodes and its 'cost',
+        or an empty path and a None cost if the goal was not reached.
+    """
+    if goal not in came_from:
+        return {'path': [], 'cost': None}
+    path = [goal]
+    while path[-1] != start:
+        path.append(came_from[path[-1]])
+    path.reverse()
+    return {'path': path, 'cost': sum(
+        graph[a][b] for a, b in zip(path[:-1], path[1:]))}
+
+
+def encode_moves(path: List[Tuple[int, int]]) -> Dict[str, Any]:
+    """
+    Encodes a path through grid cells as its first cell and the runs of
+    steps it takes, e.g. 'R12D3L1' for 12 cells right, 3 down and 1
+    left, which is a few bytes per turn instead of a pair of numbers
+    per cell.
+
+    Args:
+        path: The cells, each next to the one before it.
+
+    Raises:
+        ValueError: If two cells in a row are not neighbours on a grid.
+
+    Returns:
+        The 'start' as [x, y], None for an empty path, and the 'moves'.
+    """
+    if not path:
+        return {'start': None, 'moves': ''}
+    try:
+        letters = [MOVES[(b[0] - a[0], b[1] - a[1])]
+                   for a, b in zip(path[:-1], path[1:])]
+    except KeyError as e:
+        raise ValueError(f'not a step between grid cells: {e.args[0]}')
+    return {'start': list(path[0]), 'moves': ''.join(
+        f'{letter}{sum(1 for _ in run)}'
+        for letter, run in itertools.groupby(letters))}
+
+
+def decode_moves(start: Optional[List[int]], moves: str
+                 ) -> List[Tuple[int, int]]:
+    """
+    Expands a path encoded by `encode_moves` back into its cells.
+    """
+    if start is None:
+        return []
+    x, y = start
+    path = [(x, y)]
+    for letter, count in MOVE_RUN.findall(moves):
+        dx, dy = STEPS[letter]
+        for _ in range(int(count)):
+            x, y = x + dx, y + dy
+            path.append((x, y))
+    return path
+
+
+def bfs_uniform(graph: Dict[Any, Dict[Any, Union[int, float]]], start: Any,
+                goal: Any, stats: Optional[Dict[str, int]] = None,
+                progress: Optional[Callable[[int, int, Any], None]] = None
+                ) -> Dict[str, Any]:
+    """
+    Finds the path with the fewest edges with a breadth-first search
+    that expands every node once. It is the shortest path when all the
+    edges weigh the same, e.g. in a maze without weights.
+
+    Args:
+        graph: A dictionary mapping each node to its neighbors and the
+            weights of the edges to them.
+        start: The starting node.
+        goal: The goal node.
+        stats: An optional dictionary filled with the search effort.
+        progress: An optional callback, called every `PROGRESS_INTERVAL`
+            expansions with the nodes expanded, the frontier size and
+            None, as the search counts edges rather than costs.
+
+    Returns:
+        A dictionary with the 'path' as a list of nodes and its 'cost',
+        or an empty path and a None cost if no path exists.
+    """
+    came_from = {start: None}
+    frontier = deque([start])
+    expanded = peak = 0
+    while frontier:
+        current = frontier.popleft()
+        expanded += 1
+        if progress is not None and expanded % PROGRESS_INTERVAL == 0:
+            progress(expanded, len(frontier), None)
+        if current == goal:
+            break
+        for neighbor in graph.get(current, ()):
+            if neighbor not in came_from:
+                came_from[neighbor] = current
+                frontier.append(neighbor)
+        if len(frontier) > peak:
+            peak = len(frontier)
+    record_stats(stats, expanded, peak, len(came_from) - 1)
+    return trace_path(graph, came_from, start, goal)
+
+
+def bidirectional_dijkstra(graph: Dict[Any, Dict[Any, Union[int, float]]],
+                           start: Any, goal: Any,
+                           stats: Optional[Dict[str, int]] = None,
+                           progress: Optional[Callable[[int, int, Any], None]]
+                           = None) -> Dict[str, Any]:
+    """
+    Finds the shortest path with two Dijkstra searches, forward from
+    `start` and backward from `goal` over the reversed edges, that stop
+    once the best path through the nodes where they meet cannot be
+    improved. Weights must not be negative.
+
+    Args:
+        graph: A dictionary mapping each node to its neighbors and the
+            weights of the edges to them.
+        start: The starting node.
+        goal: The goal node.
+        stats: An optional dictionary filled with the search effort.
+        progress: An optional callback, called every `PROGRESS_INTERVAL`
+            expansions with the nodes expanded, the size of both
+            frontiers and the cost of the best path found so far.
+
+    Returns:
+        A dictionary with the 'path' as a list of nodes and its 'cost',
+        or an empty path and a None cost if no path exists.
+    """
+    if start == goal:
+        record_stats(stats, 0, 0, 0)
+        return {'path': [start], 'cost': 0}
+    reverse = {}
+    for node, neighbors in graph.items():
+        for neighbor, weight in neighbors.items():
+            reverse.setdefault(neighbor, {})[node] = weight
+    edges = (graph, reverse)
+    distances = ({start: 0}, {goal: 0})
+    came_from = ({start: None}, {goal: None})
+    settled = (set(), set())
+    frontiers = ([(0, 0, start)], [(0, 0, goal)])
+    best, meeting, pushed = math.inf, None, 0
+    expanded = peak = relaxations = 0
+    while frontiers[0] and frontiers[1]:
+        if frontiers[0][0][0] + frontiers[1][0][0] >= best:
+            break
+        side = 0 if frontiers[0][0][0] <= frontiers[1][0][0] else 1
+        distance, _, current = heapq.heappop(frontiers[side])
+        if current in settled[side]:
+            continue
+        settled[side].add(current)
+        expanded += 1
+        if progress is not None and expanded % PROGRESS_INTERVAL == 0:
+            progress(expanded, len(frontiers[0]) + len(frontiers[1]),
+                     best if meeting is not None else None)
+        other = distances[1 - side]
+        for neighbor, weight in edges[side].get(current, {}).items():
+            new_distance = distance + weight
+            if new_distance < distances[side].get(neighbor, math.inf):
+                distances[side][neighbor] = new_distance
+                came_from[side][neighbor] = current
+                pushed += 1
+                heapq.heappush(frontiers[side],
+                               (new_distance, pushed, neighbor))
+                relaxations += 1
+            if neighbor in other and \
+                    new_distance + other[neighbor] < best:
+                # The best path so far crosses the edge between the two
+                # searches, kept as (forward node, backward node).
+                best = new_distance + other[neighbor]
+                meeting = (current, neighbor) if side == 0 else \
+                    (neighbor, current)
+        if len(frontiers[0]) + len(frontiers[1]) > peak:
+            peak = len(frontiers[0]) + len(frontiers[1])
+    record_stats(stats, expanded, peak, relaxations)
+    if meeting is None:
+        return {'path': [], 'cost': None}
+    path = [meeting[0]]
+    while came_from[0][path[-1]] is not None:
+        path.append(came_from[0][path[-1]])
+    path.reverse()
+    path.append(meeting[1])
+    while came_from[1][path[-1]] is not None:
+        path.append(came_from[1][path[-1]])
+    return {'path': path, 'cost': sum(
+        graph[a][b] for a, b in zip(path[:-1], path[1:]))}
+
+
+def spfa(graph: Dict[Any, Dict[Any, Union[int, float]]], start: Any,
+         goal: Any, stats: Optional[Dict[str, int]] = None,
+         progress: Optional[Callable[[int, int, Any], None]] = None
+         ) -> Dict[str, Any]:
+    """
+    Finds the shortest path with the Shortest Path Faster Algorithm, a
+    Bellman-Ford that only relaxes the edges of the nodes whose distance
+    changed, kept in a FIFO queue. It allows negative weights and is
+    usually far faster than `bellman_ford`.
+
+    Args:
+        graph: A dictionary mapping each node to its neighbors and the
+            weights of the edges to them.
+        start: The starting node.
+        goal: The goal node.
+        stats: An optional dictionary filled with the search effort.
+        progress: An optional callback, called every `PROGRESS_INTERVAL`
+            expansions with the nodes expanded, the queue size and the
+            best cost to the goal found so far, or None.
+
+    Returns:
+        A dictionary with the 'path' as a list of nodes and its 'cost',
+        an empty path and a None cost if no path exists, or an 'error'
+        if a negative-weight cycle is reachable from `start`.
+    """
+    distance = {start: 0}
+    came_from = {start: None}
+    queue, queued = deque([start]), {start}
+    # Without a negative cycle a node is queued again at most once per
+    # node whose distance can still shorten the path to it.
+    updates = {start: 0}
+    limit = len(graph) + 1
+    expanded = peak = relaxations = 0
+    while queue:
+        current = queue.popleft()
+        queued.discard(current)
+        expanded += 1
+        if progress is not None and expanded % PROGRESS_INTERVAL == 0:
+            progress(expanded, len(queue), distance.get(goal))
+        for neighbor, weight in graph.get(current, {}).items():
+            new_distance = distance[current] + weight
+            if new_distance < distance.get(neighbor, math.inf):
+                distance[neighbor] = new_distance
+                came_from[neighbor] = current
+                relaxations += 1
+                updates[neighbor] = updates.get(neighbor, 0) + 1
+                if updates[neighbor] > limit:
+                    record_stats(stats, expanded, peak, relaxations)
+                    return {'error': 'Graph contains a negative-weight cycle'}
+                if neighbor not in queued:
+                    queue.append(neighbor)
+                    queued.add(neighbor)
+        if len(queue) > peak:
+            peak = len(queue)
+    record_stats(stats, expanded, peak, relaxations)
+    return trace_path(graph, came_from, start, goal)
+
+
+def is_tree(graph: Dict[Any, Dict[Any, Union[int, float]]]) -> bool:
+    """
+    Checks that a graph is an undirected tree, e.g. a perfect maze, so
+    there is one path between any two nodes: a traversal reaches every
+    node, each edge it follows goes back with the same weight, and
+    those edges both ways are all the edges there are.
+    """
+    if not graph or sum(map(len, graph.values())) != 2 * (len(graph) - 1):
+        return False
+    root = next(iter(graph))
+    seen, stack = {root}, [root]
+    while stack:
+        node = stack.pop()
+        for neighbor, weight in graph[node].items():
+            if neighbor not in seen:
+                if graph.get(neighbor, {}).get(node) != weight:
+                    return False
+                seen.add(neighbor)
+                stack.append(neighbor)
+    return len(seen) == len(graph)
+
+
+def choose_solver(graph: Dict[Any, Dict[Any, Union[int, float]]]
+                  ) -> Tuple[Callable[..., Dict[str, Any]], str]:
+    """
+    Picks the fastest solver that is still exact for a graph, from a
+    pass over its edge weights and, if need be, its shape:
+
+    - negative weights: `spfa`, the only one that handles them;
+    - a single weight on every edge, e.g. no weights at all:
+      `bfs_uniform`, as the fewest edges is then the cheapest path;
+    - a tree, such as a perfect maze: `bfs_uniform` too, as the only
+      path is the cheapest;
+    - any other non-negative weights: `bidirectional_dijkstra`. On
+      mazes it beats `a_star`, whose Manhattan heuristic says little
+      about winding corridors and has to be scaled down to the lightest
+      edge to stay admissible.
+
+    Args:
+        graph: A dictionary mapping each node to its neighbors and the
+            weights of the edges to them.
+
+    Returns:
+        The solver and the reason it was picked.
+    """
+    weights = set()
+    for neighbors in graph.values():
+        weights.update(neighbors.values())
+    lightest, heaviest = min(weights, default=0), max(weights, default=0)
+    if lightest < 0:
+        return spfa, f'negative weights (lightest edge {lightest})'
+    if lightest == heaviest:
+        return bfs_uniform, f'every edge has the same weight ({lightest})'
+    if is_tree(graph):
+        return bfs_uniform, 'a tree, so the only path is the shortest'
+    return bidirectional_dijkstra, \
+        f'non-negative weights ({lightest} to {heaviest})'
+
+
+def auto(graph: Dict[Any, Dict[Any, Union[int, float]]], start: Any,
+         goal: Any, stats: Optional[Dict[str, int]] = None,
+         progress: Optional[Callable[[int, int, Any], None]] = None
+         ) -> Dict[str, Any]:
+    """
+    Solves with the solver `choose_solver` picks for the graph.
+
+    Args:
+        graph: A dictionary mapping each node to its neighbors and the
+            weights of the edges to them.
+        start: The starting node.
+        goal: The goal node.
+        stats: An optional dictionary filled with the search effort.
+        progress: An optional callback, passed to the chosen solver.
+
+    Returns:
+        The chosen solver's result, with its name as 'solver' and why
+        it was picked as 'reason'.
+    """
+    solver, reason = choose_solver(graph)
+    result = solver(graph, start, goal, stats=stats, progress=progress)
+    return dict(result, solver=solver.__name__, reason=reason)
+
+
+def shortest_path_tree(graph: Dict[Any, Dict[Any, Union[int, float]]],
+                       source: Any, targets: Iterable[Any] = (),
+                       stats: Optional[Dict[str, int]] = None,
+                       progress: Optional[Callable[[int, int, Any], None]]
+                       = None) -> Tuple[Dict[Any, Union[int, float]],
+                                        Dict[Any, Any]]:
+    """
+    Runs Dijkstra from one source to many targets, stopping once they
+    are all settled, or once every reachable node is if none are given.
+    Weights must not be negative.
+
+    Args:
+        graph: A dictionary mapping each node to its neighbors and the
+            weights of the edges to them.
+        source: The node to search from.
+        targets: The nodes whose distances are needed.
+        stats: An optional dictionary filled with the search effort.
+        progress: An optional callback, as for `djikstra`.
+
+    Returns:
+        The distance of each settled node, and each reached node mapped
+        to its parent, for `trace_path`.
+    """
+    remaining = set(targets) - {source}
+    distances = {source: 0}
+    came_from = {source: None}
+    settled = set()
+    heap = [(0, 0, source)]
+    counter = expanded = peak = relaxations = 0
+    while heap and (remaining or not targets):
+        distance, _, node = heapq.heappop(heap)
+        if node in settled:
+            continue
+        settled.add(node)
+        remaining.discard(node)
+        expanded += 1
+        if progress is not None and expanded % PROGRESS_INTERVAL == 0:
+            progress(expanded, len(heap), distance)
+        for neighbor, weight in graph.get(node, {}).items():
+            new_distance = distance + weight
+            if new_distance < distances.get(neighbor, math.inf):
+                distances[neighbor] = new_distance
+                came_from[neighbor] = node
+                relaxations += 1
+                counter += 1
+                heapq.heappush(heap, (new_distance, counter, neighbor))
+        if len(heap) > peak:
+            peak = len(heap)
+    record_stats(stats, expanded, peak, relaxations)
+    return {node: distances[node] for node in settled}, came_from
+
+
+def held_karp_order(costs: List[List[Union[int, float]]]) -> List[int]:
+    """
+    Finds the cheapest order to visit the rows 1 to n - 2 of a cost
+    table between row 0 and row n - 1 by dynamic programming over the
+    subsets visited, in O(2^n n^2).
+    """
+    n = len(costs) - 2
+    if n <= 0:
+        return []
+    full = (1 << n) - 1
+    # best[mask][j]: the cheapest route from the start over the
+    # waypoints in mask, ending at waypoint j, and the one before it.
+    best = [[(math.inf, -1)] * n for _ in range(1 << n)]
+    for j in range(n):
+        best[1 << j][j] = (costs[0][j + 1], -1)
+    for mask in range(1, 1 << n):
+        row = best[mask]
+        for j in range(n):
+            cost = row[j][0]
+            if cost == math.inf:
+                continue
+            for k in range(n):
+                if mask & (1 << k):
+                    continue
+                new_cost = cost + costs[j + 1][k + 1]
+                if new_cost < best[mask | (1 << k)][k][0]:
+                    best[mask | (1 << k)][k] = (new_cost, j)
+    last = min(range(n), key=lambda j: best[full][j][0] + costs[j + 1][-1])
+    if best[full][last][0] == math.inf:
+        return list(range(1, n + 1))
+    order, mask = [], full
+    while last != -1:
+        order.append(last + 1)
+        mask, last = mask ^ (1 << last), best[mask][last][1]
+    return order[::-1]
+
+
+def two_opt_order(costs: List[List[Union[int, float]]]) -> List[int]:
+    """
+    Orders the rows 1 to n - 2 of a cost table between row 0 and row
+    n - 1 greedily, always to the nearest unvisited one, then reverses
+    segments of the route while that makes it cheaper (2-opt). Costs
+    need not be symmetric: a reversed segment is priced backwards.
+    """
+    n = len(costs)
+    unvisited, route = set(range(1, n - 1)), [0]
+    while unvisited:
+        route.append(min(unvisited, key=lambda j: costs[route[-1]][j]))
+        unvisited.remove(route[-1])
+    route.append(n - 1)
+    improved = True
+    while improved:
+        improved = False
+        # Prefix sums of the route's legs, walked forward and backward.
+        forward, backward = [0], [0]
+        for a, b in zip(route[:-1], route[1:]):
+            forward.append(forward[-1] + costs[a][b])
+            backward.append(backward[-1] + costs[b][a])
+        for i in range(1, len(route) - 2):
+            for j in range(i + 1, len(route) - 1):
+                before, after = route[i - 1], route[j + 1]
+                old = costs[before][route[i]] + costs[route[j]][after] \
+                    + forward[j] - forward[i]
+                new = costs[before][route[j]] + costs[route[i]][after] \
+                    + backward[j] - backward[i]
+                if new < old:
+                    route[i:j + 1] = route[j:i - 1:-1]
+                    improved = True
+                    break
+            if improved:
+                break
+    return route[1:-1]
+
+
+def waypoint_route(graph: Dict[Any, Dict[Any, Union[int, float]]],
+                   start: Any, goal: Any, waypoints: List[Any],
+                   stats: Optional[Dict[str, int]] = None,
+                   progress: Optional[Callable[[int, int, Any], None]] = None
+                   ) -> Dict[str, Any]:
+    """
+    Finds a route from `start` to `goal` that visits every waypoint, in
+    the order that costs least. One `shortest_path_tree` from the start
+    and from each waypoint gives the table of costs between them; up to
+    `WAYPOINT_DP_LIMIT` waypoints are ordered exactly with
+    `held_karp_order`, more with `two_opt_order`. The legs are then
+    traced back through the same trees. Weights must not be negative.
+
+    Args:
+        graph: A dictionary mapping each node to its neighbors and the
+            weights of the edges to them.
+        start: The starting node.
+        goal: The goal node.
+        waypoints: The nodes to visit on the way, in any order.
+        stats: An optional dictionary filled with the effort of all the
+            searches together.
+        progress: An optional callback, passed to each search.
+
+    Returns:
+        A dictionary with the 'path' as a list of nodes, its 'cost', and
+        the 'order' the waypoints are visited in, as indices into
+        `waypoints`, or an empty path and a None cost if some waypoint
+        or the goal cannot be reached.
+    """
+    terminals = [start] + list(waypoints) + [goal]
+    trees, effort = {}, [0, 0, 0]
+    for node in terminals[:-1]:
+        if node not in trees:
+            tree_stats = {}
+            trees[node] = shortest_path_tree(graph, node, terminals,
+                                             tree_stats, progress)
+            effort = [effort[0] + tree_stats['expanded'],
+                      max(effort[1], tree_stats['peak_frontier']),
+                      effort[2] + tree_stats['relaxations']]
+    record_stats(stats, *effort)
+    costs = [[trees[a][0].get(b, math.inf) if a in trees else math.inf
+              for b in terminals] for a in terminals]
+    order = held_karp_order(costs) if len(waypoints) <= WAYPOINT_DP_LIMIT \
+        else two_opt_order(costs)
+    route = [0] + order + [len(terminals) - 1]
+    if any(costs[a][b] == math.inf for a, b in zip(route[:-1], route[1:])):
+        return {'path': [], 'cost': None, 'order': []}
+    path = [start]
+    for a, b in zip(route[:-1], route[1:]):
+        path += trace_path(graph, trees[terminals[a]][1], terminals[a],
+                           terminals[b])['path'][1:]
+    return {'path': path,
+            'cost': sum(costs[a][b] for a, b in zip(route[:-1], route[1:])),
+            'order': [i - 1 for i in order]}
+
+
+def spur_path(graph: Dict[Any, Dict[Any, Union[int, float]]], spur: Any,
+              goal: Any, to_goal: Dict[Any, Union[int, float]],
+              next_hop: Dict[Any, Any], removed: set, blocked: set,
+              dead: Optional[Dict[Any, List[Tuple[frozenset, frozenset]]]]
+              = None) -> Tuple[Optional[Dict[str, Any]], int]:
+    """
+    Finds the shortest path from `spur` to `goal` that does not step
+    from `spur` to a node in `removed` nor through a node in `blocked`,
+    for `k_shortest_paths`, with A* guided by the shortest-path tree
+    towards the goal. The tree's distances stay a consistent heuristic
+    when edges are taken away, and the search stops at the first node
+    whose path down the tree avoids the spur and the blocked nodes: no
+    other path can be cheaper than following it.
+
+    A failed search is recorded in `dead` with the blocked nodes it ran
+    into, and a later search from the same spur that excludes at least
+    as much fails at once. In mazes, spurs leading into dead ends are
+    tried again with every path sharing their root.
+
+    Returns:
+        The path and its cost, or None if there is none, and the number
+        of nodes A* expanded.
+    """
+    for old_removed, walls in (dead or {}).get(spur, ()):
+        if old_removed <= removed and walls <= blocked:
+            return None, 0
+    # The blocked nodes the search ran into, which made it fail.
+    touched = set()
+    # Whether each node's tree path is usable, filled in as it is asked.
+    clear = {goal: goal not in blocked and goal != spur}
+
+    def tree_clear(node: Any) -> bool:
+        walk = []
+        while node not in clear:
+            if node in blocked or node == spur:
+                if node in blocked:
+                    touched.add(node)
+                clear[node] = False
+                break
+            walk.append(node)
+            node = next_hop[node]
+        for visited in walk:
+            clear[visited] = clear[node]
+        return clear[node]
+
+    distances = {spur: 0}
+    came_from = {spur: None}
+    closed = set()
+    # Ties go to the deeper node, which with an exact heuristic is the
+    # one on the path.
+    heap = [(to_goal[spur], 0, 0, spur)]
+    counter = 0
+    while heap:
+        _, _, _, node = heapq.heappop(heap)
+        if node in closed:
+            continue
+        closed.add(node)
+        if node == goal or node == spur and next_hop[spur] not in removed \
+                and tree_clear(next_hop[spur]) or \
+                node != spur and tree_clear(node):
+            path = trace_path(graph, came_from, spur, node)['path']
+            while path[-1] != goal:
+                path.append(next_hop[path[-1]])
+            return {'path': path, 'cost': distances[node] + to_goal[node]}, \
+                len(closed)
+        for neighbor, weight in graph.get(node, {}).items():
+            if neighbor in blocked:
+                touched.add(neighbor)
+                continue
+            if neighbor not in to_goal or \
+                    node == spur and neighbor in removed:
+                continue
+            distance = distances[node] + weight
+            if distance < distances.get(neighbor, math.inf):
+                distances[neighbor] = distance
+                came_from[neighbor] = node
+                counter += 1
+                heapq.heappush(heap, (distance + to_goal[neighbor],
+                                      -distance, counter, neighbor))
+    if dead is not None:
+        dead.setdefault(spur, []).append((frozenset(removed),
+                                          frozenset(touched)))
+    return None, len(closed)
+
+
+def k_shortest_paths(graph: Dict[Any, Dict[Any, Union[int, float]]],
+                     start: Any, goal: Any, k: int,
+                     stats: Optional[Dict[str, int]] = None,
+                     progress: Optional[Callable[[int, int, Any], None]]
+                     = None) -> List[Dict[str, Any]]:
+    """
+    Finds the `k` shortest loopless paths from `start` to `goal` with
+    Yen's algorithm: each path after the first leaves an earlier one at
+    some spur node, keeping its root up to there. One Dijkstra over the
+    reversed edges gives every node's distance to the goal, so most
+    spur searches are answered from that tree, and the rest are A*
+    searches guided by it, see `spur_path`. As in Lawler's variant, a
+    path is only spurred from where it left its parent, since the nodes
+    before were tried for the parent. Weights must not be negative.
+
+    Args:
+        graph: A dictionary mapping each node to its neighbors and the
+            weights of the edges to them.
+        start: The starting node.
+        goal: The goal node.
+        k: The number of paths wanted.
+        stats: An optional dictionary filled with the effort of all the
+            searches together.
+        progress: An optional callback, passed to the reversed search.
+
+    Returns:
+        Up to `k` dictionaries with a 'path' as a list of nodes and its
+        'cost', cheapest first, empty if no path exists.
+    """
+    reverse: Dict[Any, Dict[Any, Union[int, float]]] = {}
+    for node, neighbors in graph.items():
+        for neighbor, weight in neighbors.items():
+            reverse.setdefault(neighbor, {})[node] = weight
+    tree_stats = {}
+    to_goal, next_hop = shortest_path_tree(reverse, goal, stats=tree_stats,
+                                           progress=progress)
+    expanded, peak = tree_stats['expanded'], 0
+    if start not in to_goal or k < 1:
+        record_stats(stats, expanded, peak, tree_stats['relaxations'])
+        return []
+    first, _ = spur_path(graph, start, goal, to_goal, next_hop, set(),
+                         set())
+    paths, deviations = [first], [0]
+    seen = {tuple(first['path'])}
+    dead: Dict[Any, List[Tuple[frozenset, frozenset]]] = {}
+    candidates: List[Tuple[Union[int, float], int, int, List[Any]]] = []
+    counter = 0
+    while len(paths) < k:
+        last, deviation = paths[-1]['path'], deviations[-1]
+        root_cost = sum(graph[a][b] for a, b in
+                        zip(last[:deviation], last[1:deviation + 1]))
+        # The root before the spur, and the paths that share it.
+        blocked = set(last[:deviation])
+        sharing = [path['path'] for path in paths
+                   if path['path'][:deviation] == last[:deviation]]
+        for i in range(deviation, len(last) - 1):
+            sharing = [path for path in sharing if path[i] == last[i]]
+            found, spur_expanded = spur_path(
+                graph, last[i], goal, to_goal, next_hop,
+                {path[i + 1] for path in sharing}, blocked, dead)
+            expanded += spur_expanded
+            if found is not None:
+                path = last[:i] + found['path']
+                if tuple(path) not in seen:
+                    seen.add(tuple(path))
+                    counter += 1
+                    heapq.heappush(candidates, (root_cost + found['cost'],
+                                                counter, i, path))
+            blocked.add(last[i])
+            root_cost += graph[last[i]][last[i + 1]]
+        peak = max(peak, len(candidates))
+        if not candidates:
+            break
+        cost, _, deviation, path = heapq.heappop(candidates)
+        paths.append({'path': path, 'cost': cost})
+        deviations.append(deviation)
+    record_stats(stats, expanded, peak, tree_stats['relaxations'])
+    return paths
+
+
+def alternative_paths(graph: Dict[Any, Dict[Any, Union[int, float]]],
+                      start: Any, goal: Any, k: int,
+                      stats: Optional[Dict[str, int]] = None,
+                      progress: Optional[Callable[[int, int, Any], None]]
+                      = None) -> Dict[str, Any]:
+    """
+    `k_shortest_paths` as a single solver result: the shortest 'path'
+    and its 'cost', and the next ones as 'alternatives'.
+    """
+    paths = k_shortest_paths(graph, start, goal, k, stats, progress)
+    if not paths:
+        return {'path': [], 'cost': None, 'alternatives': []}
+    return dict(paths[0], alternatives=paths[1:])
+
+
+def step_weights(graph: Dict[Any, Dict[Any, Union[int, float]]]
+                 ) -> Tuple[float, float]:
+    """
+    Measures the weight per step of a graph of (x, y) nodes, as the
+    ratio of each edge's weight to the Manhattan distance it spans.
+
+    Returns:
+        The smallest ratio, by which the Manhattan distance can be
+        scaled while staying below the weight of every path, 0 as soon
+        as an edge weighs nothing, as most passages of a generated maze
+        do; and the mean ratio over the edges of the first
+        `ANYTIME_SAMPLE` nodes.
+    """
+    ratios = [weight / span for node, neighbors
+              in itertools.islice(graph.items(), ANYTIME_SAMPLE)
+              for neighbor, weight in neighbors.items()
+              if (span := abs(node[0] - neighbor[0])
+                  + abs(node[1] - neighbor[1]))]
+    mean = sum(ratios) / len(ratios) if ratios else 0
+    scale = min(ratios, default=math.inf)
+    for node, neighbors in graph.items():
+        if scale <= 0:
+            return 0, mean
+        for neighbor, weight in neighbors.items():
+            span = abs(node[0] - neighbor[0]) + abs(node[1] - neighbor[1])
+            if span:
+                scale = min(scale, weight / span)
+    return (0 if scale == math.inf else scale), mean
+
+
+def anytime_a_star(graph: Dict[Any, Dict[Any, Union[int, float]]],
+                   start: Any, goal: Any,
+                   deadline_ms: Optional[float] = None,
+                   max_expansions: Optional[int] = None,
+                   inflation: float = ANYTIME_INFLATION,
+                   stats: Optional[Dict[str, int]] = None,
+                   progress: Optional[Callable[[int, int, Any], None]] = None
+                   ) -> Dict[str, Any]:
+    """
+    Anytime Repairing A* (Likhachev, Gordon and Thrun): a series of
+    weighted A* passes that find a path quickly and then improve it
+    until it is provably the shortest or the search runs out of time or
+    expansions. Each pass orders nodes by their cost so far plus
+    `inflation` times their Manhattan distance to the goal, in units of
+    the mean weight per step, and the factor is lowered by
+    `ANYTIME_STEP` after each one. The last pass uses the Manhattan
+    distance in units of the lightest step, which is admissible, and is
+    exact, see `step_weights`. Each
+    pass only re-expands the nodes whose cost the previous ones lowered.
+
+    Since the inflated heuristic need not be admissible, the bound is
+    measured rather than taken from the factor: no path is cheaper than
+    the least cost so far plus admissible heuristic among the nodes
+    still waiting to be expanded, or expanded before their cost last
+    dropped.
+
+    Args:
+        graph: A dictionary mapping each (x, y) node to its neighbors
+            and the non-negative weights of the edges to them. Other
+            nodes are searched without a heuristic.
+        start: The starting node.
+        goal: The goal node.
+        deadline_ms: Milliseconds after which to stop and return the
+            best path so far. Defaults to none.
+        max_expansions: Expansions after which to stop likewise.
+            Defaults to none.
+        inflation: The first pass's factor. Defaults to
+            `ANYTIME_INFLATION`.
+        stats: An optional dictionary filled with the search effort,
+            over all passes.
+        progress: An optional callback, as for `a_star`.
+
+    Returns:
+        The best 'path' found and its 'cost', with an empty path and a
+        None cost if none was found in time, and the 'bound': how many
+        times the shortest path's cost it may be at most, 1.0 if it is
+        the shortest, None if that is not known yet.
+    """
+    deadline = None if deadline_ms is None else \
+        time.perf_counter() + deadline_ms / 1000
+    coords = isinstance(goal, tuple) and len(goal) == 2
+    scale, mean = step_weights(graph) if coords else (0, 0)
+
+    def distance(node: Any) -> int:
+        return abs(node[0] - goal[0]) + abs(node[1] - goal[1]) \
+            if coords else 0
+
+    factors = [(inflation - ANYTIME_STEP * i) * (mean or 1)
+               for i in range(max(0, math.ceil((inflation - 1)
+                                               / ANYTIME_STEP)))]
+    factors.append(scale)
+    cost_so_far = {start: 0}
+    came_from = {start: None}
+    waiting, reopened = {start}, set()
+    best, bound = {'path': [], 'cost': None}, None
+    expanded = peak = relaxations = counter = 0
+    stopped = False
+    for factor in factors:
+        waiting |= reopened
+        reopened, closed = set(), set()
+        heap = [(cost_so_far[node] + factor * distance(node), 0,
+                 cost_so_far[node], node) for node in waiting]
+        heapq.heapify(heap)
+        while heap:
+            priority, _, cost, node = heap[0]
+            if cost != cost_so_far[node] or node not in waiting:
+                heapq.heappop(heap)
+                continue
+            if cost_so_far.get(goal, math.inf) <= priority:
+                break
+            if max_expansions is not None and expanded >= max_expansions \
+                    or deadline is not None \
+                    and expanded % DEADLINE_CHECK_INTERVAL == 0 \
+                    and time.perf_counter() >= deadline:
+                stopped = True
+                break
+            heapq.heappop(heap)
+            waiting.discard(node)
+            closed.add(node)
+            expanded += 1
+            if progress is not None and expanded % PROGRESS_INTERVAL == 0:
+                progress(expanded, len(heap), cost)
+            for neighbor, weight in graph.get(node, {}).items():
+                new_cost = cost + weight
+                if new_cost < cost_so_far.get(neighbor, math.inf):
+                    cost_so_far[neighbor] = new_cost
+                    came_from[neighbor] = node
+                    relaxations += 1
+                    if neighbor in closed:
+                        reopened.add(neighbor)
+                    else:
+                        waiting.add(neighbor)
+                        counter += 1
+                        heapq.heappush(heap, (
+                            new_cost + factor * distance(neighbor),
+                            counter, new_cost, neighbor))
+            if len(heap) > peak:
+                peak = len(heap)
+        if goal in came_from:
+            best = trace_path(graph, came_from, start, goal)
+            lower = min((cost_so_far[node] + scale * distance(node)
+                         for node in waiting | reopened), default=math.inf)
+            bound = 1.0 if best['cost'] <= lower else \
+                best['cost'] / lower if lower > 0 else None
+        if stopped or bound == 1.0:
+            break
+    record_stats(stats, expanded, peak, relaxations)
+    return dict(best, bound=bound)
+
+
+class LPAStar:
+    """
+    Lifelong Planning A* (Koenig and Likhachev): a shortest-path search
+    between a fixed start and goal that keeps its state, so that after
+    edges are added, removed or reweighted only the part of the search
+    they affect is redone. Every node keeps `g`, its distance as of the
+    last search, and `rhs`, the best distance its predecessors offer
+    now. Nodes where the two differ are queued, and repaired in order of
+    their key until the goal is settled. Weights must not be negative.
+
+    LPA* needs every edge to cost something, or nodes joined by
+    passages weighing nothing keep each other's outdated distances, so
+    internally each edge also costs one step, ranked below any weight.
+
+    Args:
+        graph: A dictionary mapping each node to its neighbors and the
+            weights of the edges to them. It is copied, not changed.
+        start: The starting node.
+        goal: The goal node.
+        heuristic: An optional consistent estimate of the weight between
+            two nodes. Defaults to 0, which suits mazes whose passages
+            may weigh nothing.
+    """
+    # Above the number of steps of any path, so steps only break ties.
+    STEP_SCALE = 1 << 32
+
+    def __init__(self, graph: Dict[Any, Dict[Any, Union[int, float]]],
+                 start: Any, goal: Any,
+                 heuristic: Optional[Callable[[Any, Any], float]] = None):
+        self.graph = {node: dict(neighbors)
+                      for node, neighbors in graph.items()}
+        self.predecessors: Dict[Any, Dict[Any, Union[int, float]]] = {}
+        for node, neighbors in self.graph.items():
+            for neighbor, weight in neighbors.items():
+                self.predecessors.setdefault(neighbor, {})[node] = weight
+        self.start, self.goal = start, goal
+        self.heuristic = heuristic or (lambda node, goal: 0)
+        self.g: Dict[Any, Union[int, float]] = {}
+        self.rhs: Dict[Any, Union[int, float]] = {start: 0}
+        # The key of each queued node's live heap entry; older entries
+        # for the same node are skipped when popped.
+        self.queued: Dict[Any, Tuple[float, float]] = {}
+        self.queue: List[Tuple[Tuple[float, float], Any]] = []
+        self.enqueue(start)
+
+    def key(self, node: Any) -> Tuple[float, float]:
+        best = min(self.g.get(node, math.inf), self.rhs.get(node, math.inf))
+        return best + self.heuristic(node, self.goal) * self.STEP_SCALE, best
+
+    def enqueue(self, node: Any) -> None:
+        key = self.key(node)
+        self.queued[node] = key
+        heapq.heappush(self.queue, (key, node))
+
+    def update_node(self, node: Any) -> None:
+        """
+        Recomputes a node's rhs from its predecessors, and queues it if
+        it no longer agrees with its g.
+        """
+        if node != self.start:
+            self.rhs[node] = min(
+                (self.g.get(predecessor, math.inf)
+                 + weight * self.STEP_SCALE + 1 for predecessor, weight
+                 in self.predecessors.get(node, {}).items()),
+                default=math.inf)
+        if self.g.get(node, math.inf) != self.rhs[node]:
+            self.enqueue(node)
+        else:
+            self.queued.pop(node, None)
+
+    def update_edge(self, node: Any, neighbor: Any,
+                    weight: Optional[Union[int, float]]) -> None:
+        """
+        Sets the weight of the edge from `node` to `neighbor`, adding it
+        if needed, or removes it if `weight` is None. The next `search`
+        repairs the path.
+        """
+        if weight is None:
+            self.graph.get(node, {}).pop(neighbor, None)
+            self.predecessors.get(neighbor, {}).pop(node, None)
+        else:
+            self.graph.setdefault(node, {})[neighbor] = weight
+            self.predecessors.setdefault(neighbor, {})[node] = weight
+        self.update_node(neighbor)
+
+    def search(self, stats: Optional[Dict[str, int]] = None,
+               progress: Optional[Callable[[int, int, Any], None]] = None
+               ) -> Dict[str, Any]:
+        """
+        Repairs the search after the edge updates since the last one, or
+        runs it in full the first time.
+
+        Args:
+            stats: An optional dictionary filled with the effort of this
+                repair alone.
+            progress: An optional callback, called every
+                `PROGRESS_INTERVAL` expansions with the nodes expanded,
+                the queue size and None, as distances are kept scaled.
+
+        Returns:
+            A dictionary with the 'path' as a list of nodes and its 'cost',
+            or an empty path and a None cost if no path exists.
+        """
+        expanded = relaxations = 0
+        peak = len(self.queued)
+        while self.queue:
+            key, node = self.queue[0]
+            if self.queued.get(node) != key:
+                heapq.heappop(self.queue)
+                continue
+            if key >= self.key(self.goal) and \
+                    self.g.get(self.goal, math.inf) == \
+                    self.rhs.get(self.goal, math.inf):
+                break
+            heapq.heappop(self.queue)
+            expanded += 1
+            if progress is not None and expanded % PROGRESS_INTERVAL == 0:
+                progress(expanded, len(self.queued), None)
+            if key < self.key(node):
+                self.enqueue(node)
+                continue
+            del self.queued[node]
+            if self.g.get(node, math.inf) > self.rhs[node]:
+                self.g[node] = self.rhs[node]
+            else:
+                self.g[node] = math.inf
+                self.update_node(node)
+            for neighbor in self.graph.get(node, ()):
+                relaxations += 1
+                self.update_node(neighbor)
+            if len(self.queued) > peak:
+                peak = len(self.queued)
+        record_stats(stats, expanded, peak, relaxations)
+        return self.path()
+
+    def path(self) -> Dict[str, Any]:
+        """
+        Traces the shortest path back from the goal, each time to the
+        predecessor the goal's distance came through.
+        """
+        if self.g.get(self.goal, math.inf) == math.inf:
+            return {'path': [], 'cost': None}
+        path = [self.goal]
+        while path[-1] != self.start:
+            path.append(min(
+                self.predecessors[path[-1]].items(),
+                key=lambda item: self.g.get(item[0], math.inf)
+                + item[1] * self.STEP_SCALE)[0])
+        path.reverse()
+        return {'path': path, 'cost': sum(
+            self.graph[a][b] for a, b in zip(path[:-1], path[1:]))}
@@ -0,0 +1,122 @@
+import io
+import os
+import time
+import pstats
+import marshal
+import cProfile
+import tracemalloc
+
+from typing import Any, Callable, Dict, Tuple
+
+from fastapi import Request
+
+from artifacts import store_artifact, artifact_url
+
+PROFILING = os.environ.get('MAZE_PROFILING', '0') == '1'
+PROFILE_TOKEN = os.environ.get('MAZE_PROFILE_TOKEN', '')
+PROFILE_TOP = int(os.environ.get('MAZE_PROFILE_TOP', 40))
+
+
+def profiling_requested(request: Request) -> bool:
+    """
+    Tells whether a request asked to be profiled, either with an
+    `X-Maze-Profile` header or a `profile` query parameter. Profiling
+    must be allowed with MAZE_PROFILING=1 and, if MAZE_PROFILE_TOKEN is
+    set, the header or parameter value must match it.
+
+    Args:
+        request (Request): The incoming request.
+
+    Returns:
+        bool: True if the request should run under the profiler.
+    """
+    if not PROFILING:
+        return False
+    value = request.headers.get('x-maze-profile',
+                                request.query_params.get('profile'))
+    if not value:
+        return False
+    return value == PROFILE_TOKEN if PROFILE_TOKEN else value not in (
+        '0', 'false')
+
+
+def profile_task(func: Callable, *args: Any) -> Tuple[Any, Dict[str, Any]]:
+    """
+    Runs a task under cProfile and tracemalloc. Meant to be sent to a
+    pool worker in place of the task itself.
+
+    Args:
+        func (Callable): The task to profile.
+        *args: Its arguments.
+
+    Returns:
+        Tuple[Any, Dict[str, Any]]: The task's return value and a
+            profile with the marshalled 'pstats', the 'cprofile' and
+            'allocations' text reports, the 'peak_memory' in bytes and
+            the 'wall' time in seconds.
+    """
+    profile = cProfile.Profile()
+    tracemalloc.start(10)
+    start = time.perf_counter()
+    try:
+        profile.enable()
+        try:
+            result = func(*args)
+        finally:
+            profile.disable()
+        wall = time.perf_counter() - start
+        snapshot = tracemalloc.take_snapshot()
+        _, peak_memory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    text = io.StringIO()
+    pstats.Stats(profile, stream=text).sort_stats(
+        'cumulative').print_stats(PROFILE_TOP)
+    allocations = '\n'.join(
+        str(stat) for stat in snapshot.statistics('lineno')[:PROFILE_TOP])
+    profile.create_stats()
+    return result, {'pstats': marshal.dumps(profile.stats),
+                    'cprofile': text.getvalue(), 'allocations': allocations,
+                    'peak_memory': peak_memory, 'wall': wall}
+
+
+def profile_report(title: str, profile: Dict[str, Any],
+                   stages: Dict[str, float]) -> str:
+    """
+    Formats a profile and a per-stage timing breakdown as text.
+
+    Args:
+        title (str): What was profiled.
+        profile (Dict[str, Any]): The profile from `profile_task`.
+        stages (Dict[str, float]): Seconds spent in each stage.
+
+    Returns:
+        str: The report.
+    """
+    lines = [f'Profile of {title}', '',
+             f"Profiled wall time: {profile['wall']:.4f} s",
+             f"Peak traced memory: {profile['peak_memory'] / 2**20:.2f} MiB",
+             '', 'Stages (s):']
+    lines += [f'  {stage:<10} {seconds:.4f}'
+              for stage, seconds in stages.items()]
+    lines += ['', 'Top allocations:', profile['allocations'], '',
+              'cProfile:', profile['cprofile']]
+    return '\n'.join(lines)
+
+
+def store_profile(title: str, profile: Dict[str, Any],
+                  stages: Dict[str, float]) -> Dict[str, str]:
+    """
+    Stores the text report and the raw pstats of a profiled request as
+    downloadable artifacts. The pstats file loads with
+    `pstats.Stats(path)` or tools such as snakeviz.
+
+    Returns:
+        Dict[str, str]: Link labels mapped to artifact URLs.
+    """
+    report = profile_report(title, profile, stages).encode()
+    return {
+        'Profile report': artifact_url(store_artifact(report, 'txt'), 'txt'),
+        'pstats': artifact_url(store_artifact(profile['pstats'], 'prof'),
+                               'prof'),
+    }
@@ -0,0 +1,267 @@
+import os
+import json
+import time
+import threading
+
+from uuid import uuid4
+from collections import OrderedDict
+
+from typing import Any, Dict, List, Optional, Tuple
+
+from file_locks import file_lock, temp_path
+from maze_methods import grid_to_maze
+from path_finding import LPAStar
+
+FILE_PREF = 'maze_data' if 'maze_solver' in os.getcwd() else '/tmp/'
+SESSION_DIR = os.path.join(FILE_PREF, 'sessions')
+# Sessions each worker process keeps searched, the others are rebuilt
+# from their records when next used.
+SESSION_LIMIT = int(os.environ.get('MAZE_SESSION_LIMIT', 16))
+SESSION_TTL = int(os.environ.get('MAZE_SESSION_TTL', 60 * 60))
+WALL = 100
+
+Node = Tuple[int, int]
+
+sessions: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+sessions_lock = threading.Lock()
+
+
+def record_path(session_id: str, ext: str) -> str:
+    return os.path.join(SESSION_DIR, f'{os.path.basename(session_id)}.{ext}')
+
+
+def grid_graph(grid: Dict[str, Any]) -> Dict[Node, Dict[Node, int]]:
+    """
+    Decodes a grid into its open passages, keeping walled-in cells so
+    that edits can open them later.
+    """
+    return {cell: {neighbor: weight for neighbor, weight in passages.items()
+                   if weight != WALL}
+            for cell, passages in grid_to_maze(grid).items()}
+
+
+def check_cell(grid: Dict[str, Any], cell: List[int]) -> Node:
+    """
+    Raises:
+        ValueError: If the cell is not in the grid.
+    """
+    if len(cell) != 2 or not (0 <= cell[0] < grid['width']
+                              and 0 <= cell[1] < grid['height']):
+        raise ValueError(f'cell outside the maze: {cell}')
+    return cell[0], cell[1]
+
+
+def check_edits(grid: Dict[str, Any], updates: List[Dict[str, Any]]
+                ) -> List[List[Optional[int]]]:
+    """
+    Validates passage updates, each with a 'from' and a 'to' cell next
+    to each other and a 'weight', where 100 or None is a wall.
+
+    Raises:
+        ValueError: If an update is not a passage of the grid or its
+            weight is out of range.
+
+    Returns:
+        List[List[Optional[int]]]: The updates as [x, y, nx, ny, weight],
+            with None for walls.
+    """
+    edits = []
+    for update in updates:
+        (x, y), (nx, ny) = (check_cell(grid, update['from']),
+                            check_cell(grid, update['to']))
+        if abs(x - nx) + abs(y - ny) != 1:
+            raise ValueError(f'cells are not neighbors: {update}')
+        weight = update.get('weight')
+        if weight is not None and not 0 <= weight <= WALL:
+            raise ValueError(f'weight out of range: {weight}; 0 to {WALL}')
+        edits.append([x, y, nx, ny, None if weight == WALL else weight])
+    return edits
+
+
+def apply_edits(solver: LPAStar, edits: List[List[Optional[int]]]) -> None:
+    for x, y, nx, ny, weight in edits:
+        solver.update_edge((x, y), (nx, ny), weight)
+        solver.update_edge((nx, ny), (x, y), weight)
+
+
+def catch_up(session_id: str, entry: Dict[str, Any]) -> None:
+    """
+    Applies the edits other worker processes logged since the session
+    was last used here.
+    """
+    with open(record_path(session_id, 'edits'), 'r') as f:
+        f.seek(entry['offset'])
+        for line in f:
+            apply_edits(entry['solver'], json.loads(line))
+            entry['edits'] += 1
+        entry['offset'] = f.tell()
+
+
+def load_session(session_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Returns a session brought up to date with its edit log, rebuilding
+    it from its record if this process does not hold it. Call with the
+    session's file lock held.
+
+    Returns:
+        Optional[Dict[str, Any]]: The session, or None if unknown or
+            expired.
+    """
+    path_ = record_path(session_id, 'json')
+    try:
+        with open(path_, 'r') as f:
+            record = json.load(f)
+        os.utime(path_)
+    except (OSError, ValueError):
+        with sessions_lock:
+            sessions.pop(session_id, None)
+        return None
+    with sessions_lock:
+        entry = sessions.get(session_id)
+        if entry is not None:
+            sessions.move_to_end(session_id)
+    if entry is None:
+        entry = {'solver': LPAStar(grid_graph(record['grid']),
+                                   tuple(record['start']),
+                                   tuple(record['end'])),
+                 'grid': record['grid'], 'offset': 0, 'edits': 0}
+    catch_up(session_id, entry)
+    with sessions_lock:
+        sessions[session_id] = entry
+        while len(sessions) > SESSION_LIMIT:
+            sessions.popitem(last=False)
+    return entry
+
+
+def session_cells(session_id: str) -> Optional[int]:
+    """
+    Returns the number of cells in a session's maze, to project the
+    cost of rebuilding it, or None if the session is unknown.
+    """
+    try:
+        with open(record_path(session_id, 'json'), 'r') as f:
+            grid = json.load(f)['grid']
+    except (OSError, ValueError, KeyError):
+        return None
+    return grid['width'] * grid['height']
+
+
+def session_result(session_id: str, entry: Dict[str, Any]
+                   ) -> Dict[str, Any]:
+    """
+    Repairs the session's search and returns its path, with the nodes
+    the repair expanded and the number of edits so far.
+    """
+    stats = {}
+    result = entry['solver'].search(stats)
+    return dict(result, session=session_id, expanded=stats['expanded'],
+                edits=entry['edits'])
+
+
+def create_session(grid: Dict[str, Any], start: List[int],
+                   end: List[int]) -> Dict[str, Any]:
+    """
+    Starts an editing session on a grid maze: solves it once with
+    `LPAStar` and records it, so later edits only repair the search.
+
+    Args:
+        grid (Dict[str, Any]): The maze, as from `maze_to_grid`.
+        start (List[int]): The starting cell.
+        end (List[int]): The goal cell.
+
+    Raises:
+        ValueError: If an endpoint is not in the grid.
+
+    Returns:
+        Dict[str, Any]: The 'session' id, the 'path' and its 'cost',
+            and the nodes 'expanded'.
+    """
+    start, end = check_cell(grid, start), check_cell(grid, end)
+    session_id = uuid4().hex
+    os.makedirs(SESSION_DIR, exist_ok=True)
+    with file_lock(f'session-{session_id}'):
+        open(record_path(session_id, 'edits'), 'w').close()
+        path_ = record_path(session_id, 'json')
+        with open(temp_ := temp_path(path_), 'w') as f:
+            json.dump({'grid': grid, 'start': start, 'end': end,
+                       'created': time.time()}, f)
+        os.replace(temp_, path_)
+        return session_result(session_id, load_session(session_id))
+
+
+def get_session(session_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Returns a session's current path, or None if it is unknown.
+    """
+    with file_lock(f'session-{os.path.basename(session_id)}'):
+        entry = load_session(session_id)
+        return None if entry is None else session_result(session_id, entry)
+
+
+def edit_session(session_id: str, updates: List[Dict[str, Any]]
+                 ) -> Optional[Dict[str, Any]]:
+    """
+    Changes passages of a session's maze and repairs its path. The
+    edits are logged, so any worker process can replay them.
+
+    Args:
+        session_id (str): The session.
+        updates (List[Dict[str, Any]]): As for `check_edits`. Passages
+            are changed in both directions.
+
+    Raises:
+        ValueError: If an update is invalid; none are applied then.
+
+    Returns:
+        Optional[Dict[str, Any]]: As `create_session`, with the count of
+            'edits' so far, or None if the session is unknown.
+    """
+    with file_lock(f'session-{os.path.basename(session_id)}'):
+        entry = load_session(session_id)
+        if entry is None:
+            return None
+        edits = check_edits(entry['grid'], updates)
+        with open(record_path(session_id, 'edits'), 'a') as f:
+            f.write(json.dumps(edits, separators=(',', ':')) + '\n')
+            entry['offset'] = f.tell()
+        apply_edits(entry['solver'], edits)
+        entry['edits'] += 1
+        return session_result(session_id, entry)
+
+
+def delete_session(session_id: str) -> bool:
+    """
+    Ends a session.
+
+    Returns:
+        bool: False if it was unknown.
+    """
+    with file_lock(f'session-{os.path.basename(session_id)}'):
+        with sessions_lock:
+            sessions.pop(session_id, None)
+        found = False
+        for ext in ('json', 'edits'):
+            try:
+                os.remove(record_path(session_id, ext))
+                found = True
+            except FileNotFoundError:
+                pass
+        return found
+
+
+def prune_sessions(max_age: int = SESSION_TTL) -> None:
+    """
+    Deletes the records of sessions not used for `max_age` seconds.
+    """
+    if not os.path.isdir(SESSION_DIR):
+        return
+    cutoff = time.time() - max_age
+    for filename in os.listdir(SESSION_DIR):
+        session_id, ext = os.path.splitext(filename)
+        try:
+            if ext == '.json' and \
+                    os.path.getmtime(os.path.join(SESSION_DIR,
+                                                  filename)) < cutoff:
+                delete_session(session_id)
+        except OSError:
+            pass
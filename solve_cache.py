@@ -0,0 +1,144 @@
+import os
+import json
+import time
+import hashlib
+
+from collections import OrderedDict
+
+from typing import Any, Dict, Optional, Tuple
+
+from file_locks import temp_path
+
+FILE_PREF = 'maze_data' if 'maze_solver' in os.getcwd() else '/tmp/'
+CACHE_SIZE = int(os.environ.get('MAZE_SOLVE_CACHE_SIZE', 256))
+WORKERS = int(os.environ.get('MAZE_WORKERS', 1))
+# Several server processes only see each other's solves on disk.
+CACHE_DIR = os.environ.get('MAZE_SOLVE_CACHE_DIR') or (
+    os.path.join(FILE_PREF, 'solve_cache') if WORKERS > 1 else None)
+CACHE_TTL = int(os.environ.get('MAZE_ARTIFACT_TTL', 24 * 60 * 60))
+
+memory: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0}
+
+
+def solve_key(file_contents: bytes, solve_algorithm: Any,
+              start_coords: Tuple[int, int], end_coords: Tuple[int, int],
+              params: Optional[Dict[str, Any]] = None) -> str:
+    """
+    Builds the cache key of a solve from the maze's content hash, the
+    algorithm, the endpoints and any extra solver parameters.
+
+    Args:
+        file_contents (bytes): The uploaded maze file.
+        solve_algorithm (Any): The solver index or name.
+        start_coords (Tuple[int, int]): The starting coordinates.
+        end_coords (Tuple[int, int]): The ending coordinates.
+        params (Dict[str, Any], optional): Extra parameters that change
+            the result. Defaults to None.
+
+    Returns:
+        str: A hex digest usable as a file name.
+    """
+    return hash_solve_key(hashlib.sha256(file_contents).hexdigest(),
+                          solve_algorithm, start_coords, end_coords, params)
+
+
+def hash_solve_key(maze_hash: str, solve_algorithm: Any,
+                   start_coords: Tuple[int, int], end_coords: Tuple[int, int],
+                   params: Optional[Dict[str, Any]] = None) -> str:
+    """
+    Same as `solve_key`, for a maze whose SHA-256 was computed while it
+    was streamed in.
+
+    Returns:
+        str: A hex digest usable as a file name.
+    """
+    key = json.dumps([maze_hash, solve_algorithm, list(start_coords),
+                      list(end_coords), params or {}], sort_keys=True)
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def cache_get(key: str) -> Optional[Dict[str, Any]]:
+    """
+    Looks a solve up in the in-memory LRU, then in the on-disk tier
+    shared by the server processes, if `MAZE_SOLVE_CACHE_DIR` is set or
+    there are several `MAZE_WORKERS`, promoting disk hits to memory.
+
+    Returns:
+        Optional[Dict[str, Any]]: The cached entry, or None on a miss.
+    """
+    if key in memory:
+        memory.move_to_end(key)
+        stats['memory_hits'] += 1
+        return memory[key]
+    if CACHE_DIR:
+        try:
+            with open(os.path.join(CACHE_DIR, f'{key}.json'), 'r') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            entry = None
+        if entry is not None:
+            path = entry['path']
+            if isinstance(path, dict) and path.get('path'):
+                path['path'] = [tuple(i) for i in path['path']]
+            remember(key, entry)
+            stats['disk_hits'] += 1
+            return entry
+    stats['misses'] += 1
+    return None
+
+
+def cache_put(key: str, entry: Dict[str, Any]) -> None:
+    """
+    Stores a solve in memory and, if enabled, on disk.
+
+    Args:
+        key (str): The key from `solve_key`.
+        entry (Dict[str, Any]): The solver result under 'path', and the
+            solution 'name' with its 'image' and 'data' artifact digests.
+    """
+    remember(key, entry)
+    if CACHE_DIR:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        path_ = os.path.join(CACHE_DIR, f'{key}.json')
+        with open(temp_ := temp_path(path_), 'w') as f:
+            json.dump(entry, f)
+        os.replace(temp_, path_)
+
+
+def remember(key: str, entry: Dict[str, Any]) -> None:
+    """
+    Inserts an entry in the in-memory tier, evicting the least recently
+    used ones beyond `CACHE_SIZE`.
+    """
+    memory[key] = entry
+    memory.move_to_end(key)
+    while len(memory) > CACHE_SIZE:
+        memory.popitem(last=False)
+
+
+def prune_cache(max_age: int = CACHE_TTL) -> None:
+    """
+    Deletes on-disk entries older than `max_age` seconds, after which
+    the artifacts they point to have expired anyway.
+    """
+    if not CACHE_DIR or not os.path.isdir(CACHE_DIR):
+        return
+    cutoff = time.time() - max_age
+    for filename in os.listdir(CACHE_DIR):
+        file_path = os.path.join(CACHE_DIR, filename)
+        try:
+            if os.path.getmtime(file_path) < cutoff:
+                os.remove(file_path)
+        except OSError:
+            pass
+
+
+def cache_stats() -> Dict[str, Any]:
+    """
+    Returns the hit and miss counters along with the hit rate.
+    """
+    lookups = sum(stats.values())
+    hits = stats['memory_hits'] + stats['disk_hits']
+    return dict(stats, size=len(memory),
+                hit_rate=hits / lookups if lookups else 0.0)
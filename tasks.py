@@ -0,0 +1,578 @@
+import os
+import json
+import time
+
+from functools import partial
+from typing import (Any, Callable, Dict, List, Optional, Sequence, Tuple,
+                    Union)
+
+from maze_methods import (generate_maze_, draw_maze, filter_maze_passages,
+                          maze_to_grid, grid_to_maze, parse_maze_stream,
+                          crop_maze)
+from path_finding import (djikstra, a_star, bfs, dfs, bellman_ford,
+                          bidirectional_search, beam_search, auto,
+                          waypoint_route, alternative_paths,
+                          anytime_a_star, encode_moves, decode_moves)
+from graph_methods import (random_letter_weighted_dict,
+                           draw_letter_weighted_dict, random_coords_graph,
+                           draw_random_coords_graph,
+                           random_weighted_adjacency_matrix,
+                           draw_adjacency_matrix, pyplot)
+from metrics import ENABLED as METRICS_ENABLED
+from corridors import COMPRESS_CORRIDORS, compressed_maze, solve_compressed
+from compiled_graph import COMPILE_GRAPHS, COMPILED_SOLVERS, compiled_graph
+
+FILE_PREF = 'maze_data' if 'maze_solver' in os.getcwd() else '/tmp/'
+MAX_CELLS = int(os.environ.get('MAZE_MAX_CELLS', 1_000_000))
+MAX_EDGES = int(os.environ.get('MAZE_MAX_EDGES', 4_000_000))
+MAX_PATHS = int(os.environ.get('MAZE_MAX_PATHS', 20))
+# 'moves' writes solutions as a start cell and runs of steps, see
+# `path_finding.encode_moves`, 'list' as the list of cells.
+PATH_FORMAT = os.environ.get('MAZE_PATH_FORMAT', 'list')
+CHUNK_SIZE = 1 << 16
+PROGRESS_SECONDS = 0.1
+PATH_CHUNK = 1000
+SOLVERS = [djikstra, a_star, bfs, dfs, bellman_ford,
+           bidirectional_search, beam_search, auto]
+
+
+def warm_worker() -> int:
+    """
+    Runs once in every pool worker so the heavy, lazily imported
+    dependencies are loaded before the first real request arrives.
+
+    Returns:
+        int: The worker's process id.
+    """
+    import PIL.ImageDraw  # noqa: F401
+    pyplot()
+    return os.getpid()
+
+
+def progress_reporter(events: Any, stage: str, *fields: str
+                      ) -> Callable[..., None]:
+    """
+    Builds a progress callback for the solvers and the generator that
+    puts 'progress' events on an event queue, at most once every
+    `PROGRESS_SECONDS` so a fast search is not slowed down by it.
+
+    Args:
+        events (Any): A queue shared with the server, see
+            `executors.event_queue`.
+        stage (str): The stage the events belong to.
+        *fields (str): The names of the callback's arguments.
+
+    Returns:
+        Callable[..., None]: The callback.
+    """
+    last = [0.0]
+
+    def report(*values: Any) -> None:
+        now = time.monotonic()
+        if now - last[0] >= PROGRESS_SECONDS:
+            last[0] = now
+            events.put(dict(zip(fields, values), event='progress',
+                            stage=stage))
+    return report
+
+
+def solve_plan(solve_algorithm: int,
+               waypoints: Sequence[Tuple[int, int]] = (),
+               k: int = 1, deadline_ms: Optional[float] = None,
+               max_expansions: Optional[int] = None) -> Tuple[str, int]:
+    """
+    Names what answers a solve, for the cost model and the metrics: the
+    solver, `waypoint_route`, `alternative_paths` or `anytime_a_star`.
+
+    Raises:
+        ValueError: If `solve_algorithm` is not an index of `SOLVERS`,
+            `k` is not between 1 and `MAX_PATHS`, a limit is not
+            positive, or two of waypoints, `k` and the limits are
+            combined.
+
+    Returns:
+        Tuple[str, int]: The name and how many searches it makes.
+    """
+    if not 0 <= solve_algorithm < len(SOLVERS):
+        raise ValueError(f'unknown algorithm {solve_algorithm}')
+    if not 1 <= k <= MAX_PATHS:
+        raise ValueError(f'k must be between 1 and {MAX_PATHS}')
+    limited = deadline_ms is not None or max_expansions is not None
+    if (deadline_ms is not None and deadline_ms <= 0) or \
+            (max_expansions is not None and max_expansions <= 0):
+        raise ValueError('deadline_ms and max_expansions must be positive')
+    if sum((bool(waypoints), k > 1, limited)) > 1:
+        raise ValueError('waypoints, k and deadline_ms or max_expansions '
+                         'cannot be combined')
+    if waypoints:
+        return 'waypoint_route', len(waypoints) + 1
+    if k > 1:
+        return 'alternative_paths', k
+    if limited:
+        return 'anytime_a_star', 1
+    return SOLVERS[solve_algorithm].__name__, 1
+
+
+def compact_path(result: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Replaces the 'path' of a solver result, and of its 'alternatives',
+    with its 'start' and 'moves', see `path_finding.encode_moves`.
+    """
+    compact = {key: value for key, value in result.items()
+               if key not in ('path', 'alternatives')}
+    compact.update(encode_moves(result.get('path') or []))
+    if 'alternatives' in result:
+        compact['alternatives'] = [compact_path(i)
+                                   for i in result['alternatives']]
+    return compact
+
+
+def path_cells(result: Dict[str, Any]) -> List[Tuple[int, int]]:
+    """
+    Returns the cells of a solver result's path, compact or not.
+    """
+    if 'moves' in result:
+        return decode_moves(result['start'], result['moves'])
+    return result.get('path') or []
+
+
+def path_events(path: Any) -> List[Dict[str, Any]]:
+    """
+    Splits a solver result into 'path' events of up to `PATH_CHUNK`
+    nodes, flattened to [x0, y0, x1, y1, ...], followed by a 'solved'
+    event with the cost and length, the solver and reason `auto`
+    picked, the waypoint 'order' of a route, the 'alternatives' of
+    `alternative_paths`, flattened the same way, and the suboptimality
+    'bound' of `anytime_a_star`. Compact results are expanded first.
+    """
+    if not isinstance(path, dict):
+        path = {}
+    nodes = path_cells(path)
+    events = [{'event': 'path', 'offset': i,
+               'path': [c for node in nodes[i:i + PATH_CHUNK] for c in node]}
+              for i in range(0, len(nodes), PATH_CHUNK)]
+    events.append({'event': 'solved', 'length': len(nodes),
+                   'cost': path.get('cost'),
+                   **{key: path[key] for key in ('solver', 'reason', 'order',
+                                                 'bound') if key in path}})
+    if 'alternatives' in path:
+        events[-1]['alternatives'] = [
+            {'path': [c for node in path_cells(alternative) for c in node],
+             'cost': alternative['cost']}
+            for alternative in path['alternatives']]
+    return events
+
+
+def generate_maze_task(width: int, height: int, strict: float,
+                       weight: float, name_: str, preview: int = 0,
+                       events: Any = None) -> str:
+    """
+    Generates and draws a maze, writing its data and PNG files.
+
+    Args:
+        width (int): The width of the maze.
+        height (int): The height of the maze.
+        strict (float): The strictness of the maze.
+        weight (float): The probability of adding weights to the edges.
+        name_ (str): The name the files are saved under.
+        preview (int, optional): If set, only the top left `preview` by
+            `preview` cells are drawn. Defaults to 0, drawing it whole.
+        events (Any, optional): A queue to put progress events on.
+            Defaults to None.
+
+    Returns:
+        str: The path of the saved PNG.
+    """
+    progress = None
+    if events is not None:
+        events.put({'event': 'stage', 'stage': 'generate'})
+        progress = progress_reporter(events, 'generate', 'cells', 'total')
+    maze_dict = generate_maze_(width=width, height=height, strict=strict,
+                               add_weights_prob=weight, name_=name_,
+                               progress=progress)
+    if events is not None:
+        events.put({'event': 'stage', 'stage': 'draw'})
+    if preview:
+        maze_dict = crop_maze(maze_dict, preview, preview)
+    _, image_path = draw_maze(maze_dict, name_=name_)
+    return image_path
+
+
+def solve_graph(maze: Dict[Tuple[int, int], Dict[Tuple[int, int], int]],
+                solve_algorithm: int, start_coords: Tuple[int, int],
+                end_coords: Tuple[int, int], stages: Dict[str, float],
+                events: Any = None, maze_key: Optional[str] = None,
+                waypoints: Sequence[Tuple[int, int]] = (), k: int = 1,
+                deadline_ms: Optional[float] = None,
+                max_expansions: Optional[int] = None
+                ) -> Tuple[Dict[str, Any], Dict[str, Dict[str, float]]]:
+    """
+    Filters a parsed maze and solves it, timing both stages and
+    collecting the solver's search effort when metrics are enabled.
+    Unless `MAZE_COMPRESS_CORRIDORS` is 0, the solver runs on the maze
+    with its corridors collapsed, see `corridors.compress_corridors`.
+    With waypoints, the route through them is found with
+    `path_finding.waypoint_route` instead of the solver, and with `k`
+    the k shortest paths with `path_finding.alternative_paths`, on the
+    full maze, as the compressed one only keeps the lighter of two
+    corridors between the same junctions. With a deadline or a limit on
+    expansions, `path_finding.anytime_a_star` returns the best path it
+    finds within them. Otherwise, unless `MAZE_COMPILE_GRAPHS` is 0, the
+    solvers of `compiled_graph.COMPILED_SOLVERS` run on the graph
+    compiled into flat arrays, cached per maze like the compressed form.
+
+    Args:
+        maze (Dict[Tuple[int, int], Dict[Tuple[int, int], int]]):
+            The parsed maze.
+        solve_algorithm (int): The index of the solver in `SOLVERS`.
+        start_coords (Tuple[int, int]): The starting coordinates.
+        end_coords (Tuple[int, int]): The ending coordinates.
+        stages (Dict[str, float]): Timings of the earlier stages.
+        events (Any, optional): A queue to put progress events on.
+            Defaults to None.
+        maze_key (str, optional): The maze's content hash, under which
+            its compressed and compiled forms are cached. Defaults to None.
+        waypoints (Sequence[Tuple[int, int]], optional): Cells to visit
+            on the way, in any order. Defaults to none.
+        k (int, optional): How many shortest loopless paths to find.
+            Defaults to 1.
+        deadline_ms (float, optional): Milliseconds the search may take.
+            Defaults to none.
+        max_expansions (int, optional): Nodes the search may expand.
+            Defaults to none.
+
+    Returns:
+        Tuple[Dict[str, Any], Dict[str, Dict[str, float]]]: The solver
+            result and a report with the 'stages' timings and the
+            'search' effort counters.
+    """
+    progress = None
+    if events is not None:
+        events.put({'event': 'stage', 'stage': 'solve'})
+        progress = progress_reporter(events, 'solve', 'expanded',
+                                     'frontier', 'best_cost')
+    stats = {} if METRICS_ENABLED else None
+    start = time.perf_counter()
+    graph = filter_maze_passages(maze)
+    stages['filter'] = time.perf_counter() - start
+    solver = SOLVERS[solve_algorithm]
+    compile_ = False
+    if waypoints:
+        solver = partial(waypoint_route, waypoints=list(waypoints))
+    elif k > 1:
+        solver = partial(alternative_paths, k=k)
+    elif deadline_ms is not None or max_expansions is not None:
+        solver = partial(anytime_a_star, deadline_ms=deadline_ms,
+                         max_expansions=max_expansions)
+    elif COMPILE_GRAPHS and solver.__name__ in COMPILED_SOLVERS:
+        solver, compile_ = COMPILED_SOLVERS[solver.__name__], True
+    if COMPRESS_CORRIDORS and k == 1:
+        start = time.perf_counter()
+        compressed = compressed_maze(graph, maze_key)
+        stages['compress'] = time.perf_counter() - start
+        compiled = None
+        if compile_:
+            start = time.perf_counter()
+            compiled = compiled_graph(compressed['graph'], maze_key and
+                                      f'{maze_key}-corridors')
+            stages['compile'] = time.perf_counter() - start
+        start = time.perf_counter()
+        path = solve_compressed(solver, graph, compressed, start_coords,
+                                end_coords, waypoints, compiled,
+                                stats=stats, progress=progress)
+    else:
+        if compile_:
+            start = time.perf_counter()
+            graph = compiled_graph(graph, maze_key)
+            stages['compile'] = time.perf_counter() - start
+        start = time.perf_counter()
+        path = solver(graph, start_coords, end_coords, stats=stats,
+                      progress=progress)
+    stages['solve'] = time.perf_counter() - start
+    return path, {'stages': stages, 'search': stats or {}}
+
+
+def read_maze_grid(maze_path: str) -> Dict[str, Union[int, List[int]]]:
+    """
+    Parses a maze file spooled to disk into a compact grid, a chunk at a
+    time, enforcing `MAX_CELLS` and `MAX_EDGES`.
+
+    Raises:
+        MazeLimitError: If the maze is larger than the limits.
+        ValueError: If the file is not a grid maze.
+    """
+    with open(maze_path, 'rb') as f:
+        return parse_maze_stream(iter(partial(f.read, CHUNK_SIZE), b''),
+                                 MAX_CELLS, MAX_EDGES)
+
+
+def solve_maze_task(maze_path: str, solve_algorithm: int,
+                    start_coords: Tuple[int, int],
+                    end_coords: Tuple[int, int], preview: int = 0,
+                    events: Any = None, maze_key: Optional[str] = None,
+                    waypoints: Sequence[Tuple[int, int]] = (), k: int = 1,
+                    deadline_ms: Optional[float] = None,
+                    max_expansions: Optional[int] = None
+                    ) -> Tuple[Dict[str, Any], Dict[str, Dict[str, float]],
+                               str]:
+    """
+    Parses an uploaded maze, solves it with one of the `SOLVERS` and
+    draws the solution. The upload is read from disk in chunks, so
+    neither it nor an intermediate copy is ever held in memory whole.
+
+    Args:
+        maze_path (str): The path the upload was spooled to.
+        solve_algorithm (int): The index of the solver in `SOLVERS`.
+        start_coords (Tuple[int, int]): The starting coordinates.
+        end_coords (Tuple[int, int]): The ending coordinates.
+        preview (int, optional): If set, only the top left `preview` by
+            `preview` cells are drawn. Defaults to 0, drawing it whole.
+        events (Any, optional): A queue to put progress events on. The
+            path is put on it as soon as it is found, before drawing.
+            Defaults to None.
+        maze_key (str, optional): The upload's content hash, see
+            `solve_graph`. Defaults to None.
+        waypoints (Sequence[Tuple[int, int]], optional): See
+            `solve_graph`. Defaults to none.
+        k (int, optional): See `solve_graph`. Defaults to 1.
+        deadline_ms, max_expansions (optional): See `solve_graph`.
+            Defaults to none.
+
+    Returns:
+        Tuple[Dict[str, Any], Dict[str, Dict[str, float]], str]: The
+            solver result, compacted by `compact_path` if `PATH_FORMAT`
+            is 'moves', so a long path is not pickled back cell by cell,
+            its report (see `solve_graph`) with the parse, decode and
+            draw stages added, and the name the image and solution files
+            are saved under.
+    """
+    if events is not None:
+        events.put({'event': 'stage', 'stage': 'parse'})
+    start = time.perf_counter()
+    grid = read_maze_grid(maze_path)
+    stages = {'parse': time.perf_counter() - start}
+    start = time.perf_counter()
+    maze = grid_to_maze(grid)
+    del grid
+    stages['decode'] = time.perf_counter() - start
+    path, report = solve_graph(maze, solve_algorithm, start_coords,
+                               end_coords, stages, events, maze_key,
+                               waypoints, k, deadline_ms, max_expansions)
+    if events is not None:
+        for event in path_events(path):
+            events.put(event)
+        events.put({'event': 'stage', 'stage': 'draw'})
+    start = time.perf_counter()
+    if preview:
+        maze = crop_maze(maze, preview, preview)
+    image_name = draw_solution_task(maze, path)
+    report['stages']['draw'] = time.perf_counter() - start
+    if PATH_FORMAT == 'moves' and isinstance(path, dict):
+        path = compact_path(path)
+    return path, report, image_name
+
+
+def draw_solution_task(maze: Dict[Tuple[int, int], Dict[Tuple[int, int], int]],
+                       path: Dict[str, Union[List[Tuple[int, int]], int]]
+                       ) -> str:
+    """
+    Draws a solved maze and writes the solution next to its PNG, in the
+    `PATH_FORMAT`.
+
+    Args:
+        maze (Dict[Tuple[int, int], Dict[Tuple[int, int], int]]):
+            The parsed maze.
+        path (Dict[str, Union[List[Tuple[int, int]], int]]): The solver
+            result to draw.
+
+    Returns:
+        str: The name the image and solution files are saved under.
+    """
+    _, image_path = draw_maze(maze, path)
+    image_name = image_path.replace(FILE_PREF, '').replace(
+        '/', '').split('.')[0].replace('\\', '')
+    with open(os.path.join(FILE_PREF, image_name + '.json'), 'w') as f:
+        if PATH_FORMAT == 'moves' and isinstance(path, dict):
+            json.dump(compact_path(path), f)
+        else:
+            f.write(str(path))
+    return image_name
+
+
+def generate_maze_timed_task(width: int, height: int, strict: float,
+                             weight: float, name_: str, preview: int = 0
+                             ) -> Tuple[str, Dict[str, Dict[str, float]]]:
+    """
+    Same as `generate_maze_task`, also reporting how long generating
+    and drawing took.
+
+    Returns:
+        Tuple[str, Dict[str, Dict[str, float]]]: The path of the saved
+            PNG and a report with the 'stages' timings.
+    """
+    start = time.perf_counter()
+    maze_dict = generate_maze_(width=width, height=height, strict=strict,
+                               add_weights_prob=weight, name_=name_)
+    stages = {'generate': time.perf_counter() - start}
+    start = time.perf_counter()
+    if preview:
+        maze_dict = crop_maze(maze_dict, preview, preview)
+    _, image_path = draw_maze(maze_dict, name_=name_)
+    stages['draw'] = time.perf_counter() - start
+    return image_path, {'stages': stages}
+
+
+def solve_maze_file_task(maze_path: str, solve_algorithm: int,
+                         start_coords: Tuple[int, int],
+                         end_coords: Tuple[int, int],
+                         waypoints: Sequence[Tuple[int, int]] = (),
+                         k: int = 1, deadline_ms: Optional[float] = None,
+                         max_expansions: Optional[int] = None) -> str:
+    """
+    Solves and draws a maze spooled to disk for a background job.
+
+    Args:
+        maze_path (str): The path of the maze file.
+        solve_algorithm (int): The index of the solver in `SOLVERS`.
+        start_coords (Tuple[int, int]): The starting coordinates.
+        end_coords (Tuple[int, int]): The ending coordinates.
+        waypoints (Sequence[Tuple[int, int]], optional): See
+            `solve_graph`. Defaults to none.
+        k (int, optional): See `solve_graph`. Defaults to 1.
+        deadline_ms, max_expansions (optional): See `solve_graph`.
+            Defaults to none.
+
+    Returns:
+        str: The name the image and solution files are saved under.
+    """
+    return solve_maze_task(maze_path, solve_algorithm, tuple(start_coords),
+                           tuple(end_coords),
+                           waypoints=[tuple(i) for i in waypoints], k=k,
+                           deadline_ms=deadline_ms,
+                           max_expansions=max_expansions)[2]
+
+
+def generate_grid_task(width: int, height: int, strict: float,
+                       weight: float, name_: str, render: bool = False
+                       ) -> Tuple[Dict[str, Union[int, List[int]]],
+                                  Optional[str]]:
+    """
+    Generates a maze and encodes it as a compact grid, drawing it only
+    if asked to.
+
+    Returns:
+        Tuple[Dict[str, Union[int, List[int]]], Optional[str]]: The grid
+            and the path of the saved PNG, or None if not rendered.
+    """
+    maze_dict = generate_maze_(width=width, height=height, strict=strict,
+                               add_weights_prob=weight, name_=name_)
+    image_path = draw_maze(maze_dict, name_=name_)[1] if render else None
+    return maze_to_grid(maze_dict), image_path
+
+
+def solve_grid_task(grid: Dict[str, Union[int, List[int]]],
+                    solve_algorithm: int, start_coords: Tuple[int, int],
+                    end_coords: Tuple[int, int],
+                    maze_key: Optional[str] = None,
+                    waypoints: Sequence[Tuple[int, int]] = (), k: int = 1,
+                    deadline_ms: Optional[float] = None,
+                    max_expansions: Optional[int] = None
+                    ) -> Tuple[Dict[str, Any], Dict[str, Dict[str, float]]]:
+    """
+    Solves a maze given as a compact grid with one of the `SOLVERS`, or
+    through `waypoints`, or for the `k` shortest paths, or within a
+    deadline, caching its compressed form under `maze_key` if given.
+
+    Returns:
+        Tuple[Dict[str, Any], Dict[str, Dict[str, float]]]: The solver
+            result and its report, see `solve_graph`.
+    """
+    start = time.perf_counter()
+    maze = grid_to_maze(grid)
+    stages = {'decode': time.perf_counter() - start}
+    return solve_graph(maze, solve_algorithm, start_coords, end_coords,
+                       stages, maze_key=maze_key, waypoints=waypoints, k=k,
+                       deadline_ms=deadline_ms, max_expansions=max_expansions)
+
+
+def letter_graph_task(num_nodes: int, num_edges: int, min_weight: int,
+                      max_weight: int, directional: bool, name_: str
+                      ) -> Dict[str, Dict[str, int]]:
+    """
+    Generates a letter weighted dict graph without drawing it.
+    """
+    return random_letter_weighted_dict(
+        num_nodes, num_edges, min_weight, max_weight, directional, name_)
+
+
+def coords_edges_task(num_nodes: int, num_edges: int, min_weight: int,
+                      max_weight: int, directional: bool, name_: str
+                      ) -> List[List[int]]:
+    """
+    Generates a coords graph without drawing it and flattens it into
+    [x, y, nx, ny, weight] edges, since JSON has no tuple keys.
+    """
+    coords_dict = random_coords_graph(
+        num_nodes, num_edges, min_weight, max_weight, directional, name_)
+    return [[*node, *neighbor, weight]
+            for node, neighbors in coords_dict.items()
+            for neighbor, weight in neighbors.items()]
+
+
+def adjacency_matrix_task(num_nodes: int, num_edges: int, min_weight: int,
+                          max_weight: int, name_: str) -> List[List[int]]:
+    """
+    Generates an adjacency matrix without drawing it.
+    """
+    return random_weighted_adjacency_matrix(
+        num_nodes, num_edges, min_weight, max_weight, name_)
+
+
+def dict_graph_task(num_nodes: int, num_edges: int, min_weight: int,
+                    max_weight: int, directional: bool, name_: str) -> str:
+    """
+    Generates and draws a letter weighted dict graph. pyplot is not
+    thread-safe, so the matplotlib tasks always run in a process.
+
+    Returns:
+        str: The path of the saved PNG, or 'Error' if drawing failed.
+    """
+    lettered_dict = random_letter_weighted_dict(
+        num_nodes, num_edges, min_weight, max_weight, directional, name_)
+    drawn = draw_letter_weighted_dict(
+        lettered_dict, max_weight <= 0, name_=name_)
+    if drawn == 'Error':
+        return drawn
+    graph_image, path_ = drawn
+    pyplot().close(graph_image)
+    return path_
+
+
+def coords_graph_task(num_nodes: int, num_edges: int, min_weight: int,
+                      max_weight: int, directional: bool, name_: str) -> str:
+    """
+    Generates and draws a coords graph.
+
+    Returns:
+        str: The path of the saved PNG.
+    """
+    coords_dict = random_coords_graph(
+        num_nodes, num_edges, min_weight, max_weight, directional, name_)
+    graph_image, path_ = draw_random_coords_graph(coords_dict, name_=name_)
+    pyplot().close(graph_image)
+    return path_
+
+
+def matrix_graph_task(num_nodes: int, num_edges: int, min_weight: int,
+                      max_weight: int, name_: str) -> str:
+    """
+    Generates and draws an adjacency matrix.
+
+    Returns:
+        str: The path of the saved PNG.
+    """
+    matrix_dict = random_weighted_adjacency_matrix(
+        num_nodes, num_edges, min_weight, max_weight, name_)
+    matrix_image, path_ = draw_adjacency_matrix(matrix_dict, name_=name_)
+    pyplot().close(matrix_image)
+    return path_
@@ -0,0 +1,60 @@
+import os
+import gzip
+import hashlib
+
+from typing import Any, Dict, Optional
+
+from fastapi import Response
+
+TEMPLATE_DIR = 'html_responses'
+
+templates: Dict[str, Dict[str, Any]] = {}
+
+
+def load_templates() -> None:
+    """
+    Reads every HTML page in `TEMPLATE_DIR` once, keeping the raw and
+    gzipped bodies along with a strong ETag.
+    """
+    for filename in os.listdir(TEMPLATE_DIR):
+        if not filename.endswith('.html'):
+            continue
+        with open(os.path.join(TEMPLATE_DIR, filename), 'rb') as f:
+            body = f.read()
+        templates[filename] = {
+            'body': body,
+            'gzip': gzip.compress(body, compresslevel=9, mtime=0),
+            'etag': f'"{hashlib.sha256(body).hexdigest()[:32]}"',
+        }
+
+
+def template_response(filename: str, if_none_match: str = '',
+                      accept_encoding: str = '',
+                      headers: Optional[Dict[str, str]] = None) -> Response:
+    """
+    Serves a preloaded HTML page, answering 304 when the client's copy
+    is current and sending the gzipped body when it is accepted.
+
+    Args:
+        filename (str): The page's file name in `TEMPLATE_DIR`.
+        if_none_match (str, optional): The request's If-None-Match header.
+        accept_encoding (str, optional): The request's Accept-Encoding
+            header.
+        headers (Dict[str, str], optional): Extra response headers.
+            Defaults to revalidating on every use.
+
+    Returns:
+        Response: The page.
+    """
+    if filename not in templates:
+        load_templates()
+    template = templates[filename]
+    headers = dict(headers or {'Cache-Control': 'no-cache'},
+                   ETag=template['etag'], Vary='Accept-Encoding')
+    if template['etag'] in [i.strip() for i in if_none_match.split(',')]:
+        return Response(status_code=304, headers=headers)
+    body = template['body']
+    if 'gzip' in accept_encoding:
+        body = template['gzip']
+        headers['Content-Encoding'] = 'gzip'
+    return Response(content=body, media_type='text/html', headers=headers)